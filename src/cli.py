@@ -0,0 +1,310 @@
+"""无界面的命令行入口，供 CI/CD 流水线与定时任务调用
+
+    python -m src.cli [--config PATH] [--server NAME ...] <command> ...
+
+命令: distribute / list / download / delete / test。按 ftp_config.json (或 --config) 中的服务器配置
+直接驱动 FtpManager，不导入 Qt。标准输出为逐行 JSON (progress / status / result 事件，最后一行为
+summary)，日志写到标准错误。退出码: 0 全部成功，1 有操作失败，2 参数或配置错误，130 被中断。
+
+启动开销敏感：模块顶层只导入标准库里的轻量模块，FtpManager 在解析完参数后才导入。
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class UsageError(Exception):
+    """参数或配置错误 (退出码 2)"""
+
+
+class JsonEmitter:
+    """线程安全地向标准输出逐行写 JSON 事件；同一服务器的进度事件按 interval 秒限频，完成时必定输出"""
+
+    def __init__(self, stream=None, interval: float = 0.5, progress: bool = True):
+        self.stream = stream or sys.stdout
+        self.interval = interval
+        self.progress_enabled = progress
+        self._lock = threading.Lock()
+        self._last_progress = {}
+
+    def emit(self, event: str, **fields):
+        fields = {"event": event, "time": round(time.time(), 3), **fields}
+        line = json.dumps(fields, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def progress(self, config, done: int, total: int, **fields):
+        if not self.progress_enabled:
+            return
+        now = time.monotonic()
+        key = config.server_id
+        with self._lock:
+            last = self._last_progress.get(key)
+            if last is not None and now - last < self.interval and not (total and done >= total):
+                return
+            self._last_progress[key] = now
+        self.emit("progress", **_server_fields(config), done=done, total=total, **fields)
+
+
+def _server_fields(config) -> dict:
+    return {"server": config.name, "server_id": config.server_id, "host": config.host}
+
+
+def _load_server_dicts(path: str) -> list:
+    if not os.path.exists(path):
+        raise UsageError(f"Config file not found: {path}")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise UsageError(f"Cannot read config {path}: {e}") from e
+    if not isinstance(data, list):
+        raise UsageError(f"Config {path} must contain a list of servers")
+    return data
+
+
+def _select_servers(manager, selectors: list) -> list:
+    """--server 可按 ID、名称或主机选择 (可重复)；未指定时为所有启用的服务器"""
+    if not selectors:
+        return [s for s in manager.servers if s.enabled]
+    selected = []
+    for selector in selectors:
+        matches = [s for s in manager.servers if selector in (s.server_id, s.name, s.host)]
+        if not matches:
+            raise UsageError(f"No server matches {selector!r}")
+        selected.extend(s for s in matches if s not in selected)
+    return selected
+
+
+def _run_per_server(servers: list, fn) -> dict:
+    """每台服务器一个线程并行执行 fn(config) -> (ok, message, extra)，返回 server_id -> 结果"""
+    results = {}
+
+    def run(config):
+        results[config.server_id] = fn(config)
+
+    threads = [threading.Thread(target=run, args=(config,), name=f"cli-{config.host}", daemon=True)
+               for config in servers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _report_results(out: JsonEmitter, servers: list, results: dict, command: str) -> int:
+    failed = 0
+    for config in servers:
+        ok, message, extra = results[config.server_id]
+        failed += not ok
+        out.emit("result", **_server_fields(config), ok=ok, message=message, **extra)
+    out.emit("summary", command=command, ok=failed == 0, servers=len(servers), failed=failed)
+    return EXIT_OK if failed == 0 else EXIT_FAILED
+
+
+def cmd_test(manager, servers: list, args, out: JsonEmitter) -> int:
+    def test(config):
+        started = time.perf_counter()
+        ok, message = manager.test_connection(config)
+        return ok, message, {"seconds": round(time.perf_counter() - started, 3)}
+
+    return _report_results(out, servers, _run_per_server(servers, test), "test")
+
+
+def cmd_list(manager, servers: list, args, out: JsonEmitter) -> int:
+    def list_dir(config):
+        ok, items, path = manager.list_directory(config, args.path, use_cache=False)
+        if not ok:
+            return False, path, {}
+        return True, "Success", {"path": path, "entries": [item.to_dict() for item in items]}
+
+    return _report_results(out, servers, _run_per_server(servers, list_dir), "list")
+
+
+def cmd_download(manager, servers: list, args, out: JsonEmitter) -> int:
+    if len(servers) != 1:
+        raise UsageError("download needs exactly one server; choose it with --server")
+    config = servers[0]
+    os.makedirs(args.local_dir, exist_ok=True)
+    ok, message = manager.download_path(config, args.remote_path, args.local_dir, is_dir=args.recursive,
+                                        progress_callback=lambda host, done, total: out.progress(config, done, total))
+    extra = {}
+    if manager.download_metrics is not None:
+        extra["metrics"] = manager.download_metrics.snapshot()
+    if manager.download_checksums is not None and manager.download_checksums.path:
+        extra["checksums"] = manager.download_checksums.path
+    return _report_results(out, servers, {config.server_id: (ok, message, extra)}, "download")
+
+
+def cmd_delete(manager, servers: list, args, out: JsonEmitter) -> int:
+    def delete(config):
+        ok, message = manager.delete_path(config, args.remote_path, is_dir=args.recursive,
+                                          progress_callback=lambda host, done, total: out.progress(config, done, total))
+        return ok, message, {}
+
+    return _report_results(out, servers, _run_per_server(servers, delete), "delete")
+
+
+def cmd_distribute(manager, servers: list, args, out: JsonEmitter) -> int:
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        raise UsageError(f"Local path not found: {', '.join(missing)}")
+    local_paths = [os.path.abspath(p) for p in args.paths]
+    manager.checksum_algorithm = None if args.checksum == "none" else args.checksum
+    # upload_to_all / verify_all 作用于 manager.servers 中启用的服务器
+    manager.servers = servers
+    for config in servers:
+        config.enabled = True
+    by_id = {config.server_id: config for config in servers}
+    states = {}
+
+    def on_progress(server_id: str, done: int, total: int):
+        out.progress(by_id[server_id], done, total, phase="upload")
+
+    def on_status(server_id: str, message: str, status: int):
+        if status:
+            states[server_id] = (status > 0, message)
+        out.emit("status", **_server_fields(by_id[server_id]), message=message, state=status)
+
+    handle = manager.upload_to_all(local_paths, args.remote_dir, on_progress, on_status, broadcast=args.broadcast,
+                                   resume=args.resume, delta=args.delta, progress_interval=args.progress_interval)
+    _wait(handle)
+    results = {}
+    for config in servers:
+        ok, message = states.get(config.server_id, (False, "Not run"))
+        metrics = manager.upload_metrics.get(config.server_id) if manager.upload_metrics else None
+        results[config.server_id] = (ok, message, {"metrics": metrics.snapshot()} if metrics else {})
+
+    if args.verify:
+        uploaded = [config for config in servers if results[config.server_id][0]]
+        manager.servers = uploaded
+
+        def verify_progress(server_id: str, done: int, total: int):
+            out.progress(by_id[server_id], done, total, phase="verify")
+
+        _wait(manager.verify_all(local_paths, args.remote_dir, verify_progress))
+        for config in uploaded:
+            report = manager.verify_reports.get(config.server_id)
+            ok = report is not None and report.ok
+            extra = results[config.server_id][2]
+            extra["verify"] = {"ok": ok, "method": report.method if report else "",
+                               "message": report.describe() if report else "Not verified"}
+            if not ok:
+                results[config.server_id] = (False, "Verify failed", extra)
+
+    code = _report_results(out, servers, results, "distribute")
+    if manager.upload_checksums is not None and manager.upload_checksums.path:
+        out.emit("checksums", path=manager.upload_checksums.path, algorithm=manager.upload_checksums.algorithm)
+    return code
+
+
+def _wait(handle):
+    """等待任务结束；Ctrl+C 时取消尚未开始的服务器并向上抛出"""
+    try:
+        while not handle.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        handle.cancel()
+        raise
+
+
+COMMANDS = {
+    "distribute": cmd_distribute,
+    "list": cmd_list,
+    "download": cmd_download,
+    "delete": cmd_delete,
+    "test": cmd_test,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli",
+                                     description="FtpTool headless client (JSON lines on stdout, logs on stderr)")
+    parser.add_argument("--config", help="server config file (default: ftp_config.json next to the program)")
+    parser.add_argument("-s", "--server", action="append", default=[],
+                        help="server id, name or host (repeatable; default: all enabled servers)")
+    parser.add_argument("--no-progress", action="store_true", help="do not emit progress events")
+    parser.add_argument("--progress-interval", type=float, default=0.5,
+                        help="minimum seconds between progress events per server (default: 0.5)")
+    parser.add_argument("--parallel", type=int, default=8, metavar="N",
+                        help="maximum number of servers processed at the same time (default: 8)")
+    parser.add_argument("--per-host-limit", type=int, default=8, metavar="N",
+                        help="maximum connections to one host across all its server configs (default: 8)")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="log to stderr (-v info, -vv debug)")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    p = sub.add_parser("distribute", help="upload files/directories to the selected servers")
+    p.add_argument("paths", nargs="+", help="local files or directories")
+    p.add_argument("--remote-dir", default="",
+                   help="target directory (default: each server's remote_dir, else its login directory)")
+    p.add_argument("--resume", action="store_true", help="resume interrupted uploads")
+    p.add_argument("--delta", action="store_true", help="skip files that are unchanged on the server")
+    p.add_argument("--broadcast", action="store_true", help="read each local file once for all servers")
+    p.add_argument("--verify", action="store_true", help="verify the uploaded files with server-side hashes")
+    p.add_argument("--checksum", default="sha256", help="digest computed while uploading: sha256, crc32, xxh64 or none")
+
+    p = sub.add_parser("list", help="list a remote directory")
+    p.add_argument("path", nargs="?", default="", help="remote directory (default: login directory)")
+
+    p = sub.add_parser("download", help="download a remote file or directory (one server)")
+    p.add_argument("remote_path")
+    p.add_argument("local_dir", nargs="?", default=".", help="local directory to save into (default: .)")
+    p.add_argument("-r", "--recursive", action="store_true", help="remote_path is a directory")
+
+    p = sub.add_parser("delete", help="delete a remote file or directory")
+    p.add_argument("remote_path")
+    p.add_argument("-r", "--recursive", action="store_true", help="remote_path is a directory")
+
+    sub.add_parser("test", help="test the connection to the selected servers")
+    return parser
+
+
+def _setup_logging(verbosity: int):
+    import logging
+    level = logging.DEBUG if verbosity > 1 else logging.INFO if verbosity else logging.WARNING
+    logging.basicConfig(stream=sys.stderr, level=level,
+                        format='%(asctime)s [%(levelname)s] %(module)s: %(message)s')
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    _setup_logging(args.verbose)
+    out = JsonEmitter(interval=args.progress_interval, progress=not args.no_progress)
+
+    # 解析完参数 (--help / 参数错误) 之后才加载网络相关模块
+    from src.core.ftp_manager import FtpManager
+    from src.utils.config import CONFIG_FILE
+
+    manager = FtpManager(max_parallel_servers=args.parallel, per_host_limit=args.per_host_limit)
+    try:
+        if args.command == "distribute" and args.checksum != "none":
+            from src.core.checksums import available_algorithms
+            if args.checksum not in available_algorithms():
+                raise UsageError(f"Unsupported checksum {args.checksum!r}; "
+                                 f"choose from {', '.join(available_algorithms())} or none")
+        manager.load_servers(_load_server_dicts(args.config or CONFIG_FILE))
+        servers = _select_servers(manager, args.server)
+        if not servers:
+            raise UsageError("No enabled servers in config")
+        return COMMANDS[args.command](manager, servers, args, out)
+    except UsageError as e:
+        out.emit("error", message=str(e))
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        out.emit("error", message="Interrupted")
+        return EXIT_INTERRUPTED
+    finally:
+        manager.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
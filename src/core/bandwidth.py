@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Dict
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限速 (以预约时间实现)：rate 为每秒字节数，0 表示不限速
+
+    每次 consume 按到达顺序预约一段发送时间，在锁外睡眠到预约时刻，因此多个传输
+    共用一个桶时按块轮流获得带宽，大致平均分配。空闲后允许 burst 字节的突发。
+    """
+
+    def __init__(self, rate: float = 0, burst: float = 256 * 1024):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._next_free = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self.rate = max(0.0, float(rate))
+            # 新速率立即生效，不沿用旧速率下积压的预约
+            self._next_free = min(self._next_free, time.monotonic())
+
+    def consume(self, nbytes: int):
+        with self._lock:
+            rate = self.rate
+            if rate <= 0:
+                return
+            now = time.monotonic()
+            self._next_free = max(self._next_free, now) + nbytes / rate
+            wait = self._next_free - now - self.burst / rate
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BandwidthGovernor:
+    """全局与单服务器两级限速：每个数据块先过服务器自己的桶，再过全局共享的桶
+
+    单服务器上限取自 config.bandwidth_limit (KB/s)，运行中可通过 set_server_limit /
+    set_global_limit 调整，正在进行的传输从下一个数据块起按新速率执行。
+    """
+
+    def __init__(self, global_limit: float = 0):
+        self.global_bucket = TokenBucket(global_limit)
+        self._server_buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, config) -> TokenBucket:
+        bucket = self._server_buckets.get(config.server_id)
+        if bucket is None:
+            with self._lock:
+                bucket = self._server_buckets.get(config.server_id)
+                if bucket is None:
+                    bucket = TokenBucket(getattr(config, 'bandwidth_limit', 0) * 1024)
+                    self._server_buckets[config.server_id] = bucket
+        return bucket
+
+    def throttle(self, config, nbytes: int):
+        self._bucket(config).consume(nbytes)
+        self.global_bucket.consume(nbytes)
+
+    def set_global_limit(self, bytes_per_second: float):
+        logger.info(f"Global bandwidth limit set to {bytes_per_second / 1024:.0f} KB/s" if bytes_per_second else
+                    "Global bandwidth limit removed")
+        self.global_bucket.set_rate(bytes_per_second)
+
+    def set_server_limit(self, config, bytes_per_second: float):
+        self._bucket(config).set_rate(bytes_per_second)
@@ -0,0 +1,296 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Iterable, Optional, Set
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BroadcastReader:
+    """单台服务器对共享数据源的读取端，提供 storbinary 所需的 read() 接口"""
+
+    def __init__(self, source: "_BroadcastSource", key: Hashable):
+        self._source = source
+        self.key = key
+        self.offset = 0
+        self.spilled = False
+        self._fallback = None
+        self._closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.spilled:
+            data = self._source.next_chunk(self)
+            if data is not None:
+                self.offset += len(data)
+                return data
+        # 落后过多已被移出共享缓冲区，改为自行从本地文件续读
+        if self._fallback is None:
+            self._fallback = open(self._source.path, 'rb')
+            self._fallback.seek(self.offset)
+        data = self._fallback.read(self._source.chunk_size)
+        self.offset += len(data)
+        return data
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._fallback is not None:
+            self._fallback.close()
+        self._source.detach(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _BroadcastSource:
+    """一个本地文件的单次读取流：读线程写入有界环形缓冲区，各服务器按各自游标消费"""
+
+    def __init__(self, hub: "BroadcastHub", path: str, consumers: Iterable[Hashable]):
+        self.hub = hub
+        self.path = path
+        self.chunk_size = hub.chunk_size
+        self.capacity = hub.capacity
+        self.spill_timeout = hub.spill_timeout
+        self.pending: Set[Hashable] = set(consumers)
+        self.cursors: Dict[BroadcastReader, int] = {}
+        self.chunks: Deque[bytes] = deque()
+        self.base = 0
+        self.dropped = False
+        self.eof = False
+        self.stopped = False
+        self.error: Optional[BaseException] = None
+        self.cond = threading.Condition()
+        self._thread = threading.Thread(target=self._read_loop, name="broadcast-reader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def attach(self, key: Hashable) -> BroadcastReader:
+        reader = BroadcastReader(self, key)
+        with self.cond:
+            self.pending.discard(key)
+            if self.dropped or self.stopped:
+                # 缓冲区已丢弃开头数据，迟到的服务器直接走本地重读
+                reader.spilled = True
+            else:
+                self.cursors[reader] = 0
+            self.cond.notify_all()
+        return reader
+
+    def detach(self, reader: BroadcastReader):
+        with self.cond:
+            self.cursors.pop(reader, None)
+            self._check_finished()
+            self.cond.notify_all()
+        if self.stopped:
+            self.hub._remove_source(self)
+
+    def release(self, key: Hashable):
+        with self.cond:
+            self.pending.discard(key)
+            self._check_finished()
+            self.cond.notify_all()
+        if self.stopped:
+            self.hub._remove_source(self)
+
+    def _check_finished(self):
+        if not self.pending and not self.cursors:
+            self.stopped = True
+            # 已无读取端：剩余数据块不再有用，立即归还预算
+            while self.chunks:
+                self._pop()
+
+    def _push(self, data: bytes):
+        self.chunks.append(data)
+        self.hub._account(len(data))
+
+    def _pop(self):
+        data = self.chunks.popleft()
+        self.base += 1
+        self.hub._account(-len(data))
+
+    def _spill_pending(self, reason: str):
+        """尚未打开该文件的服务器不再占用缓冲区：之后打开时改为从本地文件重读"""
+        if self.pending:
+            logger.info(f"Broadcast of {self.path}: {len(self.pending)} consumers not attached ({reason}), "
+                        f"they will re-read locally")
+            self.pending.clear()
+        self.dropped = True
+        self._trim()
+        self._check_finished()
+
+    def next_chunk(self, reader: BroadcastReader) -> Optional[bytes]:
+        """返回该读取端的下一块数据；返回 None 表示已被溢出到本地重读"""
+        with self.cond:
+            while True:
+                if reader.spilled:
+                    return None
+                idx = self.cursors[reader]
+                if idx < self.base + len(self.chunks):
+                    data = self.chunks[idx - self.base]
+                    self.cursors[reader] = idx + 1
+                    # 读线程可能已结束 (文件已读完)，由读取端自行丢弃所有人都已消费的数据块
+                    self._trim()
+                    self.cond.notify_all()
+                    return data
+                if self.error is not None:
+                    raise self.error
+                if self.eof:
+                    return b''
+                self.cond.wait()
+
+    def _trim(self):
+        """丢弃所有读取端都已消费过的数据块"""
+        if self.pending and not self.dropped:
+            return
+        low = min(self.cursors.values()) if self.cursors else self.base + len(self.chunks)
+        while self.base < low and self.chunks:
+            self._pop()
+            self.dropped = True
+
+    def _full(self) -> bool:
+        # 本文件的环形缓冲区已满，或所有文件流合计超出整个分发任务的内存预算
+        return len(self.chunks) >= self.capacity or (bool(self.chunks) and self.hub._over_budget())
+
+    def _spill_laggards(self):
+        """缓冲区满且等待超时：把最慢的读取端移出共享流，避免拖慢其它服务器"""
+        for reader, idx in list(self.cursors.items()):
+            if idx <= self.base:
+                reader.spilled = True
+                del self.cursors[reader]
+                logger.info(f"Broadcast of {self.path}: consumer {reader.key} is lagging, spilling to local re-read")
+        # 尚未开始读取的服务器同样不再占用缓冲区
+        self.dropped = True
+
+    def _read_loop(self):
+        try:
+            with open(self.path, 'rb') as f:
+                # 缓冲区持续处于满状态的起始时间；持续过久说明最慢的服务器在拖累其它服务器
+                stall_since = None
+                while True:
+                    with self.cond:
+                        if len(self.chunks) < self.capacity - 1:
+                            stall_since = None
+                        while self._full() and not self.stopped:
+                            self._trim()
+                            if self.pending and self.hub._over_budget():
+                                self._spill_pending("memory budget exceeded")
+                            if not self._full():
+                                break
+                            now = time.monotonic()
+                            if stall_since is None:
+                                stall_since = now
+                            elif now - stall_since >= self.spill_timeout:
+                                self._spill_laggards()
+                                stall_since = None
+                                continue
+                            # 其它文件流释放预算时不会通知本条件变量，因此定期重新检查
+                            self.cond.wait(min(stall_since + self.spill_timeout - now, 0.05))
+                        if self.stopped:
+                            return
+                    data = f.read(self.chunk_size)
+                    with self.cond:
+                        if not data:
+                            self.eof = True
+                            # 文件已读完：还没打开它的服务器不再保留整份数据，打开时从本地重读
+                            self._spill_pending("end of file")
+                        elif not self.stopped:
+                            self._push(data)
+                            self._trim()
+                        self.cond.notify_all()
+                    if not data:
+                        return
+        except BaseException as e:
+            logger.error(f"Broadcast reader failed for {self.path}: {e}")
+            with self.cond:
+                self.error = e
+                self.cond.notify_all()
+        finally:
+            # 读完时 (或读取途中) 所有服务器都已离开或改为本地重读，不再保留该文件流
+            if self.stopped:
+                self.hub._remove_source(self)
+
+
+class BroadcastHub:
+    """一次分发任务中所有服务器共享的读取中心：每个本地文件只从磁盘读取一次
+
+    各服务器通过 ``open(path, key)`` 获取读取端；读线程在缓冲区满时等待最慢的
+    服务器 (背压)，等待超过 ``spill_timeout`` 后把落后的服务器切换为独立重读，
+    因此本地读取量在正常情况下为 O(文件大小)，而不是 O(文件大小 × 服务器数)。
+    文件读完时尚未打开它的服务器改为本地重读；所有文件流缓存的数据合计不超过
+    ``max_buffered`` 字节 (默认 4 个环形缓冲区)，超出时同样把未打开的服务器移出共享流。
+    """
+
+    def __init__(self, consumers: Iterable[Hashable] = (), chunk_size: int = 256 * 1024,
+                 capacity: int = 32, spill_timeout: float = 2.0, max_buffered: Optional[int] = None):
+        self.chunk_size = chunk_size
+        self.capacity = max(2, capacity)
+        self.spill_timeout = spill_timeout
+        self.max_buffered = max_buffered if max_buffered is not None else 4 * self.capacity * chunk_size
+        self._buffered = 0
+        self._budget_lock = threading.Lock()
+        self._consumers: Set[Hashable] = set(consumers)
+        self._sources: Dict[str, _BroadcastSource] = {}
+        # 每个文件已被哪些服务器打开或跳过：文件流结束后重新打开 (迟到的服务器) 时不再等待它们
+        self._passed: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def add_consumer(self, key: Hashable):
+        """某台服务器开始传输 (调度器限制并发时服务器会分批加入)，此后新开的文件流会等待它"""
+        with self._lock:
+            self._consumers.add(key)
+
+    def open(self, path: str, key: Hashable) -> BroadcastReader:
+        with self._lock:
+            passed = self._passed.setdefault(path, set())
+            passed.add(key)
+            source = self._sources.get(path)
+            if source is None or source.stopped:
+                source = _BroadcastSource(self, path, self._consumers - passed)
+                self._sources[path] = source
+                # 先登记打开者再启动读线程：小文件可能在 attach 之前就已读完
+                reader = source.attach(key)
+                source.start()
+                return reader
+        return source.attach(key)
+
+    def skip(self, path: str, key: Hashable):
+        """某台服务器不需要读取该文件 (例如远端已完整或改为续传)"""
+        with self._lock:
+            self._passed.setdefault(path, set()).add(key)
+            source = self._sources.get(path)
+            if source is None:
+                return
+        source.release(key)
+
+    def release(self, key: Hashable):
+        """某台服务器结束 (成功或失败)，后续数据不再为它保留"""
+        with self._lock:
+            self._consumers.discard(key)
+            sources = list(self._sources.values())
+        for source in sources:
+            source.release(key)
+
+    @property
+    def buffered(self) -> int:
+        """所有文件流当前缓存的字节数"""
+        with self._budget_lock:
+            return self._buffered
+
+    def _account(self, nbytes: int):
+        with self._budget_lock:
+            self._buffered += nbytes
+
+    def _over_budget(self) -> bool:
+        with self._budget_lock:
+            return self._buffered > self.max_buffered
+
+    def _remove_source(self, source: _BroadcastSource):
+        with self._lock:
+            if self._sources.get(source.path) is source:
+                del self._sources[source.path]
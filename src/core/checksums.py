@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from src.utils.config import get_data_dir
+from src.utils.logger import get_logger
+
+try:
+    import xxhash
+except ImportError:  # 可选依赖：未安装时不提供 xxh64
+    xxhash = None
+
+logger = get_logger(__name__)
+
+DEFAULT_ALGORITHM = "sha256"
+# data/checksums/ 下每种清单 (upload/download) 保留的最近文件数
+MANIFEST_KEEP = 50
+
+
+class _Crc32:
+    """与 hashlib 对象接口一致的 CRC32"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data: bytes):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self) -> str:
+        return f"{self.value & 0xffffffff:08x}"
+
+
+def available_algorithms() -> List[str]:
+    """可选的摘要算法；xxh64 仅在安装了 xxhash 时可用"""
+    names = ["sha256", "crc32"]
+    if xxhash is not None:
+        names.append("xxh64")
+    return names
+
+
+def new_hasher(algorithm: str):
+    """返回支持 update()/hexdigest() 的摘要对象"""
+    if algorithm == "crc32":
+        return _Crc32()
+    if algorithm == "xxh64":
+        if xxhash is None:
+            raise ValueError("xxh64 requires the optional 'xxhash' package")
+        return xxhash.xxh64()
+    return hashlib.new(algorithm)
+
+
+def local_digest(path: str, algorithm: str, block_size: int = 1024 * 1024) -> str:
+    """读取整个本地文件计算摘要 (没有现成的流式摘要时使用)"""
+    hasher = new_hasher(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class DigestCache:
+    """本地文件摘要缓存，按 (路径, 算法, 大小, mtime) 索引，同一文件同一算法只计算一次
+
+    摘要可以由上传/下载在传输数据块时顺带算出 (claim -> record)，也可以由 get() 读取文件计算；
+    某个键正在被计算时，其它线程的 get() 等待结果而不是重复读取文件。
+    最多保留 max_entries 个摘要，超出时淘汰最久未使用的。
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._digests: "OrderedDict[Tuple[str, str, int, float], str]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str, int, float], threading.Event] = {}
+
+    def _lookup(self, key: Tuple[str, str, int, float]) -> Optional[str]:
+        """调用方须持有 self._lock"""
+        digest = self._digests.get(key)
+        if digest is not None:
+            self._digests.move_to_end(key)
+        return digest
+
+    def peek(self, path: str, algorithm: str, size: int, mtime: float) -> Optional[str]:
+        with self._lock:
+            return self._lookup((path, algorithm, size, mtime))
+
+    def claim(self, path: str, algorithm: str, size: int, mtime: float) -> bool:
+        """返回 True 表示由调用方负责计算该摘要 (之后必须 record 或 release)"""
+        key = (path, algorithm, size, mtime)
+        with self._lock:
+            if key in self._digests or key in self._pending:
+                return False
+            self._pending[key] = threading.Event()
+            return True
+
+    def record(self, path: str, algorithm: str, size: int, mtime: float, digest: str):
+        key = (path, algorithm, size, mtime)
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+            event = self._pending.pop(key, None)
+        if event:
+            event.set()
+
+    def release(self, path: str, algorithm: str, size: int, mtime: float):
+        """放弃计算 (例如传输失败)，等待中的 get() 会自行读取文件计算"""
+        with self._lock:
+            event = self._pending.pop((path, algorithm, size, mtime), None)
+        if event:
+            event.set()
+
+    def get(self, path: str, algorithm: str, size: int, mtime: float) -> str:
+        while True:
+            with self._lock:
+                digest = self._lookup((path, algorithm, size, mtime))
+                if digest is not None:
+                    return digest
+                event = self._pending.get((path, algorithm, size, mtime))
+            if event is None:
+                if self.claim(path, algorithm, size, mtime):
+                    break
+                continue
+            event.wait()
+        try:
+            digest = local_digest(path, algorithm)
+        except BaseException:
+            self.release(path, algorithm, size, mtime)
+            raise
+        self.record(path, algorithm, size, mtime, digest)
+        return digest
+
+
+class ChecksumManifest:
+    """一次传输任务的摘要清单，完成后写入 data/checksums/ 下的 JSON 文件
+
+    files 以本地路径为键，记录大小、摘要以及各服务器上的远端路径与传输结果。
+    默认目录下每种清单只保留最近 MANIFEST_KEEP 个文件，更早的在保存时删除。
+    """
+
+    def __init__(self, kind: str, algorithm: str):
+        self.kind = kind
+        self.algorithm = algorithm
+        self.created = time.time()
+        self._lock = threading.Lock()
+        self.files: Dict[str, dict] = {}
+        # save() 之后为清单文件路径
+        self.path: Optional[str] = None
+
+    def add(self, local_path: str, size: int, digest: Optional[str], server: str = "",
+            remote_path: str = "", status: str = ""):
+        with self._lock:
+            entry = self.files.get(local_path)
+            if entry is None:
+                entry = self.files[local_path] = {"size": size, "digest": digest, "servers": {}}
+            elif digest and not entry["digest"]:
+                entry["digest"] = digest
+            if server:
+                entry["servers"][server] = {"remote_path": remote_path, "status": status}
+
+    def fill_digests(self, cache: DigestCache, mtimes: Dict[str, float]):
+        """用缓存中已有的摘要补全 (例如另一台服务器后来才传完同一文件)，不读取文件"""
+        with self._lock:
+            for local_path, entry in self.files.items():
+                if not entry["digest"] and local_path in mtimes:
+                    entry["digest"] = cache.peek(local_path, self.algorithm, entry["size"], mtimes[local_path])
+
+    def digests(self) -> Dict[str, Optional[str]]:
+        with self._lock:
+            return {path: entry["digest"] for path, entry in self.files.items()}
+
+    def save(self, path: Optional[str] = None, keep: int = MANIFEST_KEEP) -> str:
+        """写入清单文件；未指定 path 时写入 data/checksums/ 并删除超出 keep 个的旧清单"""
+        prune = path is None
+        if path is None:
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.created))
+            path = os.path.join(get_data_dir("checksums"), f"{self.kind}-{stamp}-{os.urandom(3).hex()}.json")
+        with self._lock:
+            data = {"kind": self.kind, "algorithm": self.algorithm, "created": self.created, "files": self.files}
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+        self.path = path
+        logger.info(f"Wrote {self.kind} checksum manifest ({len(self.files)} files) to {path}")
+        if prune:
+            self._prune(os.path.dirname(path), keep)
+        return path
+
+    def _prune(self, directory: str, keep: int):
+        """删除同类清单中除最近 keep 个以外的文件"""
+        prefix = f"{self.kind}-"
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".json")]
+            paths = sorted((os.path.join(directory, name) for name in names),
+                           key=lambda p: (os.path.getmtime(p), p), reverse=True)
+        except OSError as e:
+            logger.warning(f"Failed to list checksum manifests in {directory}: {e}")
+            return
+        for old in paths[max(1, keep):]:
+            if old == self.path:
+                continue
+            try:
+                os.remove(old)
+            except OSError as e:
+                logger.warning(f"Failed to remove old checksum manifest {old}: {e}")
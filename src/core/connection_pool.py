@@ -0,0 +1,248 @@
+import ftplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+from src.core.modez import disable_mode_z
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PoolTimeout(TimeoutError):
+    """在限定时间内没有空闲会话 (该服务器的会话都已借出)"""
+
+
+class _PooledConnection:
+    """池中的一条 FTP 会话及其元数据"""
+    __slots__ = ("ftp", "home", "pool", "created", "last_used")
+
+    def __init__(self, ftp: ftplib.FTP, home: str, pool: "_ServerPool"):
+        self.ftp = ftp
+        self.home = home
+        self.pool = pool
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+
+class _ServerPool:
+    """单台服务器的空闲连接队列与计数"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self.idle: Deque[_PooledConnection] = deque()
+        self.leased = 0
+        # 被 close_server 废弃后置位：借出中的会话归还时直接关闭
+        self.closed = False
+        self.cond = threading.Condition()
+
+
+class FtpConnectionPool:
+    """按服务器复用已登录的 FTP 会话，避免每次操作都重新 connect + login
+
+    - 每台服务器最多 ``config.max_connections`` 条会话，超出时 checkout 阻塞等待
+    - 复用前通过 ``cwd(home)`` 做健康检查并恢复初始目录 (以及 MODE S)，失败则自动重连
+    - 后台线程对空闲会话发送 NOOP 保活，超过 ``idle_timeout`` 的会话被回收
+    """
+
+    def __init__(self, connect_func: Callable[..., ftplib.FTP], idle_timeout: float = 120.0,
+                 keepalive_interval: float = 30.0):
+        self._connect = connect_func
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self._pools: Dict[Tuple, _ServerPool] = {}
+        self._leased: Dict[int, _PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stop_event = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    def _get_pool(self, config) -> _ServerPool:
+        key = config.connection_key()
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _ServerPool(getattr(config, 'max_connections', 4))
+                self._pools[key] = pool
+            else:
+                pool.max_size = max(1, getattr(config, 'max_connections', pool.max_size))
+            if self._keepalive_thread is None and not self._closed:
+                self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name="ftp-pool-keepalive", daemon=True)
+                self._keepalive_thread.start()
+            return pool
+
+    @staticmethod
+    def _close_quietly(ftp: ftplib.FTP):
+        try:
+            ftp.quit()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+
+    def _open(self, config, timeout: int, pool: _ServerPool) -> _PooledConnection:
+        ftp = self._connect(config, timeout=timeout)
+        try:
+            home = ftp.pwd()
+        except Exception:
+            home = "/"
+        return _PooledConnection(ftp, home, pool)
+
+    def checkout(self, config, timeout: int = 30) -> ftplib.FTP:
+        """从池中取出一条可用会话 (必要时新建)，用完必须调用 checkin 归还"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        pool = self._get_pool(config)
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = None
+            with pool.cond:
+                while not pool.closed and not pool.idle and pool.leased >= pool.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No free FTP connection for {config.host} within {timeout}s")
+                    pool.cond.wait(remaining)
+                if pool.closed:
+                    # 等待期间该服务器的池已被废弃 (配置被修改或删除)，改到新池中借出
+                    pool = self._get_pool(config)
+                    continue
+                if pool.idle:
+                    # 后进先出，优先复用最近使用过的热连接
+                    entry = pool.idle.pop()
+                pool.leased += 1
+
+            if entry is not None:
+                try:
+                    entry.ftp.cwd(entry.home)
+                    disable_mode_z(entry.ftp)
+                except Exception as e:
+                    logger.debug(f"Pooled connection to {config.host} is stale, reconnecting: {e}")
+                    self._close_quietly(entry.ftp)
+                    self._release_slot(pool)
+                    continue
+            else:
+                try:
+                    entry = self._open(config, timeout, pool)
+                except Exception:
+                    self._release_slot(pool)
+                    raise
+
+            with self._lock:
+                self._leased[id(entry.ftp)] = entry
+            return entry.ftp
+
+    def _release_slot(self, pool: _ServerPool):
+        with pool.cond:
+            pool.leased -= 1
+            pool.cond.notify()
+
+    def checkin(self, config, ftp: ftplib.FTP, discard: bool = False):
+        """归还会话；discard=True 时关闭该会话而不放回池中"""
+        with self._lock:
+            entry = self._leased.pop(id(ftp), None)
+        if entry is None:
+            self._close_quietly(ftp)
+            return
+        pool = entry.pool
+        if discard or self._closed or pool.closed:
+            self._close_quietly(ftp)
+            self._release_slot(pool)
+            return
+        entry.last_used = time.monotonic()
+        with pool.cond:
+            pool.leased -= 1
+            pool.idle.append(entry)
+            pool.cond.notify()
+
+    @contextmanager
+    def session(self, config, timeout: int = 30) -> Iterator[ftplib.FTP]:
+        """with 语法借出会话；出现连接级异常时丢弃该会话"""
+        ftp = self.checkout(config, timeout=timeout)
+        discard = False
+        try:
+            yield ftp
+        except ftplib.error_perm:
+            # 5xx 应答不影响控制连接，会话仍可复用
+            raise
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            self.checkin(config, ftp, discard=discard)
+
+    def close_server(self, config):
+        """关闭某台服务器的全部空闲会话 (例如配置被删除或修改)
+
+        借出中的会话在归还时关闭，之后的 checkout 使用新建的池。
+        """
+        with self._lock:
+            pool = self._pools.pop(config.connection_key(), None)
+        if pool is None:
+            return
+        with pool.cond:
+            pool.closed = True
+            entries = list(pool.idle)
+            pool.idle.clear()
+            pool.cond.notify_all()
+        for entry in entries:
+            self._close_quietly(entry.ftp)
+
+    def close_all(self):
+        """关闭所有空闲会话并停止保活线程"""
+        self._closed = True
+        self._stop_event.set()
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            with pool.cond:
+                entries = list(pool.idle)
+                pool.idle.clear()
+                pool.cond.notify_all()
+            for entry in entries:
+                self._close_quietly(entry.ftp)
+
+    def _keepalive_loop(self):
+        interval = max(1.0, min(self.keepalive_interval, self.idle_timeout) / 2)
+        while not self._stop_event.wait(interval):
+            self._sweep()
+
+    def _sweep(self):
+        """回收超时的空闲会话，并对其余空闲会话发送 NOOP 保活"""
+        now = time.monotonic()
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            expired, to_ping = [], []
+            with pool.cond:
+                keep: Deque[_PooledConnection] = deque()
+                for entry in pool.idle:
+                    idle_for = now - entry.last_used
+                    if idle_for >= self.idle_timeout:
+                        expired.append(entry)
+                    elif idle_for >= self.keepalive_interval:
+                        to_ping.append(entry)
+                    else:
+                        keep.append(entry)
+                pool.idle = keep
+                # 正在 NOOP 的会话临时计为借出，避免超出上限
+                pool.leased += len(to_ping)
+
+            for entry in expired:
+                self._close_quietly(entry.ftp)
+
+            alive = []
+            for entry in to_ping:
+                try:
+                    entry.ftp.voidcmd('NOOP')
+                    alive.append(entry)
+                except Exception:
+                    self._close_quietly(entry.ftp)
+
+            with pool.cond:
+                pool.leased -= len(to_ping)
+                # NOOP 只是保活，不刷新 last_used，长期不用的会话仍会过期
+                pool.idle.extendleft(alive)
+                pool.cond.notify_all()
@@ -0,0 +1,132 @@
+import ftplib
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+from src.core.listing import MLSD_UNSUPPORTED_CODES, TYPE_FILE, iter_mlsd, parse_ftp_time
+from src.utils.config import get_data_dir
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PushManifest:
+    """某台服务器上次成功推送的文件清单：远端路径 -> 推送时本地文件的 (size, mtime)
+
+    本地文件的 size/mtime 与清单一致时只需确认远端文件仍在且大小一致，不再比较修改时间。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load push manifest {path}: {e}")
+
+    @classmethod
+    def for_server(cls, config) -> "PushManifest":
+        key = f"{config.host}:{config.port}:{config.username}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        return cls(os.path.join(get_data_dir("manifests"), f"{digest}.json"))
+
+    def is_unchanged(self, remote_path: str, size: int, mtime: float) -> bool:
+        entry = self._entries.get(remote_path)
+        return entry is not None and entry[0] == size and entry[1] == mtime
+
+    def record(self, remote_path: str, size: int, mtime: float):
+        with self._lock:
+            self._entries[remote_path] = [size, mtime]
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._entries)
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save push manifest {self.path}: {e}")
+
+
+class DeltaPlanner:
+    """增量分发判定：先查本地推送清单，再用 MLSD (或 SIZE/MDTM) 比对远端文件"""
+
+    def __init__(self, config, manifest: Optional[PushManifest] = None):
+        self.config = config
+        self.manifest = manifest or PushManifest.for_server(config)
+        self._listings: Dict[str, Dict[str, Tuple[Optional[int], Optional[float]]]] = {}
+        self._lock = threading.Lock()
+        self._mlsd_supported = True
+
+    def _remote_facts(self, ftp: ftplib.FTP, remote_dir: str, name: str, remote_path: str,
+                      need_mtime: bool = True) -> Optional[Tuple[Optional[int], Optional[float]]]:
+        if self._mlsd_supported:
+            with self._lock:
+                listing = self._listings.get(remote_dir)
+            if listing is None:
+                try:
+                    listing = {entry.name: (entry.size if entry.size >= 0 else None, entry.mtime)
+                               for entry in iter_mlsd(ftp, remote_dir) if entry.type == TYPE_FILE}
+                except ftplib.error_perm as e:
+                    if str(e).startswith(MLSD_UNSUPPORTED_CODES):
+                        logger.info(f"MLSD unavailable on {self.config.host}, comparing with SIZE/MDTM: {e}")
+                        self._mlsd_supported = False
+                        listing = None
+                    else:
+                        # 550 等：远端目录尚不存在或无法列出，其中的文件都需要上传
+                        logger.debug(f"Cannot list {remote_dir} on {self.config.host}, treating it as empty: {e}")
+                        listing = {}
+                if listing is not None:
+                    with self._lock:
+                        self._listings[remote_dir] = listing
+            if listing is not None:
+                return listing.get(name)
+
+        try:
+            size = ftp.size(remote_path)
+        except (ftplib.error_perm, ftplib.error_reply):
+            return None
+        if not need_mtime:
+            return size, None
+        try:
+            mtime = parse_ftp_time(ftp.voidcmd(f'MDTM {remote_path}')[4:].strip())
+        except (ftplib.error_perm, ftplib.error_reply):
+            mtime = None
+        return size, mtime
+
+    def should_skip(self, ftp: ftplib.FTP, job) -> bool:
+        """返回 True 表示远端文件与本地一致无需传输"""
+        remote_path = job.remote_path
+        # 清单命中也要确认远端文件仍在且大小一致 (可能已被删除或被其它途径改写)；
+        # 同一目录的 MLSD 结果在本次分发中缓存，每个目录只列举一次
+        pushed = self.manifest.is_unchanged(remote_path, job.size, job.mtime)
+        facts = self._remote_facts(ftp, job.remote_dir, job.name, remote_path, need_mtime=not pushed)
+        if facts is None:
+            return False
+        remote_size, remote_mtime = facts
+        if remote_size != job.size:
+            return False
+        if pushed:
+            return True
+        # 大小一致且远端不早于本地修改时间，视为已是最新 (远端时间通常只精确到秒)
+        if remote_mtime is None or remote_mtime < int(job.mtime):
+            return False
+        self.manifest.record(remote_path, job.size, job.mtime)
+        return True
+
+    def record(self, job):
+        self.manifest.record(job.remote_path, job.size, job.mtime)
+
+    def save(self):
+        self.manifest.save()
@@ -0,0 +1,173 @@
+import ftplib
+import posixpath
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from src.core.listing import DirectoryLister
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 失败明细最多保留的条数，避免超大目录删除失败时摘要过长
+_MAX_REPORTED_FAILURES = 20
+
+
+class DeleteSummary:
+    """一次递归删除的结果：成功删除的文件/目录数与失败明细"""
+    __slots__ = ("root", "files_deleted", "dirs_deleted", "failures", "failure_count", "dirs_skipped")
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files_deleted = 0
+        self.dirs_deleted = 0
+        self.failures: List[Tuple[str, str]] = []
+        self.failure_count = 0
+        # 因其下有删除失败的条目而未尝试 RMD 的目录数
+        self.dirs_skipped = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.failure_count == 0
+
+    def describe(self) -> str:
+        text = f"Deleted {self.files_deleted} files and {self.dirs_deleted} directories"
+        if self.ok:
+            return text
+        lines = [f"{text}; {self.failure_count} failed, {self.dirs_skipped} directories left in place:"]
+        lines.extend(f"  {path}: {msg}" for path, msg in self.failures)
+        if self.failure_count > len(self.failures):
+            lines.append(f"  ... and {self.failure_count - len(self.failures)} more")
+        return "\n".join(lines)
+
+
+class DirectoryDeleter:
+    """并行递归删除远端目录
+
+    1. 多条会话用 MLSD 广度优先列举整棵目录树 (不支持时解析 LIST)，符号链接按文件删除；
+    2. 多条会话并发 DELE 所有文件；
+    3. 按深度从深到浅 RMD 目录，同一深度的目录并发删除。
+    单个条目失败不会中止整个删除：失败被记录，其上级目录保留，最后汇总为 DeleteSummary。
+    """
+
+    def __init__(self, pool, config, workers: int = 4, progress_callback: Optional[Callable] = None):
+        self.pool = pool
+        self.config = config
+        self.workers = max(1, min(workers, getattr(config, 'max_connections', workers)))
+        # progress_callback(host, 已删除条目数, 已知条目总数)；总数随列举推进而增长
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+        self._lister = DirectoryLister(config.host)
+        self._files: List[str] = []
+        self._dirs: List[Tuple[int, str]] = []
+        # 有条目删除失败的目录 (及其所有上级)，这些目录不再尝试 RMD
+        self._blocked: Set[str] = set()
+        self._done = 0
+        self._summary: Optional[DeleteSummary] = None
+
+    def _report(self, count: int = 1):
+        with self._lock:
+            self._done += count
+            done, total = self._done, len(self._files) + len(self._dirs)
+        if self.progress_callback:
+            self.progress_callback(self.config.host, done, total)
+
+    def _fail(self, path: str, error: BaseException):
+        logger.warning(f"Delete {path} on {self.config.host} failed: {error}")
+        summary = self._summary
+        with self._lock:
+            summary.failure_count += 1
+            if len(summary.failures) < _MAX_REPORTED_FAILURES:
+                summary.failures.append((path, str(error)))
+            # 上级目录必然非空，不再尝试删除
+            parent = path
+            while parent != summary.root and parent not in ('/', ''):
+                parent = posixpath.dirname(parent)
+                self._blocked.add(parent)
+            self._blocked.add(path)
+
+    def _run(self, items, handler: Callable[[ftplib.FTP, "queue.Queue", object], None], name: str):
+        """用 self.workers 条会话并发处理 items；handler 可向队列追加新条目 (用于列举)"""
+        jobs: "queue.Queue" = queue.Queue()
+        for item in items:
+            jobs.put(item)
+        if jobs.empty():
+            return
+
+        def worker():
+            ftp = None
+            try:
+                while True:
+                    item = jobs.get()
+                    try:
+                        if item is None:
+                            return
+                        if ftp is None:
+                            ftp = self.pool.checkout(self.config, timeout=30)
+                        handler(ftp, jobs, item)
+                    except BaseException as e:
+                        path = item[1] if isinstance(item, tuple) else item
+                        self._fail(path, e)
+                        if ftp is not None and not isinstance(e, ftplib.error_perm):
+                            # 连接层面的错误：丢弃该会话，下一个条目重新借用
+                            self.pool.checkin(self.config, ftp, discard=True)
+                            ftp = None
+                    finally:
+                        jobs.task_done()
+            finally:
+                if ftp is not None:
+                    self.pool.checkin(self.config, ftp)
+
+        threads = [threading.Thread(target=worker, name=f"delete-{name}-{self.config.host}-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        jobs.join()
+        for _ in threads:
+            jobs.put(None)
+        for t in threads:
+            t.join()
+
+    def _list_dir(self, ftp: ftplib.FTP, jobs: "queue.Queue", item: Tuple[int, str]):
+        depth, r_dir = item
+        subdirs = []
+        files = []
+        for entry in self._lister.iter(ftp, r_dir):
+            path = f"{r_dir.rstrip('/')}/{entry.name}"
+            (subdirs if entry.is_dir else files).append(path)
+        with self._lock:
+            self._files.extend(files)
+            self._dirs.extend((depth + 1, d) for d in subdirs)
+        for d in subdirs:
+            jobs.put((depth + 1, d))
+        self._report(0)
+
+    def _delete_file(self, ftp: ftplib.FTP, jobs: "queue.Queue", path: str):
+        ftp.delete(path)
+        with self._lock:
+            self._summary.files_deleted += 1
+        self._report()
+
+    def _remove_dir(self, ftp: ftplib.FTP, jobs: "queue.Queue", item: Tuple[int, str]):
+        ftp.rmd(item[1])
+        with self._lock:
+            self._summary.dirs_deleted += 1
+        self._report()
+
+    def run(self, remote_dir: str) -> DeleteSummary:
+        remote_dir = remote_dir.rstrip('/') or '/'
+        self._summary = summary = DeleteSummary(remote_dir)
+        self._dirs.append((0, remote_dir))
+        self._run([(0, remote_dir)], self._list_dir, "list")
+        logger.info(f"Deleting {len(self._files)} files and {len(self._dirs)} directories under {remote_dir} "
+                    f"on {self.config.host}")
+        self._run(self._files, self._delete_file, "dele")
+
+        # 从最深一层开始，同层目录并发 RMD；列举或删除失败的目录及其上级保留
+        by_depth: Dict[int, List[str]] = {}
+        for depth, path in self._dirs:
+            by_depth.setdefault(depth, []).append(path)
+        for depth in sorted(by_depth, reverse=True):
+            level = [(depth, path) for path in by_depth[depth] if path not in self._blocked]
+            summary.dirs_skipped += len(by_depth[depth]) - len(level)
+            self._run(level, self._remove_dir, "rmd")
+        return summary
@@ -0,0 +1,161 @@
+import ftplib
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+from src.core import modez
+from src.core.checksums import ChecksumManifest, new_hasher
+from src.core.listing import DirectoryLister
+from src.core.metrics import PHASE_CONNECT, PHASE_MKDIR, PHASE_TRANSFER, TransferMetrics
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_LIST_JOB = 0
+_FILE_JOB = 1
+_STOP = 2
+
+
+class DirectoryDownloader:
+    """广度优先的并行目录下载引擎
+
+    多条会话共享一个优先队列：目录列举任务优先于文件下载任务，因此列举会尽早推进、
+    总大小尽快确定，同时已发现的文件立即开始下载，列举与传输互相重叠。
+    """
+
+    def __init__(self, pool, config, workers: int = 3, progress_callback: Optional[Callable] = None,
+                 file_progress_callback: Optional[Callable] = None, metrics: Optional[TransferMetrics] = None,
+                 skip_complete: bool = False, throttle: Optional[Callable[[int], None]] = None,
+                 checksums: Optional[ChecksumManifest] = None):
+        self.pool = pool
+        self.config = config
+        self.workers = max(1, min(workers, getattr(config, 'max_connections', workers)))
+        self.progress_callback = progress_callback
+        self.file_progress_callback = file_progress_callback
+        self.metrics = metrics or TransferMetrics(config, "download")
+        # 重试时跳过本地已存在且大小与远端一致的文件
+        self.skip_complete = skip_complete
+        # 每个数据块写入后调用 throttle(nbytes) 限速
+        self.throttle = throttle
+        # 传入时对每个下载的文件顺带计算摘要并记入清单
+        self.checksums = checksums
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._errors: List[BaseException] = []
+        self._lister = DirectoryLister(config.host)
+        self.total_size = 0
+        self.downloaded_size = 0
+        self.file_count = 0
+
+    def _put(self, kind: int, *payload):
+        self._queue.put((kind, next(self._seq), payload))
+
+    def _report_total(self):
+        # 在锁内上报，保证各 worker 报出的累计进度按递增顺序到达
+        with self._lock:
+            done, total = self.downloaded_size, self.total_size
+            self.metrics.update(done, total)
+            if self.progress_callback:
+                self.progress_callback(self.config.host, done, total)
+
+    def _handle_dir(self, ftp: ftplib.FTP, r_dir: str, l_dir: str):
+        os.makedirs(l_dir, exist_ok=True)
+        with self.metrics.phase(PHASE_MKDIR):
+            entries = self._lister.list(ftp, r_dir)
+        for entry in entries:
+            item_r_path = f"{r_dir.rstrip('/')}/{entry.name}"
+            item_l_path = os.path.join(l_dir, entry.name)
+            size = max(entry.size, 0)
+            if entry.is_dir:
+                self._put(_LIST_JOB, item_r_path, item_l_path)
+            else:
+                with self._lock:
+                    self.total_size += size
+                    self.file_count += 1
+                self._put(_FILE_JOB, item_r_path, item_l_path, size)
+        self._report_total()
+
+    def _handle_file(self, ftp: ftplib.FTP, r_file: str, l_file: str, size: int):
+        if self.skip_complete and size and os.path.isfile(l_file) and os.path.getsize(l_file) == size:
+            with self._lock:
+                self.downloaded_size += size
+            if self.checksums:
+                self.checksums.add(l_file, size, None, self.config.server_id, r_file, "complete")
+            self._report_total()
+            return
+        logger.info(f"Downloading {r_file} -> {l_file}")
+        file_done = 0
+        hasher = new_hasher(self.checksums.algorithm) if self.checksums else None
+
+        def handle_block(block):
+            nonlocal file_done
+            f.write(block)
+            if hasher:
+                hasher.update(block)
+            file_done += len(block)
+            if self.throttle:
+                self.throttle(len(block))
+            with self._lock:
+                self.downloaded_size += len(block)
+            if self.file_progress_callback:
+                self.file_progress_callback(self.config.host, r_file, file_done, size)
+            self._report_total()
+
+        started = time.time()
+        with self.metrics.phase(PHASE_TRANSFER), open(l_file, 'wb') as f:
+            if getattr(self.config, 'mode_z', False):
+                modez.enable_mode_z(ftp, self.config.mode_z_level)
+            modez.retrbinary(ftp, f'RETR {r_file}', handle_block, 32768)
+        self.metrics.record_file(r_file, file_done, "downloaded", started, time.time())
+        if self.checksums:
+            self.checksums.add(l_file, file_done, hasher.hexdigest(), self.config.server_id, r_file, "downloaded")
+
+    def _worker(self):
+        ftp = None
+        discard = False
+        try:
+            while True:
+                kind, _, payload = self._queue.get()
+                try:
+                    if kind == _STOP:
+                        return
+                    if self._stop_event.is_set():
+                        continue
+                    if ftp is None:
+                        with self.metrics.phase(PHASE_CONNECT):
+                            ftp = self.pool.checkout(self.config, timeout=30)
+                        ftp.voidcmd('TYPE I')
+                    if kind == _LIST_JOB:
+                        self._handle_dir(ftp, *payload)
+                    else:
+                        self._handle_file(ftp, *payload)
+                except BaseException as e:
+                    discard = not isinstance(e, ftplib.error_perm)
+                    with self._lock:
+                        self._errors.append(e)
+                    self._stop_event.set()
+                finally:
+                    self._queue.task_done()
+        finally:
+            if ftp is not None:
+                self.pool.checkin(self.config, ftp, discard=discard)
+
+    def run(self, remote_dir: str, local_dir: str):
+        """把 remote_dir 下载为 local_dir；任一文件失败则停止并抛出第一个错误"""
+        self._put(_LIST_JOB, remote_dir, local_dir)
+        threads = [threading.Thread(target=self._worker, name=f"download-{self.config.host}-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        self._queue.join()
+        # 所有任务完成后用哨兵通知各会话退出
+        for _ in threads:
+            self._put(_STOP)
+        for t in threads:
+            t.join()
+        if self._errors:
+            raise self._errors[0]
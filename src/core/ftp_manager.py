@@ -1,13 +1,46 @@
 import ftplib
+import hashlib
 import os
+import posixpath
+import queue
 import threading
-from typing import List, Callable, Optional, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, List, Callable, Optional, Tuple
+from src.core.bandwidth import BandwidthGovernor
+from src.core.checksums import DEFAULT_ALGORITHM, ChecksumManifest, DigestCache, new_hasher
+from src.core.connection_pool import FtpConnectionPool, PoolTimeout
+from src.core.listing import DirectoryLister, ListEntry
+from src.core.listing_cache import ListingCache, normalize_remote_path
+from src.core import modez
+from src.core.local_manifest import LocalManifest
+from src.core.metrics import (PHASE_CONNECT, PHASE_MKDIR, PHASE_TRANSFER, MetricsRegistry,
+                              TransferMetrics)
+from src.core.progress import ProgressAggregator
+from src.core.remote_dirs import RemoteDirPlanner, resolve_remote_dir
+from src.core.retry import (CircuitBreakerRegistry, ConnectError, LoginError, build_policies,
+                            call_with_retry)
+from src.core.scheduler import CANCELLED, JobHandle, ScheduledTask, TransferScheduler
 from src.utils.logger import get_logger
 
+# 广播、增量、目录下载/删除、分段下载、校验与索引等功能模块在对应方法中按需导入，
+# 只列目录或上传的调用方 (例如命令行) 不为用不到的功能付出导入时间
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from src.core.broadcast import BroadcastHub
+    from src.core.delta import DeltaPlanner
+    from src.core.remote_index import IndexChanges, RemoteIndex
+    from src.core.verify import VerifyReport
+
 logger = get_logger(__name__)
 
 class FtpServerConfig:
-    def __init__(self, host: str, port: int, username: str, password: str, name: str = "", passive_mode: bool = True, remote_dir: str = "", enabled: bool = True):
+    def __init__(self, host: str, port: int, username: str, password: str, name: str = "", passive_mode: bool = True, remote_dir: str = "", enabled: bool = True, max_connections: int = 4, upload_workers: int = 3,
+                 download_segments: int = 4, download_workers: int = 3, server_id: str = "", priority: int = 0,
+                 retry_policies: Optional[dict] = None, bandwidth_limit: int = 0, mode_z: bool = False,
+                 mode_z_level: int = modez.DEFAULT_LEVEL):
+        # 稳定的服务器标识：多个配置可能共用同一个 host，UI 按此 ID 定位对应行；
+        # 配置里没有 id 时由连接参数推导，同一份配置每次加载得到相同的 ID (推送清单、校验和记录按它关联)
+        self.server_id = server_id or self.derive_id(host, port, username, remote_dir)
         self.host = host
         self.port = port
         self.username = username
@@ -16,9 +49,35 @@ class FtpServerConfig:
         self.passive_mode = passive_mode
         self.remote_dir = remote_dir
         self.enabled = enabled
+        self.max_connections = max_connections
+        # 单台服务器并发上传的会话数 (受 max_connections 限制)
+        self.upload_workers = upload_workers
+        # 大文件分段并行下载的段数 (受 max_connections 限制)
+        self.download_segments = download_segments
+        # 目录下载时并行工作的会话数
+        self.download_workers = download_workers
+        # 分发优先级：数值越大越先开始 (例如金丝雀节点)
+        self.priority = priority
+        # 按失败类别覆盖默认重试策略，例如 {"transfer": {"retries": 5, "delay": 2}}
+        self.retry_policies = retry_policies or {}
+        # 单台服务器的带宽上限 (KB/s)，0 表示不限速；全局上限由 FtpManager.bandwidth 控制
+        self.bandwidth_limit = bandwidth_limit
+        # 服务器在 FEAT 中声明 MODE Z 时以 deflate 压缩传输 (适合文本类文件)，否则自动使用 MODE S
+        self.mode_z = mode_z
+        self.mode_z_level = mode_z_level
+
+    @staticmethod
+    def derive_id(host: str, port: int, username: str, remote_dir: str) -> str:
+        key = f"{host}\0{port}\0{username}\0{remote_dir}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def connection_key(self) -> tuple:
+        """连接池键：登录参数相同的配置共享同一组会话"""
+        return (self.host, self.port, self.username, self.password, self.passive_mode)
 
     def to_dict(self) -> dict:
         return {
+            "id": self.server_id,
             "name": self.name,
             "host": self.host,
             "port": self.port,
@@ -26,7 +85,16 @@ class FtpServerConfig:
             "password": self.password,
             "passive_mode": self.passive_mode,
             "remote_dir": self.remote_dir,
-            "enabled": self.enabled
+            "enabled": self.enabled,
+            "max_connections": self.max_connections,
+            "upload_workers": self.upload_workers,
+            "download_segments": self.download_segments,
+            "download_workers": self.download_workers,
+            "priority": self.priority,
+            "retry_policies": self.retry_policies,
+            "bandwidth_limit": self.bandwidth_limit,
+            "mode_z": self.mode_z,
+            "mode_z_level": self.mode_z_level
         }
 
     @classmethod
@@ -39,37 +107,197 @@ class FtpServerConfig:
             name=data.get("name", ""),
             passive_mode=data.get("passive_mode", True),
             remote_dir=data.get("remote_dir", ""),
-            enabled=data.get("enabled", True)
+            enabled=data.get("enabled", True),
+            max_connections=data.get("max_connections", 4),
+            upload_workers=data.get("upload_workers", 3),
+            download_segments=data.get("download_segments", 4),
+            download_workers=data.get("download_workers", 3),
+            server_id=data.get("id", ""),
+            priority=data.get("priority", 0),
+            retry_policies=data.get("retry_policies"),
+            bandwidth_limit=data.get("bandwidth_limit", 0),
+            mode_z=data.get("mode_z", False),
+            mode_z_level=data.get("mode_z_level", modez.DEFAULT_LEVEL)
         )
 
+class ListingCancelled(Exception):
+    """目录列举被调用方取消 (例如用户已切换到其它目录)"""
+
+class UploadJob:
+    """单个待上传文件：本地路径、远端目录、远端文件名、大小与本地修改时间"""
+    __slots__ = ("local_path", "remote_dir", "name", "size", "mtime")
+
+    def __init__(self, local_path: str, remote_dir: str, name: str, size: int, mtime: float = 0.0):
+        self.local_path = local_path
+        self.remote_dir = remote_dir
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def remote_path(self) -> str:
+        return f"{self.remote_dir.rstrip('/')}/{self.name}"
+
+class FileTransferResult:
+    """单个文件的传输结果
+
+    status: ``uploaded`` 完整上传 / ``resumed`` 从 offset 处续传 / ``complete`` 远端已是完整文件 /
+    ``skipped`` 增量模式下判定为未变化；started/finished 为开始与结束的 Unix 时间戳；
+    digest 为本地文件的摘要 (传输时顺带计算，未计算时为 None)
+    """
+    __slots__ = ("local_path", "remote_path", "size", "status", "offset", "started", "finished", "digest")
+
+    def __init__(self, local_path: str, remote_path: str, size: int, status: str, offset: int = 0):
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.size = size
+        self.status = status
+        self.offset = offset
+        self.started = 0.0
+        self.finished = 0.0
+        self.digest: Optional[str] = None
+
+    def describe(self) -> str:
+        name = os.path.basename(self.remote_path)
+        if self.status == "resumed":
+            return f"{name}: resumed at {self.offset} bytes"
+        if self.status == "complete":
+            return f"{name}: already complete"
+        if self.status == "skipped":
+            return f"{name}: unchanged, skipped"
+        return f"{name}: uploaded"
+
+    @staticmethod
+    def summarize(results: List["FileTransferResult"]) -> str:
+        """汇总一台服务器的文件结果，例如 " (3 skipped / 5 sent)" """
+        skipped = sum(1 for r in results if r.status in ("skipped", "complete"))
+        resumed = sum(1 for r in results if r.status == "resumed")
+        sent = sum(1 for r in results if r.status == "uploaded") + resumed
+        if skipped:
+            extra = f", {resumed} resumed" if resumed else ""
+            return f" ({skipped} skipped / {sent} sent{extra})"
+        if resumed:
+            return f" (resumed {resumed} files)"
+        return ""
+
 class FtpManager:
-    def __init__(self):
+    def __init__(self, max_parallel_servers: int = 8, per_host_limit: int = 8,
+                 breaker_threshold: int = 3, breaker_cooldown: float = 60.0):
         self.servers: List[FtpServerConfig] = []
+        # 按服务器复用已登录的会话，避免每次操作都重新握手
+        self.pool = FtpConnectionPool(self._get_ftp_connection)
+        # 远端目录列表缓存及后台预取 (预取线程较少，避免占满连接池)
+        self.listing_cache = ListingCache()
+        self._prefetch_executor: Optional["ThreadPoolExecutor"] = None
+        self._closed = False
+        self._prefetch_generation = 0
+        # 最近一次 upload_to_all 的各服务器统计，以及最近一次下载的统计
+        self.upload_metrics: Optional[MetricsRegistry] = None
+        self.download_metrics: Optional[TransferMetrics] = None
+        # 最近一次 verify_all 的各服务器校验结果 (server_id -> VerifyReport)
+        self.verify_reports: Dict[str, "VerifyReport"] = {}
+        # 最近一次校验 (kind="verify"，进度按文件数) 或重传 (kind="reupload") 的统计，不计入分发统计
+        self.verify_metrics: Optional[MetricsRegistry] = None
+        # 传输时顺带计算的摘要算法 (None 表示不计算)；摘要缓存由所有任务共享，校验时可直接复用
+        self.checksum_algorithm: Optional[str] = DEFAULT_ALGORITHM
+        self.digests = DigestCache()
+        # 最近一次上传/下载任务的摘要清单 (已写入 data/checksums/)
+        self.upload_checksums: Optional[ChecksumManifest] = None
+        self.download_checksums: Optional[ChecksumManifest] = None
+        # 分发调度：全局最多同时处理 max_parallel_servers 台服务器，同一主机最多占用 per_host_limit 条连接，
+        # 共用连接池的配置合计不超过该池的 max_connections (见 _submit_server)
+        self.scheduler = TransferScheduler(max_concurrent=max_parallel_servers, per_host_limit=per_host_limit)
+        # 连续 breaker_threshold 次连不上的主机熔断 breaker_cooldown 秒
+        self.breakers = CircuitBreakerRegistry(threshold=breaker_threshold, cooldown=breaker_cooldown)
+        # 各服务器的目录列举器 (记住是否支持 MLSD，避免每次都先试探)
+        self._listers: Dict[str, DirectoryLister] = {}
+        # 令牌桶限速：全局上限由所有传输平分，单服务器上限取自 config.bandwidth_limit
+        self.bandwidth = BandwidthGovernor()
+        # 远端目录树索引 (SQLite)，第一次用到时才打开
+        self._remote_index: Optional["RemoteIndex"] = None
+        self._index_lock = threading.Lock()
         
     def add_server(self, config: FtpServerConfig):
+        self._ensure_unique_id(config, self.servers)
         self.servers.append(config)
         
     def remove_server(self, index: int):
         if 0 <= index < len(self.servers):
-            self.servers.pop(index)
+            config = self.servers.pop(index)
+            self.pool.close_server(config)
+            self.listing_cache.invalidate_server(config)
             
-    def load_servers(self, configs: List[dict]):
-        self.servers = [FtpServerConfig.from_dict(c) for c in configs]
+    def load_servers(self, configs: List[dict]) -> bool:
+        """加载服务器配置；返回 True 表示有配置缺少 id 而被补上，调用方应写回配置文件"""
+        servers = []
+        for data in configs:
+            config = FtpServerConfig.from_dict(data)
+            self._ensure_unique_id(config, servers)
+            servers.append(config)
+        self.servers = servers
+        return any(data.get("id") != config.server_id for data, config in zip(configs, servers))
+
+    @staticmethod
+    def _ensure_unique_id(config: FtpServerConfig, existing: List[FtpServerConfig]):
+        # 连接参数完全相同的重复配置推导出的 ID 相同，按出现顺序追加序号区分
+        taken = {s.server_id for s in existing}
+        base, n = config.server_id, 1
+        while config.server_id in taken:
+            n += 1
+            config.server_id = f"{base}-{n}"
         
     def get_servers_as_dicts(self) -> List[dict]:
         return [s.to_dict() for s in self.servers]
 
+    def close(self):
+        """关闭连接池中的全部会话 (程序退出时调用)"""
+        self._closed = True
+        self._prefetch_generation += 1
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=False, cancel_futures=True)
+        self.scheduler.close()
+        self.pool.close_all()
+        if self._remote_index is not None:
+            self._remote_index.close()
+
+    @property
+    def remote_index(self) -> "RemoteIndex":
+        with self._index_lock:
+            if self._remote_index is None:
+                # 按需导入：sqlite3 只在第一次使用索引时加载，不拖慢命令行等场景的启动
+                from src.core.remote_index import RemoteIndex
+                self._remote_index = RemoteIndex.open_default()
+            return self._remote_index
+
+    def _lister(self, config: FtpServerConfig) -> DirectoryLister:
+        lister = self._listers.get(config.server_id)
+        if lister is None:
+            lister = self._listers[config.server_id] = DirectoryLister(config.host)
+        return lister
+
     def _get_ftp_connection(self, config: FtpServerConfig, timeout: int = 60) -> ftplib.FTP:
         """建立 FTP 连接并配置编码为 UTF-8"""
         ftp = ftplib.FTP()
         # 强制使用 UTF-8 编码，解决中文文件名报错 UnicodeEncodeError
         ftp.encoding = 'utf-8'
         
+        # 近期连续连不上的主机直接快速失败，不再每次都耗尽连接超时
+        breaker = self.breakers.get(config)
+        breaker.before_connect(config.host)
         logger.debug(f"Connecting to {config.host}:{config.port} (timeout={timeout})...")
-        ftp.connect(config.host, config.port, timeout=timeout)
+        try:
+            ftp.connect(config.host, config.port, timeout=timeout)
+        except (OSError, EOFError, ftplib.Error) as e:
+            breaker.record_failure()
+            raise ConnectError(f"Cannot connect to {config.host}:{config.port}: {e}") from e
+        breaker.record_success()
         
         logger.debug(f"Logging in as {config.username}...")
-        ftp.login(config.username, config.password)
+        try:
+            ftp.login(config.username, config.password)
+        except (OSError, EOFError, ftplib.Error) as e:
+            ftp.close()
+            raise LoginError(f"Login failed on {config.host}: {e}") from e
         
         # 尝试发送 OPTS UTF8 ON，通知服务器客户端将使用 UTF-8
         try:
@@ -82,308 +310,842 @@ class FtpManager:
 
     def test_connection(self, config: FtpServerConfig) -> Tuple[bool, str]:
         """测试单个 FTP 服务器的连接状态"""
+        # 用户主动测试时不受熔断限制
+        self.breakers.reset(config)
         try:
-            ftp = self._get_ftp_connection(config, timeout=10)
-            ftp.quit()
+            with self.pool.session(config, timeout=10):
+                pass
             return True, "Success"
         except Exception as e:
             logger.error(f"Test connection failed for {config.host}: {e}")
             return False, str(e)
 
-    def _ensure_remote_dir(self, ftp: ftplib.FTP, remote_dir: str):
-        if not remote_dir or remote_dir.strip() == "/" or remote_dir.strip() == "":
-            return
-            
-        if remote_dir.startswith("/"):
-            ftp.cwd("/")
-            
-        parts = remote_dir.replace('\\', '/').split('/')
-        for part in parts:
-            if not part:
-                continue
-            try:
-                ftp.cwd(part)
-            except ftplib.error_perm:
-                ftp.mkd(part)
-                ftp.cwd(part)
+    def _collect_upload_jobs(self, ftp: ftplib.FTP, manifest: LocalManifest, base_remote_dir: str) -> List[UploadJob]:
+        """按本地清单在远端建好缺失的目录，并生成所有待上传的文件任务 (顺序与清单一致)"""
+        created = RemoteDirPlanner(base_remote_dir, manifest.dirs).ensure(ftp)
+        if created:
+            logger.info(f"Created {created} remote directories under {base_remote_dir}")
+        return self._manifest_jobs(manifest, base_remote_dir)
+
+    @staticmethod
+    def _manifest_jobs(manifest: LocalManifest, base_remote_dir: str) -> List[UploadJob]:
+        base = base_remote_dir.rstrip('/')
+        return [UploadJob(f.local_path, f"{base}/{f.rel_dir}" if f.rel_dir else base_remote_dir,
+                          f.name, f.size, f.mtime)
+                for f in manifest.files]
 
-    def upload_paths_to_server(self, config: FtpServerConfig, local_paths: List[str], remote_dir: str, progress_callback: Optional[Callable] = None) -> Tuple[bool, str]:
-        """上传多个文件/文件夹到单个服务器"""
+    def _remote_resume_offset(self, ftp: ftplib.FTP, job: UploadJob) -> int:
+        """查询远端同名文件大小，作为续传起点；不存在或无法获取时返回 0"""
         try:
-            # 1. 计算所有文件的总大小，用于进度条
-            total_size = 0
-            for path in local_paths:
-                if os.path.isfile(path):
-                    total_size += os.path.getsize(path)
-                elif os.path.isdir(path):
-                    for root, _, files in os.walk(path):
-                        for file in files:
-                            total_size += os.path.getsize(os.path.join(root, file))
-                            
-            uploaded_size = 0
-            
-            ftp = self._get_ftp_connection(config, timeout=30)
-            
-            # 切换到指定目录 (如果提供了且不是根目录)
-            if remote_dir and remote_dir.strip() and remote_dir != "/":
-                self._ensure_remote_dir(ftp, remote_dir)
-            
-            base_remote_dir = ftp.pwd()
-            
-            def handle_block(block):
-                nonlocal uploaded_size
-                uploaded_size += len(block)
+            remote_size = ftp.size(job.remote_path)
+        except (ftplib.error_perm, ftplib.error_reply):
+            return 0
+        if remote_size is None or remote_size > job.size:
+            # 远端比本地还大，说明不是同一个文件的残片，只能完整覆盖
+            return 0
+        return remote_size
+
+    def _upload_file(self, ftp: ftplib.FTP, config: FtpServerConfig, job: UploadJob, handle_block: Callable,
+                     add_progress: Callable, resume: bool = False,
+                     broadcast_hub: Optional["BroadcastHub"] = None,
+                     delta: Optional["DeltaPlanner"] = None, algorithm: Optional[str] = None) -> FileTransferResult:
+        """上传单个文件 (远端命令均使用绝对路径，不依赖当前目录)
+
+        resume=True 时从远端已有大小处续传；传入 delta 时跳过远端已是最新的文件。
+        algorithm 不为空时对完整上传的数据块顺带计算摘要，同一文件分发给多台服务器时只由其中一台计算。
+        """
+        remote_path = job.remote_path
+        if delta and delta.should_skip(ftp, job):
+            if broadcast_hub:
+                broadcast_hub.skip(job.local_path, config)
+            add_progress(job.size)
+            return FileTransferResult(job.local_path, remote_path, job.size, "skipped")
+
+        offset = self._remote_resume_offset(ftp, job) if resume else 0
+        if offset and broadcast_hub:
+            # 续传需要自行 seek，不参与共享读取流
+            broadcast_hub.skip(job.local_path, config)
+
+        if offset and offset == job.size:
+            add_progress(job.size)
+            logger.info(f"Skip {job.local_path}: {remote_path} on {config.host} is already complete")
+            return FileTransferResult(job.local_path, remote_path, job.size, "complete", offset)
+
+        # 本次尝试已发送的字节数：尝试失败时连同续传偏移一起从进度中扣除，整体进度不会虚高
+        sent = 0
+
+        def count_block(block):
+            nonlocal sent
+            sent += len(block)
+            handle_block(block)
+
+        if offset:
+            # 续传：优先 REST + STOR，服务器不支持时退回 APPE，再不行就完整上传 (REST 偏移只在 MODE S 下有意义)
+            modez.disable_mode_z(ftp)
+            for command, rest in ((f'STOR {remote_path}', offset), (f'APPE {remote_path}', None)):
+                with open(job.local_path, 'rb') as f:
+                    f.seek(offset)
+                    sent = 0
+                    add_progress(offset)
+                    try:
+                        logger.info(f"Resuming {job.local_path} -> {remote_path} on {config.host} at {offset} bytes ({command.split()[0]})")
+                        ftp.storbinary(command, f, 32768, count_block, rest=rest)
+                        return FileTransferResult(job.local_path, remote_path, job.size, "resumed", offset)
+                    except BaseException as e:
+                        add_progress(-(offset + sent))
+                        # 连接错误，或数据已开始发送后才失败，都不能再换方式重试
+                        if not isinstance(e, (ftplib.error_perm, ftplib.error_reply)) or f.tell() != offset:
+                            raise
+                        logger.warning(f"{config.host} rejected resume via {command.split()[0]}: {e}")
+
+        logger.info(f"Uploading {job.local_path} -> {remote_path} on {config.host}")
+        # 广播模式下从共享缓冲区读取，避免每台服务器各自读一遍本地文件
+        source = broadcast_hub.open(job.local_path, config) if broadcast_hub else open(job.local_path, 'rb')
+        if config.mode_z:
+            modez.enable_mode_z(ftp, config.mode_z_level)
+        hasher = None
+        sent = 0
+        on_block = count_block
+        if algorithm and self.digests.claim(job.local_path, algorithm, job.size, job.mtime):
+            hasher = new_hasher(algorithm)
+
+            def hash_block(block):
+                hasher.update(block)
+                count_block(block)
+            on_block = hash_block
+        try:
+            with source as f:
+                modez.storbinary(ftp, f'STOR {remote_path}', f, 32768, on_block, config.mode_z_level)
+        except BaseException:
+            add_progress(-sent)
+            if hasher:
+                self.digests.release(job.local_path, algorithm, job.size, job.mtime)
+            raise
+        if hasher:
+            self.digests.record(job.local_path, algorithm, job.size, job.mtime, hasher.hexdigest())
+        return FileTransferResult(job.local_path, remote_path, job.size, "uploaded")
+
+    def _run_upload_jobs(self, config: FtpServerConfig, jobs: List[UploadJob], total_size: int, progress_callback: Optional[Callable] = None,
+                         broadcast_hub: Optional["BroadcastHub"] = None, resume: bool = False,
+                         file_callback: Optional[Callable] = None,
+                         delta: Optional["DeltaPlanner"] = None,
+                         metrics: Optional[TransferMetrics] = None,
+                         results: Optional[List[FileTransferResult]] = None,
+                         initial_progress: int = 0, algorithm: Optional[str] = None) -> List[FileTransferResult]:
+        """用多条会话并发消费上传任务队列，大文件优先以便各会话尽量同时结束
+
+        完成的文件追加到 results (失败时其中保留已完成部分，供重试跳过)；initial_progress 为已完成的字节数。
+        """
+        metrics = metrics or TransferMetrics(config)
+        results = [] if results is None else results
+        if not jobs:
+            return results
+        job_queue: "queue.Queue[UploadJob]" = queue.Queue()
+        for job in sorted(jobs, key=lambda j: j.size, reverse=True):
+            job_queue.put(job)
+
+        lock = threading.Lock()
+        stop_event = threading.Event()
+        errors: List[Exception] = []
+        uploaded_size = initial_progress
+        # 已借到会话的 worker 数；其余 worker 借不到会话时直接退出，由这些会话消费队列
+        sessions_started = 0
+
+        def add_progress(nbytes: int):
+            nonlocal uploaded_size
+            # 在锁内上报，保证各 worker 报出的累计进度按递增顺序到达
+            with lock:
+                uploaded_size += nbytes
+                metrics.update(uploaded_size, total_size)
                 if progress_callback:
                     progress_callback(config.host, uploaded_size, total_size)
 
-            def _upload_file(local_file: str, remote_file_name: str):
-                logger.info(f"Uploading {local_file} -> {remote_file_name} on {config.host}")
-                with open(local_file, 'rb') as f:
-                    ftp.storbinary(f'STOR {remote_file_name}', f, 32768, handle_block)
-
-            def _upload_recursive(current_local_path: str, current_remote_dir: str):
-                ftp.cwd(current_remote_dir)
-                if os.path.isfile(current_local_path):
-                    _upload_file(current_local_path, os.path.basename(current_local_path))
-                elif os.path.isdir(current_local_path):
-                    # 在远端创建与本地文件夹同名的目录
-                    folder_name = os.path.basename(current_local_path)
-                    try:
-                        ftp.cwd(folder_name)
-                    except ftplib.error_perm:
-                        ftp.mkd(folder_name)
-                        ftp.cwd(folder_name)
-                    
-                    next_remote_dir = ftp.pwd()
-                    
-                    # 遍历本地文件夹内容
-                    for item in os.listdir(current_local_path):
-                        item_local_path = os.path.join(current_local_path, item)
-                        _upload_recursive(item_local_path, next_remote_dir)
-                        
-                    # 恢复层级
-                    ftp.cwd(current_remote_dir)
-
-            # 遍历所有被选中的路径分别上传
-            for path in local_paths:
-                _upload_recursive(path, base_remote_dir)
+        def handle_block(block):
+            self.bandwidth.throttle(config, len(block))
+            add_progress(len(block))
+
+        def worker():
+            nonlocal sessions_started
+            try:
+                checkout_start = time.perf_counter()
+                with self.pool.session(config, timeout=30) as ftp:
+                    with lock:
+                        sessions_started += 1
+                    metrics.add_time(PHASE_CONNECT, time.perf_counter() - checkout_start)
+                    if resume or delta:
+                        # 部分服务器在 ASCII 模式下拒绝 SIZE
+                        ftp.voidcmd('TYPE I')
+                    while not stop_event.is_set():
+                        try:
+                            job = job_queue.get_nowait()
+                        except queue.Empty:
+                            return
+                        started = time.time()
+                        with metrics.phase(PHASE_TRANSFER):
+                            result = self._upload_file(ftp, config, job, handle_block, add_progress, resume, broadcast_hub,
+                                                       delta, algorithm)
+                        result.started, result.finished = started, time.time()
+                        if algorithm:
+                            result.digest = self.digests.peek(job.local_path, algorithm, job.size, job.mtime)
+                        metrics.record_file(result.remote_path, result.size, result.status, result.started, result.finished)
+                        if delta and result.status != "skipped":
+                            delta.record(job)
+                        with lock:
+                            results.append(result)
+                        if file_callback:
+                            file_callback(config.host, result)
+            except PoolTimeout as e:
+                # 会话被同一连接池的其它任务 (例如共用主机与账号的另一个服务器配置) 占满：
+                # 只要已有会话在上传，少开一条并不算失败
+                with lock:
+                    started = sessions_started
+                if not started and not stop_event.is_set():
+                    stop_event.set()
+                    errors.append(e)
+                else:
+                    logger.debug(f"Extra upload session to {config.host} unavailable, continuing with {started}: {e}")
+            except Exception as e:
+                # 任一会话失败即通知其余会话停止领取新任务
+                stop_event.set()
+                errors.append(e)
+
+        worker_count = max(1, min(config.upload_workers, config.max_connections, len(jobs)))
+        if worker_count == 1:
+            worker()
+        else:
+            threads = [threading.Thread(target=worker, name=f"upload-{config.host}-{i}", daemon=True)
+                       for i in range(worker_count)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
+        return results
+
+    def upload_paths_to_server(self, config: FtpServerConfig, local_paths: List[str], remote_dir: str, progress_callback: Optional[Callable] = None,
+                               broadcast_hub: Optional["BroadcastHub"] = None, resume: bool = False,
+                               file_callback: Optional[Callable] = None, delta: bool = False,
+                               metrics: Optional[TransferMetrics] = None,
+                               retry_callback: Optional[Callable] = None,
+                               manifest: Optional[LocalManifest] = None,
+                               checksums: Optional[ChecksumManifest] = None) -> Tuple[bool, str]:
+        """上传多个文件/文件夹到单个服务器
+
+        resume=True 时对远端已存在的残缺文件做断点续传；delta=True 时只传输新增或
+        变化的文件。每个文件完成后以 file_callback(host, FileTransferResult) 回报结果。
+        传入 metrics 时记录速率、各阶段耗时与逐文件时间。
+        失败按 config.retry_policies 重试，重试时跳过已完成的文件、从失败的文件继续；
+        每次重试前调用 retry_callback(host, 说明)。
+        manifest 为 local_paths 预先扫描好的清单 (分发给多台服务器时共享)，未传入时在此扫描。
+        传输时按 self.checksum_algorithm 顺带计算摘要 (FileTransferResult.digest)，并记入 checksums；
+        未传入 checksums 时新建一份，结束后写入 data/checksums/ 并保存为 self.upload_checksums。
+        """
+        metrics = metrics or TransferMetrics(config)
+        planner = None
+        if delta:
+            from src.core.delta import DeltaPlanner
+            planner = DeltaPlanner(config)
+        algorithm = checksums.algorithm if checksums else self.checksum_algorithm
+        own_checksums = checksums is None and algorithm is not None
+        if own_checksums:
+            checksums = ChecksumManifest("upload", algorithm)
+        user_file_callback = file_callback
+
+        def file_callback(host: str, result: FileTransferResult):
+            if checksums:
+                checksums.add(result.local_path, result.size, result.digest, config.server_id,
+                              result.remote_path, result.status)
+            if user_file_callback:
+                user_file_callback(host, result)
+
+        base_remote_dir = None
+        jobs: Optional[List[UploadJob]] = None
+        total_size = 0
+        results: List[FileTransferResult] = []
+
+        def _attempt(attempt: int):
+            nonlocal base_remote_dir, jobs, total_size, manifest
+            if manifest is None:
+                manifest = LocalManifest.scan(local_paths)
+            if jobs is None:
+                checkout_start = time.perf_counter()
+                with self.pool.session(config, timeout=30) as ftp:
+                    metrics.add_time(PHASE_CONNECT, time.perf_counter() - checkout_start)
+                    with metrics.phase(PHASE_MKDIR):
+                        # 未指定目录 (或为 "/") 时上传到登录后的初始目录
+                        base_remote_dir = resolve_remote_dir(ftp, remote_dir)
+                        jobs = self._collect_upload_jobs(ftp, manifest, base_remote_dir)
+                total_size = manifest.total_size
+                metrics.update(0, total_size)
+
+            # 目录建好后归还会话，再由多条会话并发传输文件；重试时只处理尚未完成的文件
+            finished = {(r.local_path, r.remote_path) for r in results}
+            pending = [job for job in jobs if (job.local_path, job.remote_path) not in finished]
+            if attempt:
+                logger.info(f"Retrying upload to {config.host}: {len(pending)} of {len(jobs)} files remaining")
+            self._run_upload_jobs(config, pending, total_size, progress_callback, broadcast_hub, resume, file_callback,
+                                  planner, metrics, results, total_size - sum(job.size for job in pending), algorithm)
+
+        def _on_retry(e: BaseException, failure: str, retry: int, delay: float):
+            if retry_callback:
+                retry_callback(config.host, f"Retry {retry} in {delay:.0f}s ({failure}): {e}")
+
+        try:
+            call_with_retry(_attempt, build_policies(config.retry_policies), _on_retry)
                 
-            ftp.quit()
-            return True, "Upload Success"
+            message = "Upload Success" + FileTransferResult.summarize(results)
+            metrics.finish(True, message)
+            return True, message
         except Exception as e:
             logger.error(f"Upload failed for {config.host}: {e}", exc_info=True)
+            metrics.finish(False, str(e))
             return False, str(e)
+        finally:
+            # 即使中途失败，也保留已成功推送的部分，下次增量时可以跳过
+            if planner:
+                planner.save()
+            if own_checksums:
+                self._save_checksums(checksums)
+                self.upload_checksums = checksums
+            # 远端内容已变化，相关目录列表缓存失效
+            if base_remote_dir:
+                self.listing_cache.invalidate(config, base_remote_dir)
+            else:
+                self.listing_cache.invalidate_server(config)
 
-    def list_directory(self, config: FtpServerConfig, path: str = "") -> Tuple[bool, List[dict], str]:
-        """列出远程目录内容"""
-        try:
-            ftp = self._get_ftp_connection(config, timeout=30)
-            
-            if path and path.strip():
-                ftp.cwd(path)
-                
-            current_path = ftp.pwd()
-            items = []
-            
-            # 尝试使用 mlsd (现代FTP服务器支持，结构化数据更优)
-            try:
-                for name, facts in ftp.mlsd():
-                    if name in ('.', '..'):
-                        continue
-                    item_type = 'dir' if facts.get('type') in ('dir', 'cdir', 'pdir') else 'file'
-                    size = facts.get('size', '')
-                    modify = facts.get('modify', '')
-                    # 格式化时间 YYYYMMDDHHMMSS -> YYYY-MM-DD HH:MM:SS
-                    if modify and len(modify) >= 14:
-                        modify = f"{modify[0:4]}-{modify[4:6]}-{modify[6:8]} {modify[8:10]}:{modify[10:12]}:{modify[12:14]}"
-                        
-                    items.append({
-                        'name': name,
-                        'type': item_type,
-                        'size': size,
-                        'modify': modify
-                    })
-            except Exception as e:
-                # 降级：如果不支持 mlsd，尝试解析 dir 输出 (LIST 格式各异，尽力解析)
-                logger.warning(f"mlsd not supported by {config.host}, falling back to LIST. Error: {e}")
-                lines = []
-                ftp.dir(lines.append)
-                for line in lines:
-                    if not line.strip():
-                        continue
-                    parts = line.split(None, 8)
-                    if len(parts) >= 9:
-                        name = parts[-1]
-                        if name in ('.', '..'):
-                            continue
-                        is_dir = line.startswith('d')
-                        size = parts[4] if not is_dir else ''
-                        modify = f"{parts[5]} {parts[6]} {parts[7]}"
-                        items.append({
-                            'name': name,
-                            'type': 'dir' if is_dir else 'file',
-                            'size': size,
-                            'modify': modify
-                        })
+    def list_directory(self, config: FtpServerConfig, path: str = "", use_cache: bool = True,
+                       batch_callback: Optional[Callable] = None, cancel_event: Optional[threading.Event] = None) -> Tuple[bool, List[ListEntry], str]:
+        """列出远程目录内容
+
+        use_cache=True 时对绝对路径优先返回未过期的缓存结果 (刷新操作应传 False)。
+        batch_callback(items) 在解析过程中分批收到条目；cancel_event 被置位时尽快放弃并返回 "Cancelled"。
+        """
+        if use_cache and path and path.startswith('/'):
+            cached = self.listing_cache.get(config, path)
+            if cached is not None:
+                return True, list(cached), normalize_remote_path(path)
+        emitted = False
+
+        def _list_once(attempt: int):
+            with self.pool.session(config, timeout=30) as ftp:
+                if path and path.strip():
+                    ftp.cwd(path)
             
-            ftp.quit()
+                current_path = ftp.pwd()
+                items = []
+                batch = []
+
+                def _add(item: ListEntry):
+                    nonlocal emitted
+                    items.append(item)
+                    if batch_callback:
+                        batch.append(item)
+                        if len(batch) >= 500:
+                            emitted = True
+                            batch_callback(batch[:])
+                            batch.clear()
+        
+                # 优先 MLSD，不支持时解析 LIST (Unix / DOS 格式)；边接收边解析，取消时中止数据连接
+                self._lister(config).list(ftp, on_entry=_add, cancel_event=cancel_event)
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if batch and not cancelled:
+                    batch_callback(batch[:])
+            # 在归还会话之后再抛出：中止的传输已读完应答，会话仍可复用
+            if cancelled:
+                raise ListingCancelled()
+            return current_path, items
+
+        try:
+            # 已经把部分条目交给调用方后不能再整体重试，否则会出现重复条目
+            current_path, items = call_with_retry(_list_once, build_policies(config.retry_policies),
+                                                  cancel_event=cancel_event, retryable=lambda e: not emitted)
             
             # 排序：文件夹在前，文件在后，按字母排序
-            items.sort(key=lambda x: (x['type'] == 'file', x['name'].lower()))
+            items.sort(key=lambda x: (not x.is_dir, x.name.lower()))
+            self.listing_cache.put(config, current_path, items)
             
-            return True, items, current_path
+            return True, list(items), current_path
             
+        except ListingCancelled:
+            logger.debug(f"Listing of {path} on {config.host} cancelled")
+            return False, [], "Cancelled"
         except Exception as e:
             logger.error(f"Failed to list directory on {config.host}: {e}", exc_info=True)
             return False, [], str(e)
 
-    def download_path(self, config: FtpServerConfig, remote_path: str, local_save_dir: str, is_dir: bool = False, progress_callback: Optional[Callable] = None) -> Tuple[bool, str]:
-        """从服务器下载单个文件或整个目录到本地"""
-        try:
-            ftp = self._get_ftp_connection(config, timeout=30)
+    def prefetch_directories(self, config: FtpServerConfig, paths: List[str], limit: int = 8):
+        """在后台预取若干子目录的列表到缓存；再次调用会取消尚未开始的旧预取"""
+        self._prefetch_generation += 1
+        generation = self._prefetch_generation
+
+        def _prefetch(path: str):
+            if generation != self._prefetch_generation or self.listing_cache.get(config, path) is not None:
+                return
+            self.list_directory(config, path)
+
+        if self._closed:
+            return
+        if self._prefetch_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ftp-prefetch")
+        for path in paths[:limit]:
+            try:
+                self._prefetch_executor.submit(_prefetch, path)
+            except RuntimeError:
+                # 程序退出时线程池已关闭
+                return
 
-            def _download_file(r_file: str, l_file: str):
-                logger.info(f"Downloading {r_file} -> {l_file}")
-                # Ensure local directory exists
-                os.makedirs(os.path.dirname(l_file), exist_ok=True)
+    def download_path(self, config: FtpServerConfig, remote_path: str, local_save_dir: str, is_dir: bool = False, progress_callback: Optional[Callable] = None,
+                      file_progress_callback: Optional[Callable] = None, workers: Optional[int] = None,
+                      metrics: Optional[TransferMetrics] = None) -> Tuple[bool, str]:
+        """从服务器下载单个文件或整个目录到本地
+
+        目录下载由 workers (默认 config.download_workers) 条会话并行完成；progress_callback
+        收到的总大小随列举推进而增长，file_progress_callback(host, 远端文件, 已下载, 大小) 报告单个文件进度。
+        统计记录在 metrics (未传入时新建) 中，并保存为 self.download_metrics。
+        按 self.checksum_algorithm 对写入本地的数据块顺带计算摘要，记入清单文件并保存为 self.download_checksums
+        (分段下载的各段乱序写入，无法流式计算，摘要记为空)。
+        """
+        from src.core.dir_download import DirectoryDownloader
+        from src.core.segments import (SEGMENT_MIN_SIZE, SEGMENTED_MIN_FILE_SIZE, RestNotSupported, SegmentMap,
+                                       download_segmented)
+        metrics = metrics or TransferMetrics(config, "download")
+        self.download_metrics = metrics
+        algorithm = self.checksum_algorithm
+        checksums = ChecksumManifest("download", algorithm) if algorithm else None
+        user_progress = progress_callback
+
+        def progress_callback(host: str, done: int, total: int):
+            metrics.update(done, total)
+            if user_progress:
+                user_progress(host, done, total)
+
+        def throttle(nbytes: int):
+            self.bandwidth.throttle(config, nbytes)
+
+        base_name = os.path.basename(remote_path.rstrip('/'))
+
+        def _attempt(attempt: int):
+            if is_dir:
+                # Directory download (重试时跳过本地已完整的文件)
+                local_folder_path = os.path.join(local_save_dir, base_name)
+                downloader = DirectoryDownloader(self.pool, config, workers or config.download_workers,
+                                                 user_progress, file_progress_callback, metrics,
+                                                 skip_complete=attempt > 0, throttle=throttle, checksums=checksums)
+                downloader.run(remote_path, local_folder_path)
+                return
+
+            checkout_start = time.perf_counter()
+            with self.pool.session(config, timeout=30) as ftp:
+                metrics.add_time(PHASE_CONNECT, time.perf_counter() - checkout_start)
+
+                def _download_file(r_file: str, l_file: str):
+                    logger.info(f"Downloading {r_file} -> {l_file}")
+                    # Ensure local directory exists
+                    os.makedirs(os.path.dirname(l_file), exist_ok=True)
                 
-                try:
-                    file_size = ftp.size(r_file)
-                except Exception:
-                    file_size = 0
-                    
-                downloaded_size = 0
-                def handle_block(block):
-                    nonlocal downloaded_size
-                    f.write(block)
-                    downloaded_size += len(block)
-                    if progress_callback:
-                        progress_callback(config.host, downloaded_size, file_size)
-
-                with open(l_file, 'wb') as f:
                     try:
                         ftp.voidcmd('TYPE I')
                     except Exception as e:
                         logger.warning(f"Failed to set TYPE I for download: {e}")
-                    ftp.retrbinary(f'RETR {r_file}', handle_block, 32768)
+                    try:
+                        file_size = ftp.size(r_file)
+                    except Exception:
+                        file_size = 0
 
-            def _download_recursive(r_path: str, l_dir: str):
-                # Try to list the directory to see its contents
-                ftp.cwd(r_path)
-                lines = []
-                ftp.dir(lines.append)
-                
-                for line in lines:
-                    if not line.strip():
-                        continue
-                        
-                    parts = line.split(None, 8)
-                    if len(parts) >= 9:
-                        name = parts[-1]
-                        if name in ('.', '..'):
-                            continue
-                            
-                        is_folder = line.startswith('d')
-                        item_r_path = f"{r_path}/{name}" if r_path != "/" else f"/{name}"
-                        item_l_path = os.path.join(l_dir, name)
-                        
-                        if is_folder:
-                            os.makedirs(item_l_path, exist_ok=True)
-                            _download_recursive(item_r_path, item_l_path)
-                        else:
-                            _download_file(item_r_path, item_l_path)
-                
-                # Go back up
-                parts = r_path.rstrip('/').split('/')
-                if len(parts) > 1:
-                    ftp.cwd("/".join(parts[:-1]) or "/")
+                    segments = min(config.download_segments, config.max_connections, max(1, file_size // SEGMENT_MIN_SIZE))
+                    if file_size >= SEGMENTED_MIN_FILE_SIZE and segments > 1:
+                        try:
+                            download_segmented(self.pool, config, ftp, r_file, l_file, file_size, segments, progress_callback,
+                                               throttle)
+                            if checksums:
+                                checksums.add(l_file, file_size, None, config.server_id, r_file, "segmented")
+                            return
+                        except RestNotSupported as e:
+                            logger.warning(f"{config.host} does not support REST, falling back to single stream: {e}")
+                            SegmentMap(l_file, r_file, file_size, []).remove()
+                    
+                    downloaded_size = 0
+                    hasher = new_hasher(algorithm) if algorithm else None
+                    def handle_block(block):
+                        nonlocal downloaded_size
+                        f.write(block)
+                        if hasher:
+                            hasher.update(block)
+                        downloaded_size += len(block)
+                        throttle(len(block))
+                        if progress_callback:
+                            progress_callback(config.host, downloaded_size, file_size)
+
+                    if config.mode_z:
+                        modez.enable_mode_z(ftp, config.mode_z_level)
+                    with open(l_file, 'wb') as f:
+                        modez.retrbinary(ftp, f'RETR {r_file}', handle_block, 32768)
+                    if checksums:
+                        checksums.add(l_file, downloaded_size, hasher.hexdigest(), config.server_id, r_file, "downloaded")
 
-            base_name = os.path.basename(remote_path.rstrip('/'))
-            if not is_dir:
                 # Single file download
                 local_file_path = os.path.join(local_save_dir, base_name)
-                _download_file(remote_path, local_file_path)
-            else:
-                # Directory download
-                local_folder_path = os.path.join(local_save_dir, base_name)
-                os.makedirs(local_folder_path, exist_ok=True)
-                _download_recursive(remote_path, local_folder_path)
+                started = time.time()
+                with metrics.phase(PHASE_TRANSFER):
+                    _download_file(remote_path, local_file_path)
+                metrics.record_file(remote_path, metrics.bytes_done, "downloaded", started, time.time())
 
-            ftp.quit()
+        try:
+            # 失败按 config.retry_policies 重试；分段下载会依据 .ftpseg 记录从中断处继续
+            call_with_retry(_attempt, build_policies(config.retry_policies))
+            metrics.finish(True, "Download Success")
             return True, "Download Success"
             
         except Exception as e:
             logger.error(f"Failed to download {remote_path} from {config.host}: {e}", exc_info=True)
+            metrics.finish(False, str(e))
             return False, str(e)
+        finally:
+            if checksums:
+                self._save_checksums(checksums)
+                self.download_checksums = checksums
 
-    def delete_path(self, config: FtpServerConfig, remote_path: str, is_dir: bool = False) -> Tuple[bool, str]:
-        """在服务器上删除文件或递归删除整个目录"""
-        try:
-            ftp = self._get_ftp_connection(config, timeout=30)
-
-            def _delete_recursive(tgt_dir: str):
-                ftp.cwd(tgt_dir)
-                lines = []
-                ftp.dir(lines.append)
-                
-                for line in lines:
-                    if not line.strip():
-                        continue
-                    parts = line.split(None, 8)
-                    if len(parts) >= 9:
-                        name = parts[-1]
-                        if name in ('.', '..'):
-                            continue
-                            
-                        is_folder = line.startswith('d')
-                        if is_folder:
-                            _delete_recursive(name)
-                        else:
-                            ftp.delete(name)
-                            
-                # Go back up and remove the dir itself
-                ftp.cwd("..")
-                folder_name = os.path.basename(tgt_dir.rstrip('/'))
-                if folder_name:
-                    ftp.rmd(folder_name)
+    def delete_path(self, config: FtpServerConfig, remote_path: str, is_dir: bool = False,
+                    progress_callback: Optional[Callable] = None, workers: int = 4) -> Tuple[bool, str]:
+        """在服务器上删除文件或递归删除整个目录
 
+        目录由 DirectoryDeleter 用 workers 条会话并行删除，progress_callback(host, 已删除, 已知总数)
+        报告进度；部分条目删除失败时不中止，返回 False 及失败汇总。
+        """
+        try:
             if not is_dir:
-                ftp.delete(remote_path)
-            else:
-                _delete_recursive(remote_path)
+                with self.pool.session(config, timeout=30) as ftp:
+                    ftp.delete(remote_path)
+                return True, "Delete Success"
 
-            ftp.quit()
-            return True, "Delete Success"
+            from src.core.dir_delete import DirectoryDeleter
+            summary = DirectoryDeleter(self.pool, config, workers, progress_callback).run(remote_path)
+            if summary.ok:
+                return True, "Delete Success: " + summary.describe()
+            logger.error(f"Partial failure deleting {remote_path} on {config.host}: {summary.describe()}")
+            return False, summary.describe()
             
         except Exception as e:
             logger.error(f"Failed to delete {remote_path} on {config.host}: {e}", exc_info=True)
             return False, str(e)
+        finally:
+            # 即使只删除了一部分，远端内容也已变化
+            self.listing_cache.invalidate(config, remote_path)
             
+    def index_server(self, config: FtpServerConfig, root: Optional[str] = None, full: bool = False,
+                     progress_callback: Optional[Callable] = None, workers: Optional[int] = None) -> Tuple[bool, str]:
+        """并行爬取服务器目录树 (默认从登录后的初始目录开始) 并更新本地索引
+
+        默认增量爬取，只重新列举 mtime 变化的目录；full=True 时全部重新列举。
+        progress_callback(host, 已处理目录数, 已知目录数) 报告进度。
+        """
+        from src.core.remote_index import RemoteIndexer
+        try:
+            indexer = RemoteIndexer(self.pool, config, self.remote_index, workers or config.max_connections,
+                                    progress_callback)
+            summary = indexer.crawl(root, full=full)
+            return summary.ok, summary.describe()
+        except Exception as e:
+            logger.error(f"Failed to index {config.host}: {e}", exc_info=True)
+            return False, str(e)
+
+    def search_index(self, config: FtpServerConfig, text: str, limit: int = 1000) -> List[ListEntry]:
+        """在本地索引中按文件名搜索 (不访问网络)；返回 name 为绝对路径的条目"""
+        from src.core.remote_index import server_key
+        return self.remote_index.search(server_key(config), text, limit)
+
+    def index_changes(self, config: FtpServerConfig, since: Optional[int] = None) -> "IndexChanges":
+        """本地索引中最近一次爬取 (或 since 那次爬取之后) 的变化"""
+        from src.core.remote_index import server_key
+        return self.remote_index.changes(server_key(config), since)
+
     def upload_to_all(self, local_paths: List[str], remote_dir: str, 
                       progress_callback: Optional[Callable] = None, 
-                      status_callback: Optional[Callable] = None) -> List[threading.Thread]:
-        """并发上传多个文件/文件夹到所有被启用的服务器"""
-        threads = []
+                      status_callback: Optional[Callable] = None,
+                      broadcast: bool = False, resume: bool = False,
+                      delta: bool = False, progress_interval: float = 0.1) -> JobHandle:
+        """把多个文件/文件夹分发到所有被启用的服务器
+
+        各服务器作为任务交给 self.scheduler：受全局并发数与单主机连接数限制，priority 高的先开始。
+        broadcast=True 时同时运行的服务器共享读取流，每个本地文件尽量只读取一次；
+        resume=True 时对上次中断的文件断点续传；delta=True 时跳过未变化的文件。
+        回调的第一个参数是 config.server_id；进度被合并后每 progress_interval 秒最多回报一次。
+        本次任务的统计保存在 self.upload_metrics 中，可随时读取快照或导出 JSON；
+        各文件的摘要 (每个文件只计算一次) 在全部结束后写入清单文件，保存为 self.upload_checksums。
+        返回 JobHandle：可注册 on_task_done / on_all_done 完成事件、wait() 或 cancel()。
+        """
+        registry = MetricsRegistry()
+        self.upload_metrics = registry
+        enabled_servers = [s for s in self.servers if getattr(s, 'enabled', True)]
+        # 服务器开始传输时才加入广播，排队中的服务器不会拖住共享缓冲区
+        hub = None
+        if broadcast and len(enabled_servers) > 1:
+            from src.core.broadcast import BroadcastHub
+            hub = BroadcastHub()
+        aggregator = ProgressAggregator(progress_callback, progress_interval).start() if progress_callback else None
+        handle = self.scheduler.new_job()
+        if aggregator:
+            handle.on_all_done(lambda _: aggregator.close())
+        checksums = ChecksumManifest("upload", self.checksum_algorithm) if self.checksum_algorithm else None
+        if checksums:
+            self.upload_checksums = checksums
+            handle.on_all_done(lambda _: self._finish_upload_checksums(checksums, manifest))
+        # 本地目录树只扫描一次：由第一台开始传输的服务器触发，其余服务器共享结果
+        manifest_lock = threading.Lock()
+        manifest: Optional[LocalManifest] = None
+
+        def get_manifest() -> LocalManifest:
+            nonlocal manifest
+            with manifest_lock:
+                if manifest is None:
+                    manifest = LocalManifest.scan(local_paths)
+                return manifest
         
-        def worker(config: FtpServerConfig):
+        def worker(config: FtpServerConfig, metrics: TransferMetrics) -> Tuple[bool, str]:
+            results: List[FileTransferResult] = []
+
+            def on_file_done(host: str, result: FileTransferResult):
+                results.append(result)
+                if status_callback and result.status == "resumed":
+                    status_callback(config.server_id, result.describe(), 0)
+
+            def on_progress(host: str, done: int, total: int):
+                aggregator.update(config.server_id, done, total)
+
+            def on_retry(host: str, message: str):
+                if status_callback:
+                    status_callback(config.server_id, message, 0)
+
             if status_callback:
-                status_callback(config.host, "Uploading...", 0) # status: 0 for in progress
+                status_callback(config.server_id, "Uploading...", 0) # status: 0 for in progress
             
-            # 优先使用该服务器自带的独立路径配置，如果没有再使用全局传进来的默认路径
-            target_dir = config.remote_dir.strip() if config.remote_dir and config.remote_dir.strip() else remote_dir
+            target_dir = self._target_dir(config, remote_dir)
                 
-            success, msg = self.upload_paths_to_server(config, local_paths, target_dir, progress_callback)
+            if hub:
+                hub.add_consumer(config)
+            try:
+                success, msg = self.upload_paths_to_server(config, local_paths, target_dir,
+                                                           on_progress if aggregator else None,
+                                                           hub, resume, on_file_done, delta, metrics, on_retry,
+                                                           get_manifest(), checksums)
+            finally:
+                if hub:
+                    hub.release(config)
+                if aggregator:
+                    # 先补发该服务器的最终进度，再报告最终状态
+                    aggregator.flush()
             if status_callback:
-                status_callback(config.host, f"Success" if success else f"Failed: {msg}", 1 if success else -1)
+                if success:
+                    status_callback(config.server_id, "Success" + FileTransferResult.summarize(results), 1)
+                else:
+                    status_callback(config.server_id, f"Failed: {msg}", -1)
+            return success, msg
+
+        def on_task_done(task: ScheduledTask):
+            # 被取消 (尚未开始即被移出队列) 的服务器也要有最终状态
+            if task.state == CANCELLED:
+                status_callback(task.key, "已取消", -1)
+
+        if status_callback:
+            handle.on_task_done(on_task_done)
 
-        for server in self.servers:
+        # 按优先级提交：先提交的任务可能立即开始，金丝雀节点必须排在最前面
+        for server in sorted(self.servers, key=lambda s: -s.priority):
             if not getattr(server, 'enabled', True):
                 if status_callback:
-                    status_callback(server.host, "已跳过 (未启用)", 0)
+                    status_callback(server.server_id, "已跳过 (未启用)", 0)
                 continue
             
-            t = threading.Thread(target=worker, args=(server,))
-            threads.append(t)
-            t.start()
+            if status_callback:
+                status_callback(server.server_id, "排队中...", 0)
+            self._submit_server(handle, server, lambda cfg=server, m=registry.start(server): worker(cfg, m))
             
-        return threads
+        handle.seal()
+        return handle
+
+    def _submit_server(self, handle: JobHandle, config: FtpServerConfig, fn: Callable) -> ScheduledTask:
+        """把一台服务器的整次任务交给调度器：占用 min(upload_workers, max_connections) 条连接
+
+        登录参数相同的配置共用一个连接池，调度时按其中最小的 max_connections 限制这些任务的连接总数。
+        """
+        key = config.connection_key()
+        pool_limit = min(s.max_connections for s in self.servers + [config] if s.connection_key() == key)
+        weight = max(1, min(config.upload_workers, config.max_connections))
+        return self.scheduler.submit(handle, config.server_id, config.host, fn, priority=config.priority,
+                                     weight=weight, pool_key=key, pool_limit=pool_limit)
+
+    def _finish_upload_checksums(self, checksums: ChecksumManifest, manifest: Optional[LocalManifest]):
+        # 先完成的服务器记录时，同一文件可能仍在由另一台服务器计算摘要；这里统一补全
+        if manifest is not None:
+            checksums.fill_digests(self.digests, {f.local_path: f.mtime for f in manifest.files})
+        self._save_checksums(checksums)
+
+    @staticmethod
+    def _save_checksums(checksums: ChecksumManifest):
+        try:
+            checksums.save()
+        except OSError as e:
+            logger.warning(f"Failed to write checksum manifest: {e}")
+
+    @staticmethod
+    def _target_dir(config: FtpServerConfig, remote_dir: str) -> str:
+        # 优先使用该服务器自带的独立路径配置，如果没有再使用全局传进来的默认路径
+        return config.remote_dir.strip() if config.remote_dir and config.remote_dir.strip() else remote_dir
+
+    def verify_server(self, config: FtpServerConfig, local_paths: List[str], remote_dir: str,
+                      manifest: Optional[LocalManifest] = None, digests: Optional[DigestCache] = None,
+                      progress_callback: Optional[Callable] = None) -> "VerifyReport":
+        """校验 local_paths 在服务器上的副本：按 FEAT 使用 HASH / XSHA256 / XMD5 / XCRC，都不支持时只比对大小
+
+        digests 为多台服务器共享的本地摘要缓存；progress_callback(host, 已校验, 总数)。
+        """
+        from src.core.verify import ServerVerifier, VerifyReport
+        try:
+            manifest = manifest or LocalManifest.scan(local_paths)
+            with self.pool.session(config, timeout=30) as ftp:
+                base_remote_dir = resolve_remote_dir(ftp, remote_dir)
+            jobs = self._manifest_jobs(manifest, base_remote_dir)
+            return ServerVerifier(self.pool, config, digests or self.digests, config.upload_workers,
+                                  progress_callback).run(jobs)
+        except Exception as e:
+            logger.error(f"Verify failed for {config.host}: {e}", exc_info=True)
+            report = VerifyReport(config.server_id, config.host)
+            report.error = str(e)
+            return report
+
+    def verify_all(self, local_paths: List[str], remote_dir: str,
+                   progress_callback: Optional[Callable] = None,
+                   status_callback: Optional[Callable] = None) -> JobHandle:
+        """分发完成后并行校验所有启用的服务器，结果保存在 self.verify_reports
+
+        本地摘要取自 self.digests：分发时已顺带算出的直接复用，其余每个文件只计算一次；回调的第一个参数是 config.server_id，
+        progress_callback 收到的是已校验/总文件数。统计保存在新的 self.verify_metrics 中。
+        不一致的文件可用 reupload_mismatches 重传。
+        """
+        reports: Dict[str, "VerifyReport"] = {}
+        self.verify_reports = reports
+        registry = MetricsRegistry()
+        self.verify_metrics = registry
+        manifest_lock = threading.Lock()
+        manifest: Optional[LocalManifest] = None
+
+        def get_manifest() -> LocalManifest:
+            nonlocal manifest
+            with manifest_lock:
+                if manifest is None:
+                    manifest = LocalManifest.scan(local_paths)
+                return manifest
+
+        def worker(config: FtpServerConfig) -> Tuple[bool, str]:
+            if status_callback:
+                status_callback(config.server_id, "Verifying...", 0)
+            metrics = registry.start(config, "verify")
+
+            def on_progress(host: str, done: int, total: int):
+                metrics.update(done, total)
+                if progress_callback:
+                    progress_callback(config.server_id, done, total)
+
+            report = self.verify_server(config, local_paths, self._target_dir(config, remote_dir),
+                                        get_manifest(), self.digests, on_progress)
+            reports[config.server_id] = report
+            metrics.finish(report.ok, report.describe())
+            if status_callback:
+                if report.ok:
+                    status_callback(config.server_id, "Verified: " + report.describe(), 1)
+                else:
+                    status_callback(config.server_id, report.describe().splitlines()[0], -1)
+            return report.ok, report.describe()
+
+        handle = self.scheduler.new_job()
+        for server in sorted(self.servers, key=lambda s: -s.priority):
+            if not getattr(server, 'enabled', True):
+                continue
+            if status_callback:
+                status_callback(server.server_id, "等待校验...", 0)
+            self._submit_server(handle, server, lambda cfg=server: worker(cfg))
+        handle.seal()
+        return handle
+
+    def reupload_files(self, config: FtpServerConfig, jobs: List[UploadJob],
+                       progress_callback: Optional[Callable] = None,
+                       metrics: Optional[TransferMetrics] = None) -> List[FileTransferResult]:
+        """完整重传指定文件 (先补建缺失的远端目录)；失败按 config.retry_policies 重试
+
+        统计记录在 metrics (未传入时新建) 中。
+        """
+        dirs = set()
+        for job in jobs:
+            path = normalize_remote_path(job.remote_dir)
+            while path != "/" and path not in dirs:
+                dirs.add(path)
+                path = posixpath.dirname(path)
+        rel_dirs = sorted((d.lstrip('/') for d in dirs), key=lambda d: d.count('/'))
+        with self.pool.session(config, timeout=30) as ftp:
+            RemoteDirPlanner("/", rel_dirs).ensure(ftp)
+
+        total_size = sum(job.size for job in jobs)
+        metrics = metrics or TransferMetrics(config, "reupload")
+        results: List[FileTransferResult] = []
+
+        def _attempt(attempt: int):
+            finished = {r.remote_path for r in results}
+            pending = [job for job in jobs if job.remote_path not in finished]
+            self._run_upload_jobs(config, pending, total_size, progress_callback, metrics=metrics, results=results,
+                                  initial_progress=total_size - sum(job.size for job in pending))
+
+        try:
+            call_with_retry(_attempt, build_policies(config.retry_policies))
+        finally:
+            self.listing_cache.invalidate_server(config)
+        return results
+
+    def reupload_mismatches(self, progress_callback: Optional[Callable] = None,
+                            status_callback: Optional[Callable] = None) -> JobHandle:
+        """重传最近一次校验中不一致的文件，完成后重新校验这些文件并更新 self.verify_reports
+
+        重传的统计保存在新的 self.verify_metrics 中 (kind="reupload")。
+        """
+        from src.core.verify import ServerVerifier
+        configs = {server.server_id: server for server in self.servers}
+        registry = MetricsRegistry()
+        self.verify_metrics = registry
+
+        def worker(config: FtpServerConfig, report: "VerifyReport") -> Tuple[bool, str]:
+            jobs = [job for job, _ in report.mismatches]
+            if status_callback:
+                status_callback(config.server_id, f"Re-uploading {len(jobs)} files...", 0)
+            on_progress = (lambda host, done, total: progress_callback(config.server_id, done, total)) \
+                if progress_callback else None
+            metrics = registry.start(config, "reupload")
+            try:
+                self.reupload_files(config, jobs, on_progress, metrics)
+                recheck = ServerVerifier(self.pool, config, self.digests, config.upload_workers).run(jobs)
+            except Exception as e:
+                metrics.finish(False, str(e))
+                logger.error(f"Re-upload failed for {config.host}: {e}", exc_info=True)
+                if status_callback:
+                    status_callback(config.server_id, f"Re-upload failed: {e}", -1)
+                return False, str(e)
+            report.matched += recheck.matched
+            report.size_only += recheck.size_only
+            report.mismatches = recheck.mismatches
+            metrics.finish(report.ok, report.describe())
+            if status_callback:
+                if report.ok:
+                    status_callback(config.server_id, f"Repaired {len(jobs)} files: " + report.describe(), 1)
+                else:
+                    status_callback(config.server_id, report.describe().splitlines()[0], -1)
+            return report.ok, report.describe()
+
+        handle = self.scheduler.new_job()
+        for server_id, report in self.verify_reports.items():
+            config = configs.get(server_id)
+            if config is None or not report.mismatches:
+                continue
+            self._submit_server(handle, config, lambda cfg=config, r=report: worker(cfg, r))
+        handle.seal()
+        return handle
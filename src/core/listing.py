@@ -0,0 +1,315 @@
+import calendar
+import ftplib
+import re
+import threading
+import time
+from contextlib import closing
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional
+from src.core import modez
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TYPE_FILE = "file"
+TYPE_DIR = "dir"
+TYPE_LINK = "link"
+# 表示 MLSD 命令本身不被支持 (未实现/语法错误/参数不支持) 的回复码
+MLSD_UNSUPPORTED_CODES = ('500', '501', '502', '504')
+
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun",
+                                       "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+# Unix: "drwxr-xr-x   2 owner group   4096 Jan 31 12:34 name" (group 可省略)；
+# 时间后只吃掉一个空格，以空格开头的文件名得以保留
+_UNIX_RE = re.compile(
+    r'^([-dlbcpsD])\S{9,10}\s+\d+\s+\S+\s+(?:\S+\s+)?(\d+)\s+'
+    r'([A-Za-z]{3})\s+(\d{1,2})\s+(\d{1,2}:\d{2}|\d{4})\s(.*)$')
+# DOS/IIS: "01-31-24  12:34PM       <DIR>          name" / "01-31-2024  12:34  1234 name"
+_DOS_RE = re.compile(
+    r'^(\d{2}-\d{2}-(?:\d{2}|\d{4}))\s+(\d{1,2}:\d{2})\s*([AaPp][Mm])?\s+(<DIR>|\d+)\s+(.*)$')
+
+
+class ListEntry:
+    """目录中的一个条目：type 为 file/dir/link，size 未知时为 -1，mtime 为 UTC 时间戳 (未知时为 None)"""
+    __slots__ = ("name", "type", "size", "mtime")
+
+    def __init__(self, name: str, type: str = TYPE_FILE, size: int = -1, mtime: Optional[float] = None):
+        self.name = name
+        self.type = type
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def is_dir(self) -> bool:
+        return self.type == TYPE_DIR
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "type": self.type, "size": self.size, "mtime": self.mtime}
+
+    def __repr__(self):
+        return f"ListEntry({self.name!r}, {self.type!r}, {self.size}, {self.mtime})"
+
+
+@lru_cache(maxsize=4096)
+def _day_start(year: int, month: int, day: int) -> Optional[int]:
+    """某天 00:00 UTC 的时间戳；列表中的日期高度重复，缓存后每行只需做加法"""
+    try:
+        return calendar.timegm((year, month, day, 0, 0, 0, 0, 0, 0))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _stamp(year: int, month: int, day: int, hour: int = 0, minute: int = 0, second: int = 0) -> Optional[float]:
+    if not (1 <= month <= 12 and 1 <= day <= 31 and hour < 24 and minute < 60 and second < 62):
+        return None
+    start = _day_start(year, month, day)
+    return None if start is None else float(start + hour * 3600 + minute * 60 + second)
+
+
+@lru_cache(maxsize=4096)
+def _ymd_start(ymd: str) -> Optional[int]:
+    return _day_start(int(ymd[0:4]), int(ymd[4:6]), int(ymd[6:8])) if 1 <= int(ymd[4:6]) <= 12 else None
+
+
+def parse_ftp_time(value: str) -> Optional[float]:
+    """把 MLSD/MDTM 的 YYYYMMDDHHMMSS[.sss] (UTC) 转为时间戳"""
+    if not value or len(value) < 14 or not value[:14].isdigit():
+        return None
+    day = _ymd_start(value[:8])
+    hour, rest = divmod(int(value[8:14]), 10000)
+    minute, second = divmod(rest, 100)
+    if day is None or hour > 23 or minute > 59 or second > 61:
+        return None
+    seconds = float(day + hour * 3600 + minute * 60 + second)
+    if len(value) > 15 and value[14] == '.':
+        try:
+            seconds += float("0" + value[14:])
+        except ValueError:
+            pass
+    return seconds
+
+
+def parse_mlsd_line(line: str) -> Optional[ListEntry]:
+    """解析一行 MLSD 输出 ("fact=value;fact=value; name")；返回 None 表示 . / .. 或无法解析
+
+    只查找需要的事实 (str.find)，不为每行构造事实字典。
+    """
+    facts, sep, name = line.partition(' ')
+    if not sep or not name or name == '.' or name == '..':
+        return None
+    # 首尾补 ";" 后每个事实都形如 ";key=value;"
+    facts = ';' + facts.lower()
+    if facts[-1] != ';':
+        facts += ';'
+    find = facts.find
+    entry_type = TYPE_FILE
+    i = find(';type=')
+    if i >= 0:
+        i += 6
+        value = facts[i:find(';', i)]
+        if value == 'dir':
+            entry_type = TYPE_DIR
+        elif value == 'cdir' or value == 'pdir':
+            return None
+        elif value.startswith('os.unix=slink') or value.startswith('os.unix=symlink'):
+            entry_type = TYPE_LINK
+    size = -1
+    i = find(';size=')
+    if i < 0:
+        i = find(';sizd=')
+    if i >= 0:
+        i += 6
+        value = facts[i:find(';', i)]
+        if value.isdigit():
+            size = int(value)
+    mtime = None
+    i = find(';modify=')
+    if i >= 0:
+        i += 8
+        mtime = parse_ftp_time(facts[i:find(';', i)])
+    return ListEntry(name, entry_type, size, mtime)
+
+
+@lru_cache(maxsize=4096)
+def _unix_time(month: str, day: str, clock_or_year: str, now_hour: int) -> Optional[float]:
+    """LIST 中的 "Jan 31 12:34" / "Jan 31 2023" 转为时间戳；同一列表中的日期大量重复，按原文缓存"""
+    mon = _MONTHS.get(month.lower())
+    if mon is None:
+        return None
+    if len(clock_or_year) == 4 and clock_or_year.isdigit():
+        return _stamp(int(clock_or_year), mon, int(day))
+    hour, _, minute = clock_or_year.partition(':')
+    # 不带年份的是近半年内的时间：先按今年算，落在未来则是去年
+    now = now_hour * 3600
+    this_year = time.gmtime(now).tm_year
+    stamp = _stamp(this_year, mon, int(day), int(hour), int(minute))
+    if stamp is not None and stamp > now + 2 * 86400:
+        stamp = _stamp(this_year - 1, mon, int(day), int(hour), int(minute))
+    return stamp
+
+
+@lru_cache(maxsize=4096)
+def _dos_time(date: str, clock: str, ampm: Optional[str]) -> Optional[float]:
+    """DOS/IIS 列表中的 "01-31-24" + "12:34PM" 转为时间戳，按原文缓存"""
+    month, day, year = date.split('-')
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 70 else 1900
+    hour, _, minute = clock.partition(':')
+    hour = int(hour)
+    if ampm:
+        hour = hour % 12 + (12 if ampm.lower() == 'pm' else 0)
+    return _stamp(year, int(month), int(day), hour, int(minute))
+
+
+def parse_list_line(line: str, now: Optional[float] = None) -> Optional[ListEntry]:
+    """解析一行 Unix 或 DOS/IIS 格式的 LIST 输出；total 行、. / .. 及无法识别的行返回 None
+
+    LIST 的时间没有时区信息，按 UTC 处理。
+    """
+    m = _UNIX_RE.match(line)
+    if m:
+        kind, size, month, day, clock_or_year, name = m.groups()
+        if kind == 'l':
+            entry_type = TYPE_LINK
+            # "name -> target"
+            arrow = name.find(' -> ')
+            if arrow >= 0:
+                name = name[:arrow]
+        else:
+            entry_type = TYPE_DIR if kind in ('d', 'D') else TYPE_FILE
+        if name in ('.', '..') or not name:
+            return None
+        mtime = _unix_time(month, day, clock_or_year, int(time.time() if now is None else now) // 3600)
+        return ListEntry(name, entry_type, int(size), mtime)
+
+    m = _DOS_RE.match(line)
+    if m:
+        date, clock, ampm, size, name = m.groups()
+        if name in ('.', '..'):
+            return None
+        mtime = _dos_time(date, clock, ampm)
+        if size == '<DIR>':
+            return ListEntry(name, TYPE_DIR, -1, mtime)
+        return ListEntry(name, TYPE_FILE, int(size), mtime)
+    return None
+
+
+def _iter_lines(ftp: ftplib.FTP, cmd: str, cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+    """逐行读取 cmd 的数据连接输出 (与 retrlines 相同，但边读边交给调用方，不先收集整个列表)
+
+    每读一行检查一次 cancel_event；被置位或调用方提前结束迭代时断开数据连接，
+    并读掉服务器随之发出的 426/226 应答，使会话仍可复用。
+    """
+    ftp.sendcmd('TYPE A')
+    conn = ftp.transfercmd(cmd)
+    complete = False
+    try:
+        with conn.makefile('r', encoding=ftp.encoding) as fp:
+            while cancel_event is None or not cancel_event.is_set():
+                line = fp.readline(ftplib.MAXLINE + 1)
+                if len(line) > ftplib.MAXLINE:
+                    raise ftplib.Error(f"got more than {ftplib.MAXLINE} bytes")
+                if not line:
+                    complete = True
+                    break
+                yield line.rstrip('\r\n')
+    finally:
+        conn.close()
+        if not complete:
+            try:
+                ftp.voidresp()
+            except (ftplib.Error, OSError, EOFError):
+                pass
+    if complete:
+        ftp.voidresp()
+
+
+def iter_mlsd(ftp: ftplib.FTP, path: str = "", cancel_event: Optional[threading.Event] = None) -> Iterator[ListEntry]:
+    """以 MLSD 流式列出 path (为空时为当前目录)；服务器不支持时在取第一个条目时抛出 ftplib.error_perm"""
+    modez.disable_mode_z(ftp)
+    for line in _iter_lines(ftp, f'MLSD {path}' if path else 'MLSD', cancel_event):
+        entry = parse_mlsd_line(line)
+        if entry is not None:
+            yield entry
+
+
+def iter_list(ftp: ftplib.FTP, path: str = "", cancel_event: Optional[threading.Event] = None) -> Iterator[ListEntry]:
+    """以 LIST 流式列出 path (为空时为当前目录)
+
+    LIST 带路径参数时部分服务器对空格处理不一致，因此先切换到 path 再列出，结束 (含取消/出错) 后切回原工作目录。
+    """
+    previous = None
+    if path:
+        previous = ftp.pwd()
+        ftp.cwd(path)
+    try:
+        modez.disable_mode_z(ftp)
+        now = time.time()
+        for line in _iter_lines(ftp, 'LIST', cancel_event):
+            entry = parse_list_line(line, now)
+            if entry is not None:
+                yield entry
+    finally:
+        if previous is not None:
+            ftp.cwd(previous)
+
+
+def mlst(ftp: ftplib.FTP, path: str) -> Optional[ListEntry]:
+    """以 MLST 查询单个路径的事实 (只走控制连接，不建立数据连接)；name 为服务器返回的路径
+
+    服务器不支持 MLST 或路径不存在时抛出 ftplib.error_perm。
+    """
+    resp = ftp.sendcmd(f'MLST {path}')
+    for line in resp.splitlines()[1:-1]:
+        line = line.lstrip()
+        facts, sep, name = line.partition(' ')
+        if not sep:
+            continue
+        # MLST 查询目录本身时部分服务器回复 type=cdir，这里按普通目录对待
+        facts = facts.lower().replace('type=cdir;', 'type=dir;')
+        entry = parse_mlsd_line(f"{facts} {name}")
+        if entry is not None:
+            return entry
+    return None
+
+
+class DirectoryLister:
+    """优先 MLSD、不支持时改用 LIST 的目录列举器；每个实例只探测一次 MLSD 支持情况"""
+
+    def __init__(self, host: str = ""):
+        self.host = host
+        self.mlsd_supported = True
+
+    def iter(self, ftp: ftplib.FTP, path: str = "",
+             cancel_event: Optional[threading.Event] = None) -> Iterator[ListEntry]:
+        """流式列出 path；cancel_event 被置位时中止数据连接并提前结束"""
+        if self.mlsd_supported:
+            entries = iter_mlsd(ftp, path, cancel_event)
+            try:
+                # MLSD 不被支持的应答在建立数据连接时 (即取第一个条目时) 到达
+                first = next(entries, None)
+            except ftplib.error_perm as e:
+                # 只有命令本身不被支持时才改用 LIST；550 等 (目录不存在/无权限) 与 MLSD 支持与否无关
+                if not str(e).startswith(MLSD_UNSUPPORTED_CODES):
+                    raise
+                logger.info(f"MLSD unavailable on {self.host}, falling back to LIST: {e}")
+                self.mlsd_supported = False
+            else:
+                if first is not None:
+                    yield first
+                    yield from entries
+                return
+        yield from iter_list(ftp, path, cancel_event)
+
+    def list(self, ftp: ftplib.FTP, path: str = "", on_entry: Optional[Callable[[ListEntry], None]] = None,
+             cancel_event: Optional[threading.Event] = None) -> List[ListEntry]:
+        entries = []
+        # on_entry 抛出异常时立即关闭生成器，在会话归还前中止数据连接
+        with closing(self.iter(ftp, path, cancel_event)) as it:
+            for entry in it:
+                if on_entry:
+                    on_entry(entry)
+                entries.append(entry)
+        return entries
@@ -0,0 +1,83 @@
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from src.core.listing import ListEntry
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_remote_path(path: str) -> str:
+    """规范化远端绝对路径，例如 ``/a//b/`` -> ``/a/b``"""
+    path = posixpath.normpath(path.replace('\\', '/'))
+    return "/" if path in ("", ".", "//") else path
+
+
+class ListingCache:
+    """远端目录列表缓存：按 (服务器, 绝对路径) 存放，带 TTL 与 LRU 内存上限
+
+    上限按缓存的条目总数计算 (而非目录数)，单个超大目录也不会让缓存无限膨胀。
+    """
+
+    def __init__(self, ttl: float = 30.0, max_items: int = 200_000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries: "OrderedDict[Tuple[tuple, str], Tuple[float, List[ListEntry]]]" = OrderedDict()
+        self._item_count = 0
+        self._lock = threading.Lock()
+
+    def get(self, config, path: str) -> Optional[List[ListEntry]]:
+        key = (config.connection_key(), normalize_remote_path(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, items = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return items
+
+    def put(self, config, path: str, items: List[ListEntry]):
+        key = (config.connection_key(), normalize_remote_path(path))
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic(), items)
+            self._item_count += len(items)
+            while self._item_count > self.max_items and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._pop(oldest)
+
+    def _pop(self, key):
+        _, items = self._entries.pop(key)
+        self._item_count -= len(items)
+
+    def invalidate(self, config, path: str):
+        """path 的内容发生了变化：清除其整棵子树以及所有上级目录的缓存"""
+        server = config.connection_key()
+        path = normalize_remote_path(path)
+        prefix = path.rstrip('/') + '/'
+        ancestors = set()
+        parent = path
+        while True:
+            ancestors.add(parent)
+            if parent == "/":
+                break
+            parent = posixpath.dirname(parent)
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] != server:
+                    continue
+                if key[1] in ancestors or key[1].startswith(prefix):
+                    self._pop(key)
+
+    def invalidate_server(self, config):
+        server = config.connection_key()
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == server:
+                    self._pop(key)
@@ -0,0 +1,202 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 计时阶段：建立会话 (连接 + 登录，或从连接池取出)、建目录/切换目录/列举、数据传输
+PHASE_CONNECT = "connect"
+PHASE_MKDIR = "mkdir"
+PHASE_TRANSFER = "transfer"
+
+
+class FileTiming:
+    """单个文件的传输记录 (时间为 Unix 时间戳)"""
+    __slots__ = ("path", "size", "status", "started", "finished")
+
+    def __init__(self, path: str, size: int, status: str, started: float, finished: float):
+        self.path = path
+        self.size = size
+        self.status = status
+        self.started = started
+        self.finished = finished
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "size": self.size,
+            "status": self.status,
+            "started": self.started,
+            "finished": self.finished,
+            "seconds": round(self.finished - self.started, 3),
+        }
+
+
+class TransferMetrics:
+    """一台服务器一次传输的统计：字节数、瞬时/平滑速率、ETA、各阶段耗时与逐文件记录
+
+    传输线程只调用 update()/add_time()/record_file() 这类廉价操作；速率在 snapshot()
+    被调用 (通常由 UI 以约 10 Hz 读取) 时按两次采样的差值计算。多条会话并行时，
+    各阶段耗时是所有会话的累计值。
+    """
+
+    # 指数平滑的时间常数 (秒)：越大越平稳
+    EWMA_TAU = 5.0
+    # 两次采样间隔过短时沿用上一次的瞬时速率，避免抖动
+    MIN_SAMPLE_INTERVAL = 0.25
+
+    def __init__(self, config, kind: str = "upload"):
+        self.server_id = config.server_id
+        self.name = config.name
+        self.host = config.host
+        self.kind = kind
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.success: Optional[bool] = None
+        self.message = ""
+        self.phases: Dict[str, float] = {PHASE_CONNECT: 0.0, PHASE_MKDIR: 0.0, PHASE_TRANSFER: 0.0}
+        self.files: List[FileTiming] = []
+        # (已传输字节, 总字节)，整体替换以保证读取方看到一致的一对值
+        self._progress = (0, 0)
+        self._lock = threading.Lock()
+        self._last_sample: Optional[tuple] = None
+        self._rate = 0.0
+        self._ewma: Optional[float] = None
+
+    def update(self, done: int, total: int):
+        self._progress = (done, total)
+
+    @property
+    def bytes_done(self) -> int:
+        return self._progress[0]
+
+    def add_time(self, phase: str, seconds: float):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def record_file(self, path: str, size: int, status: str, started: float, finished: float):
+        with self._lock:
+            self.files.append(FileTiming(path, size, status, started, finished))
+
+    def finish(self, success: bool, message: str = ""):
+        self.finished = time.time()
+        self.success = success
+        self.message = message
+
+    def _sample(self, now: float, done: int):
+        last = self._last_sample
+        if last is None:
+            self._last_sample = (now, done)
+            return
+        dt = now - last[0]
+        if dt < self.MIN_SAMPLE_INTERVAL:
+            return
+        self._rate = max(0.0, (done - last[1]) / dt)
+        alpha = 1.0 - math.exp(-dt / self.EWMA_TAU)
+        self._ewma = self._rate if self._ewma is None else self._ewma + alpha * (self._rate - self._ewma)
+        self._last_sample = (now, done)
+
+    def snapshot(self) -> dict:
+        done, total = self._progress
+        with self._lock:
+            if self.finished is None:
+                self._sample(time.monotonic(), done)
+            end = self.finished if self.finished is not None else time.time()
+            elapsed = max(end - self.started, 1e-6)
+            average = done / elapsed
+            ewma = self._ewma if self._ewma is not None else average
+            rate = self._rate if self.finished is None else 0.0
+            if self.finished is not None or total <= done:
+                eta: Optional[float] = 0.0
+            elif ewma > 0:
+                eta = (total - done) / ewma
+            else:
+                eta = None
+            return {
+                "server_id": self.server_id,
+                "name": self.name,
+                "host": self.host,
+                "kind": self.kind,
+                "bytes_done": done,
+                "bytes_total": total,
+                "rate": rate,
+                "rate_ewma": ewma,
+                "rate_average": average,
+                "eta": eta,
+                "elapsed": elapsed,
+                "phases": {k: round(v, 3) for k, v in self.phases.items()},
+                "started": self.started,
+                "finished": self.finished,
+                "success": self.success,
+                "message": self.message,
+                "file_count": len(self.files),
+            }
+
+    def to_dict(self) -> dict:
+        data = self.snapshot()
+        with self._lock:
+            data["files"] = [f.to_dict() for f in self.files]
+        return data
+
+
+class MetricsRegistry:
+    """一次分发任务中各服务器的统计，可导出为 JSON"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._servers: Dict[str, TransferMetrics] = {}
+        self._lock = threading.Lock()
+
+    def start(self, config, kind: str = "upload") -> TransferMetrics:
+        metrics = TransferMetrics(config, kind)
+        with self._lock:
+            self._servers[config.server_id] = metrics
+        return metrics
+
+    def get(self, server_id: str) -> Optional[TransferMetrics]:
+        return self._servers.get(server_id)
+
+    def all(self) -> List[TransferMetrics]:
+        with self._lock:
+            return list(self._servers.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "started": self.started,
+            "exported": time.time(),
+            "servers": [m.to_dict() for m in self.all()],
+        }
+
+    def export_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        logger.info(f"Transfer metrics exported to {path}")
+
+
+def format_rate(bytes_per_second: float) -> str:
+    if bytes_per_second >= 1024 * 1024:
+        return f"{bytes_per_second / (1024 * 1024):.1f} MB/s"
+    if bytes_per_second >= 1024:
+        return f"{bytes_per_second / 1024:.1f} KB/s"
+    return f"{bytes_per_second:.0f} B/s"
+
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
@@ -0,0 +1,109 @@
+import ftplib
+import zlib
+from typing import Callable, Optional, Set
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 会话上记录的状态 (FTP 对象的属性)：服务器特性集合、当前是否处于 MODE Z
+_FEATURES_ATTR = "ftptool_features"
+_MODE_Z_ATTR = "ftptool_mode_z"
+
+DEFAULT_LEVEL = 6
+
+
+def server_features(ftp: ftplib.FTP) -> Set[str]:
+    """发送 FEAT 并解析特性列表 (大写)，结果缓存在会话上；服务器不支持 FEAT 时为空集"""
+    features = getattr(ftp, _FEATURES_ATTR, None)
+    if features is None:
+        features = set()
+        try:
+            resp = ftp.sendcmd('FEAT')
+        except (ftplib.error_perm, ftplib.error_reply):
+            resp = ""
+        for line in resp.splitlines()[1:-1]:
+            line = line.strip()
+            if line:
+                features.add(line.upper())
+        setattr(ftp, _FEATURES_ATTR, features)
+    return features
+
+
+def has_feature(ftp: ftplib.FTP, name: str) -> bool:
+    """name 为特性关键字，例如 "MODE Z"、"HASH" (只比较开头，忽略参数)"""
+    name = name.upper()
+    return any(f == name or f.startswith(name + " ") for f in server_features(ftp))
+
+
+def is_mode_z(ftp: ftplib.FTP) -> bool:
+    return getattr(ftp, _MODE_Z_ATTR, False)
+
+
+def enable_mode_z(ftp: ftplib.FTP, level: int = DEFAULT_LEVEL) -> bool:
+    """FEAT 中声明了 MODE Z 时切换到压缩模式；返回 False 表示保持 MODE S"""
+    if is_mode_z(ftp):
+        return True
+    if not has_feature(ftp, "MODE Z"):
+        return False
+    try:
+        ftp.voidcmd('MODE Z')
+    except (ftplib.error_perm, ftplib.error_reply) as e:
+        logger.info(f"Server rejected MODE Z, staying in MODE S: {e}")
+        # 不再尝试：同一会话后续传输直接走 MODE S
+        server_features(ftp).discard("MODE Z")
+        return False
+    try:
+        # 压缩级别是可选扩展，不支持时使用服务器默认值
+        ftp.voidcmd(f'OPTS MODE Z LEVEL {level}')
+    except (ftplib.error_perm, ftplib.error_reply):
+        pass
+    setattr(ftp, _MODE_Z_ATTR, True)
+    return True
+
+
+def disable_mode_z(ftp: ftplib.FTP):
+    """恢复 MODE S (列目录、REST 续传等需要原始字节流的操作之前调用)"""
+    if is_mode_z(ftp):
+        ftp.voidcmd('MODE S')
+        setattr(ftp, _MODE_Z_ATTR, False)
+
+
+def storbinary(ftp: ftplib.FTP, cmd: str, fp, blocksize: int = 8192, callback: Optional[Callable] = None,
+               level: int = DEFAULT_LEVEL) -> str:
+    """与 ftplib.FTP.storbinary 相同，但在 MODE Z 下边读边 deflate 压缩；callback 收到的是原始数据块"""
+    if not is_mode_z(ftp):
+        return ftp.storbinary(cmd, fp, blocksize, callback)
+    ftp.voidcmd('TYPE I')
+    compressor = zlib.compressobj(level)
+    with ftp.transfercmd(cmd) as conn:
+        while True:
+            buf = fp.read(blocksize)
+            if not buf:
+                break
+            data = compressor.compress(buf)
+            if data:
+                conn.sendall(data)
+            if callback:
+                callback(buf)
+        conn.sendall(compressor.flush())
+    return ftp.voidresp()
+
+
+def retrbinary(ftp: ftplib.FTP, cmd: str, callback: Callable, blocksize: int = 8192) -> str:
+    """与 ftplib.FTP.retrbinary 相同，但在 MODE Z 下边收边解压；callback 收到的是解压后的数据"""
+    if not is_mode_z(ftp):
+        return ftp.retrbinary(cmd, callback, blocksize)
+    ftp.voidcmd('TYPE I')
+    decompressor = zlib.decompressobj()
+    with ftp.transfercmd(cmd) as conn:
+        while True:
+            data = conn.recv(blocksize)
+            if not data:
+                break
+            out = decompressor.decompress(data)
+            if out:
+                callback(out)
+        tail = decompressor.flush()
+        if tail:
+            callback(tail)
+    return ftp.voidresp()
@@ -0,0 +1,89 @@
+import threading
+from typing import Callable, Dict, Optional
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _TransferCounter:
+    """单个传输的字节计数；写入方只做加法，由刷新线程读取快照"""
+    __slots__ = ("done", "total", "reported", "lock")
+
+    def __init__(self, total: int = 0):
+        self.done = 0
+        self.total = total
+        self.reported = (-1, -1)
+        self.lock = threading.Lock()
+
+
+class ProgressAggregator:
+    """合并高频进度更新，按固定频率 (默认 10 Hz) 把变化的快照交给 flush_callback
+
+    传输线程每个数据块只更新计数器，不直接触达 UI；flush_callback(key, done, total)
+    只在刷新线程中调用，且仅针对自上次刷新以来有变化的传输。
+    """
+
+    def __init__(self, flush_callback: Callable[[str, int, int], None], interval: float = 0.1):
+        self.flush_callback = flush_callback
+        self.interval = interval
+        self._counters: Dict[str, _TransferCounter] = {}
+        self._counters_lock = threading.Lock()
+        # 防止刷新线程与 flush() 的调用方同时回调
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _counter(self, key: str) -> _TransferCounter:
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._counters_lock:
+                counter = self._counters.setdefault(key, _TransferCounter())
+        return counter
+
+    def add(self, key: str, nbytes: int):
+        counter = self._counter(key)
+        with counter.lock:
+            counter.done += nbytes
+
+    def update(self, key: str, done: int, total: int):
+        counter = self._counter(key)
+        with counter.lock:
+            counter.done = done
+            counter.total = total
+
+    def set_total(self, key: str, total: int):
+        counter = self._counter(key)
+        with counter.lock:
+            counter.total = total
+
+    def flush(self):
+        with self._flush_lock:
+            with self._counters_lock:
+                items = list(self._counters.items())
+            for key, counter in items:
+                with counter.lock:
+                    snapshot = (counter.done, counter.total)
+                if snapshot == counter.reported:
+                    continue
+                counter.reported = snapshot
+                try:
+                    self.flush_callback(key, *snapshot)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed for {key}: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def start(self) -> "ProgressAggregator":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """停止刷新线程，并把最后的进度补发一次"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
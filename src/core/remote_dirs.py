@@ -0,0 +1,96 @@
+import ftplib
+import posixpath
+from typing import Dict, Iterable, List, Optional, Set
+from src.core.listing import TYPE_FILE, DirectoryLister
+from src.core.listing_cache import normalize_remote_path
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def resolve_remote_dir(ftp: ftplib.FTP, remote_dir: str) -> str:
+    """把配置中的远端目录转为绝对路径；空或 "/" 表示登录后的初始目录 (会话须在初始目录)"""
+    remote_dir = (remote_dir or "").strip().replace('\\', '/')
+    home = ftp.pwd()
+    if not remote_dir or remote_dir == "/":
+        return normalize_remote_path(home)
+    if not remote_dir.startswith("/"):
+        remote_dir = f"{home.rstrip('/')}/{remote_dir}"
+    return normalize_remote_path(remote_dir)
+
+
+class RemoteDirPlanner:
+    """规划上传所需的远端目录：一次列举得知哪些已存在，只按父目录在前的顺序创建缺失的目录
+
+    登录后的初始目录及其各级父目录必然存在，不再列举 (chroot / 用户隔离的服务器上列举 "/" 往往被拒绝)；
+    只列举确实存在、且有待确认子目录的目录；某个目录缺失时其下所有目录必然缺失，无需再查询。
+    列举被拒绝 (error_perm) 的目录，其子目录视为未知，由 ensure() 以 MKD/CWD 逐个确认。
+    全程使用绝对路径，不需要逐级 cwd。
+    """
+
+    def __init__(self, base_dir: str, rel_dirs: Iterable[str] = ()):
+        self.base_dir = normalize_remote_path(base_dir)
+        needed: List[str] = []
+        # 上传根目录本身及其各级父目录也可能不存在
+        parts = [p for p in self.base_dir.split('/') if p]
+        for i in range(1, len(parts) + 1):
+            needed.append("/" + "/".join(parts[:i]))
+        prefix = self.base_dir.rstrip('/')
+        needed.extend(f"{prefix}/{rel}" for rel in rel_dirs)
+        self.needed = needed
+        self._lister = DirectoryLister()
+
+    def _child_dirs(self, ftp: ftplib.FTP, path: str) -> Optional[Set[str]]:
+        """path 下的子目录名 (符号链接也可能指向目录，一并计入)；列举被拒绝时返回 None"""
+        try:
+            return {entry.name for entry in self._lister.iter(ftp, path) if entry.type != TYPE_FILE}
+        except ftplib.error_perm as e:
+            logger.debug(f"Cannot list {path} while planning remote dirs, probing instead: {e}")
+            return None
+
+    def plan(self, ftp: ftplib.FTP) -> List[str]:
+        """返回缺失或无法确认的目录 (父目录在前)；会话须在登录后的初始目录"""
+        home = normalize_remote_path(ftp.pwd())
+        known = {home}
+        while home != "/":
+            home = posixpath.dirname(home)
+            known.add(home)
+        missing: List[str] = []
+        # 确定不存在的目录，其下的目录无需列举
+        missing_set: Set[str] = set()
+        listings: Dict[str, Optional[Set[str]]] = {}
+        for path in self.needed:
+            if path in known:
+                continue
+            parent, name = posixpath.split(path)
+            if parent in missing_set:
+                exists = False
+            else:
+                if parent not in listings:
+                    listings[parent] = self._child_dirs(ftp, parent)
+                children = listings[parent]
+                if children is None:
+                    missing.append(path)
+                    continue
+                exists = name in children
+            if not exists:
+                missing.append(path)
+                missing_set.add(path)
+        logger.debug(f"Remote dir plan for {self.base_dir}: {len(missing)} of {len(self.needed)} to create or probe, "
+                     f"{len(listings)} listings")
+        return missing
+
+    def ensure(self, ftp: ftplib.FTP) -> int:
+        """创建缺失的目录，返回实际新建的数量"""
+        created = 0
+        for path in self.plan(ftp):
+            try:
+                ftp.mkd(path)
+                created += 1
+            except ftplib.error_perm as e:
+                # 已存在 (未能列举其父目录，或已被共用该主机的其它任务抢先创建)；确实不存在时抛出 MKD 的错误
+                try:
+                    ftp.cwd(path)
+                except ftplib.error_perm:
+                    raise e
+        return created
@@ -0,0 +1,427 @@
+import ftplib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from src.core.listing import TYPE_DIR, DirectoryLister, ListEntry, mlst
+from src.core.listing_cache import normalize_remote_path
+from src.utils.config import get_data_dir
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 失败明细最多保留的条数
+_MAX_REPORTED_FAILURES = 20
+# 写入线程每处理这么多个目录提交一次事务
+_COMMIT_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server TEXT NOT NULL,
+    root TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    server TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime REAL,
+    crawl INTEGER NOT NULL,
+    PRIMARY KEY (server, path)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    server TEXT NOT NULL,
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL,
+    added INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    PRIMARY KEY (server, path)
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (server, parent);
+CREATE INDEX IF NOT EXISTS entries_changed ON entries (server, changed);
+CREATE TABLE IF NOT EXISTS removed (
+    server TEXT NOT NULL,
+    path TEXT NOT NULL,
+    type TEXT NOT NULL,
+    crawl INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS removed_crawl ON removed (server, crawl);
+"""
+
+
+def server_key(config) -> str:
+    """索引中区分服务器的键：同一登录看到的是同一棵目录树"""
+    return f"{config.host}:{config.port}:{config.username}"
+
+
+def _subtree_range(dir_path: str) -> Tuple[str, str]:
+    """dir_path 之下所有路径所在的区间 [lo, hi)：'/' 的下一个字符是 '0'，区间查询可走主键索引"""
+    prefix = dir_path.rstrip('/')
+    return prefix + '/', prefix + '0'
+
+
+def _like_pattern(text: str) -> str:
+    """把 * / ? 通配符转为 LIKE 模式；不含通配符时按子串匹配"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    if '*' in text or '?' in text:
+        return escaped.replace('*', '%').replace('?', '_')
+    return f"%{escaped}%"
+
+
+class IndexChanges:
+    """两次爬取之间的变化：added/modified 为 ListEntry (name 为绝对路径)，removed 为 (路径, 类型)"""
+    __slots__ = ("since", "since_time", "added", "modified", "removed")
+
+    def __init__(self, since: int, since_time: Optional[float]):
+        self.since = since
+        # since 那次爬取的完成时间；为 None 表示与空索引比较
+        self.since_time = since_time
+        self.added: List[ListEntry] = []
+        self.modified: List[ListEntry] = []
+        self.removed: List[Tuple[str, str]] = []
+
+    def describe(self) -> str:
+        return f"{len(self.added)} added, {len(self.modified)} modified, {len(self.removed)} removed"
+
+
+class RemoteIndex:
+    """本地 SQLite 中保存的各服务器目录树索引 (按服务器与绝对路径索引)
+
+    每次爬取分配递增的 crawl id，条目记录首次出现 (added) 与最近变化 (changed) 的爬取，
+    消失的条目记入 removed 表，据此回答 "上次爬取以来有什么变化"。
+    连接可被多个线程共用，所有操作在锁内串行执行。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def open_default(cls) -> "RemoteIndex":
+        return cls(os.path.join(get_data_dir("index"), "remote_index.db"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---- 爬取过程中的写入 (只由 RemoteIndexer 的写入线程调用) ----
+
+    def begin_crawl(self, server: str, root: str) -> int:
+        with self._lock:
+            cur = self._conn.execute("INSERT INTO crawls (server, root, started) VALUES (?, ?, ?)",
+                                     (server, root, time.time()))
+            self._conn.commit()
+            return cur.lastrowid
+
+    def finish_crawl(self, crawl_id: int):
+        with self._lock:
+            self._conn.execute("UPDATE crawls SET finished = ? WHERE id = ?", (time.time(), crawl_id))
+            self._conn.commit()
+
+    def load_dirs(self, server: str, root: str) -> Tuple[Dict[str, Optional[float]], Dict[str, List[str]]]:
+        """返回 root 下已索引的目录 {路径: 列举时的 mtime} 以及 {目录: [子目录路径]}"""
+        lo, hi = _subtree_range(root)
+        with self._lock:
+            listed = {path: mtime for path, mtime in self._conn.execute(
+                "SELECT path, mtime FROM dirs WHERE server = ? AND (path = ? OR (path >= ? AND path < ?))",
+                (server, root, lo, hi))}
+            children: Dict[str, List[str]] = {}
+            for parent, path in self._conn.execute(
+                    "SELECT parent, path FROM entries WHERE server = ? AND path >= ? AND path < ? AND type = ?",
+                    (server, lo, hi, TYPE_DIR)):
+                children.setdefault(parent, []).append(path)
+        return listed, children
+
+    def apply_listing(self, server: str, crawl_id: int, dir_path: str, dir_mtime: Optional[float],
+                      entries: List[ListEntry]) -> Tuple[int, int, int]:
+        """用目录的最新列表更新索引，返回 (新增, 变化, 删除) 条目数；调用方负责 commit"""
+        conn = self._conn
+        prefix = dir_path.rstrip('/') + '/'
+        added = modified = removed = 0
+        with self._lock:
+            stored = {name: (entry_type, size, mtime) for name, entry_type, size, mtime in conn.execute(
+                "SELECT name, type, size, mtime FROM entries WHERE server = ? AND parent = ?", (server, dir_path))}
+            inserts = []
+            updates = []
+            for entry in entries:
+                old = stored.pop(entry.name, None)
+                facts = (entry.type, entry.size, entry.mtime)
+                if old is None:
+                    inserts.append((server, prefix + entry.name, dir_path, entry.name, entry.type, entry.size,
+                                    entry.mtime, crawl_id, crawl_id))
+                elif old != facts:
+                    updates.append((entry.type, entry.size, entry.mtime, crawl_id, server, prefix + entry.name))
+                    if old[0] == TYPE_DIR and entry.type != TYPE_DIR:
+                        self._drop_subtree(server, prefix + entry.name)
+            if inserts:
+                conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts)
+            if updates:
+                conn.executemany("UPDATE entries SET type = ?, size = ?, mtime = ?, changed = ? "
+                                 "WHERE server = ? AND path = ?", updates)
+            # 剩下的是已从服务器消失的条目；目录连同其下的内容一并移除，只记录目录本身
+            for name, (entry_type, _, _) in stored.items():
+                path = prefix + name
+                conn.execute("DELETE FROM entries WHERE server = ? AND path = ?", (server, path))
+                conn.execute("INSERT INTO removed VALUES (?, ?, ?, ?)", (server, path, entry_type, crawl_id))
+                if entry_type == TYPE_DIR:
+                    self._drop_subtree(server, path)
+            conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)", (server, dir_path, dir_mtime, crawl_id))
+            if dir_mtime is not None:
+                # 父目录未必重新列举，目录自身条目的 mtime 在这里同步
+                conn.execute("UPDATE entries SET mtime = ?, changed = ? WHERE server = ? AND path = ? AND mtime IS NOT ?",
+                             (dir_mtime, crawl_id, server, dir_path, dir_mtime))
+            added, modified, removed = len(inserts), len(updates), len(stored)
+        return added, modified, removed
+
+    def _drop_subtree(self, server: str, dir_path: str):
+        lo, hi = _subtree_range(dir_path)
+        self._conn.execute("DELETE FROM entries WHERE server = ? AND path >= ? AND path < ?", (server, lo, hi))
+        self._conn.execute("DELETE FROM dirs WHERE server = ? AND (path = ? OR (path >= ? AND path < ?))",
+                           (server, dir_path, lo, hi))
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    # ---- 查询 (不访问网络) ----
+
+    def last_crawl(self, server: str) -> Optional[Tuple[int, float]]:
+        """最近一次完成的爬取 (id, 完成时间)"""
+        with self._lock:
+            return self._conn.execute("SELECT id, finished FROM crawls WHERE server = ? AND finished IS NOT NULL "
+                                      "ORDER BY id DESC LIMIT 1", (server,)).fetchone()
+
+    def search(self, server: str, text: str, limit: int = 1000) -> List[ListEntry]:
+        """按文件名搜索 (不区分大小写，支持 * ? 通配符)；返回 name 为绝对路径的 ListEntry"""
+        text = text.strip()
+        if not text:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, type, size, mtime FROM entries WHERE server = ? AND name LIKE ? ESCAPE '\\' "
+                "ORDER BY path LIMIT ?", (server, _like_pattern(text), limit)).fetchall()
+        return [ListEntry(path, entry_type, size, mtime) for path, entry_type, size, mtime in rows]
+
+    def changes(self, server: str, since: Optional[int] = None) -> IndexChanges:
+        """since 那次爬取之后的变化；默认与上一次完成的爬取比较，即最近一次爬取带来的变化"""
+        with self._lock:
+            conn = self._conn
+            if since is None:
+                rows = conn.execute("SELECT id, finished FROM crawls WHERE server = ? AND finished IS NOT NULL "
+                                    "ORDER BY id DESC LIMIT 2", (server,)).fetchall()
+                since, since_time = rows[1] if len(rows) > 1 else (0, None)
+            else:
+                row = conn.execute("SELECT finished FROM crawls WHERE id = ?", (since,)).fetchone()
+                since_time = row[0] if row else None
+            result = IndexChanges(since, since_time)
+            for path, entry_type, size, mtime, added in conn.execute(
+                    "SELECT path, type, size, mtime, added FROM entries WHERE server = ? AND changed > ? "
+                    "ORDER BY path", (server, since)):
+                (result.added if added > since else result.modified).append(ListEntry(path, entry_type, size, mtime))
+            # 同一路径可能先删后建，只保留当前已不存在的
+            result.removed = [(path, entry_type) for path, entry_type in conn.execute(
+                "SELECT DISTINCT r.path, r.type FROM removed r WHERE r.server = ? AND r.crawl > ? AND NOT EXISTS "
+                "(SELECT 1 FROM entries e WHERE e.server = r.server AND e.path = r.path) ORDER BY r.path",
+                (server, since))]
+        return result
+
+
+class CrawlSummary:
+    """一次爬取的统计"""
+    __slots__ = ("root", "crawl_id", "dirs_listed", "dirs_skipped", "added", "modified", "removed",
+                 "failures", "failure_count", "seconds")
+
+    def __init__(self, root: str, crawl_id: int):
+        self.root = root
+        self.crawl_id = crawl_id
+        self.dirs_listed = 0
+        # mtime 未变、沿用索引内容而未重新列举的目录数
+        self.dirs_skipped = 0
+        self.added = 0
+        self.modified = 0
+        self.removed = 0
+        self.failures: List[Tuple[str, str]] = []
+        self.failure_count = 0
+        self.seconds = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.failure_count == 0
+
+    def describe(self) -> str:
+        text = (f"Indexed {self.root}: listed {self.dirs_listed} directories, {self.dirs_skipped} unchanged; "
+                f"{self.added} added, {self.modified} modified, {self.removed} removed in {self.seconds:.1f}s")
+        if self.ok:
+            return text
+        lines = [f"{text}; {self.failure_count} directories failed:"]
+        lines.extend(f"  {path}: {msg}" for path, msg in self.failures)
+        if self.failure_count > len(self.failures):
+            lines.append(f"  ... and {self.failure_count - len(self.failures)} more")
+        return "\n".join(lines)
+
+
+class RemoteIndexer:
+    """多条会话并行爬取服务器目录树并写入 RemoteIndex
+
+    增量爬取：目录的 mtime (来自父目录的 MLSD 列表，或对未重新列举的父目录下的子目录发 MLST)
+    与上次列举时相同，则沿用索引中的内容，只继续检查其子目录。目录 mtime 只在其直接子项
+    增删改名时变化，仅覆盖已有文件的修改可能察觉不到，此时可用 full=True 全量重新列举。
+    """
+
+    def __init__(self, pool, config, index: RemoteIndex, workers: int = 4,
+                 progress_callback: Optional[Callable] = None):
+        self.pool = pool
+        self.config = config
+        self.index = index
+        self.server = server_key(config)
+        self.workers = max(1, min(workers, getattr(config, 'max_connections', workers)))
+        # progress_callback(host, 已处理目录数, 已知目录数)
+        self.progress_callback = progress_callback
+        self._lister = DirectoryLister(config.host)
+        self._mlst_supported = True
+        self._listed: Dict[str, Optional[float]] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._full = False
+        self._lock = threading.Lock()
+        self._done = 0
+        self._known = 0
+
+    def _dir_mtime(self, ftp: ftplib.FTP, path: str) -> Optional[float]:
+        if not self._mlst_supported:
+            return None
+        try:
+            entry = mlst(ftp, path)
+        except ftplib.error_perm as e:
+            if str(e).startswith('50'):
+                logger.info(f"MLST unavailable on {self.config.host}, re-listing every directory: {e}")
+                self._mlst_supported = False
+                return None
+            raise
+        return entry.mtime if entry is not None else None
+
+    def _visit(self, ftp: ftplib.FTP, jobs: "queue.Queue", results: "queue.Queue", item: Tuple[str, Optional[float]]):
+        path, mtime = item
+        if not self._full and path in self._listed:
+            if mtime is None:
+                mtime = self._dir_mtime(ftp, path)
+            if mtime is not None and mtime == self._listed[path]:
+                subdirs = [(child, None) for child in self._children.get(path, ())]
+                self._enqueue(jobs, subdirs)
+                results.put((path, mtime, None))
+                return
+        if mtime is None and path not in self._listed:
+            # 首次列举：目录自身的 mtime 下次爬取时用于比较
+            mtime = self._dir_mtime(ftp, path)
+        entries = self._lister.list(ftp, path)
+        prefix = path.rstrip('/') + '/'
+        self._enqueue(jobs, [(prefix + e.name, e.mtime) for e in entries if e.is_dir])
+        results.put((path, mtime, entries))
+
+    def _enqueue(self, jobs: "queue.Queue", items: List[Tuple[str, Optional[float]]]):
+        with self._lock:
+            self._known += len(items)
+        for item in items:
+            jobs.put(item)
+
+    def _report(self):
+        with self._lock:
+            self._done += 1
+            done, known = self._done, self._known
+        if self.progress_callback:
+            self.progress_callback(self.config.host, done, known)
+
+    def crawl(self, root: Optional[str] = None, full: bool = False) -> CrawlSummary:
+        """爬取 root (默认登录后的初始目录) 下的整棵目录树"""
+        started = time.monotonic()
+        if root is None:
+            with self.pool.session(self.config, timeout=30) as ftp:
+                root = ftp.pwd()
+        root = normalize_remote_path(root)
+        self._full = full
+        self._listed, self._children = self.index.load_dirs(self.server, root)
+        crawl_id = self.index.begin_crawl(self.server, root)
+        summary = CrawlSummary(root, crawl_id)
+
+        jobs: "queue.Queue" = queue.Queue()
+        results: "queue.Queue" = queue.Queue()
+        self._enqueue(jobs, [(root, None)])
+
+        def worker():
+            ftp = None
+            try:
+                while True:
+                    item = jobs.get()
+                    try:
+                        if item is None:
+                            return
+                        if ftp is None:
+                            ftp = self.pool.checkout(self.config, timeout=30)
+                        self._visit(ftp, jobs, results, item)
+                    except BaseException as e:
+                        logger.warning(f"Indexing {item[0]} on {self.config.host} failed: {e}")
+                        results.put((item[0], e, None))
+                        if ftp is not None and not isinstance(e, ftplib.error_perm):
+                            self.pool.checkin(self.config, ftp, discard=True)
+                            ftp = None
+                    finally:
+                        jobs.task_done()
+            finally:
+                if ftp is not None:
+                    self.pool.checkin(self.config, ftp)
+
+        threads = [threading.Thread(target=worker, name=f"index-{self.config.host}-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        def _wait():
+            jobs.join()
+            for _ in threads:
+                jobs.put(None)
+            results.put(None)
+
+        threading.Thread(target=_wait, name=f"index-wait-{self.config.host}", daemon=True).start()
+
+        # 写入集中在当前线程，SQLite 只有一个写入者
+        pending = 0
+        while True:
+            result = results.get()
+            if result is None:
+                break
+            path, mtime, entries = result
+            if isinstance(mtime, BaseException):
+                summary.failure_count += 1
+                if len(summary.failures) < _MAX_REPORTED_FAILURES:
+                    summary.failures.append((path, str(mtime)))
+            elif entries is None:
+                summary.dirs_skipped += 1
+            else:
+                added, modified, removed = self.index.apply_listing(self.server, crawl_id, path, mtime, entries)
+                summary.dirs_listed += 1
+                summary.added += added
+                summary.modified += modified
+                summary.removed += removed
+                pending += 1
+                if pending >= _COMMIT_EVERY:
+                    self.index.commit()
+                    pending = 0
+            self._report()
+        for t in threads:
+            t.join()
+        self.index.commit()
+        self.index.finish_crawl(crawl_id)
+        summary.seconds = time.monotonic() - started
+        logger.info(f"{self.config.host}: {summary.describe()}")
+        return summary
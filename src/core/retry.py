@@ -0,0 +1,191 @@
+import errno
+import ftplib
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# 失败类别
+FAILURE_CONNECT = "connect"
+FAILURE_LOGIN = "login"
+FAILURE_TRANSFER = "transfer"
+FAILURE_4XX = "4xx"
+FAILURE_5XX = "5xx"
+
+# 默认策略：retries 为失败后的重试次数，delay 为首次重试前的等待秒数 (之后指数增长)
+DEFAULT_RETRY_POLICIES: Dict[str, dict] = {
+    FAILURE_CONNECT: {"retries": 2, "delay": 2.0},
+    FAILURE_LOGIN: {"retries": 1, "delay": 5.0},
+    FAILURE_TRANSFER: {"retries": 3, "delay": 1.0},
+    FAILURE_4XX: {"retries": 3, "delay": 2.0},
+    # 5xx 是永久性错误 (权限不足、文件名非法等)，默认不重试
+    FAILURE_5XX: {"retries": 0, "delay": 0.0},
+}
+
+# 本地文件系统错误，重试也不会成功
+_LOCAL_ERRNOS = {errno.ENOENT, errno.EACCES, errno.EISDIR, errno.ENOTDIR, errno.ENOSPC, errno.EROFS}
+
+
+class ConnectError(ConnectionError):
+    """无法建立到服务器的控制连接"""
+
+
+class LoginError(ConnectionError):
+    """连接已建立但登录失败"""
+
+
+class CircuitOpenError(ConnectionError):
+    """该主机近期连续连接失败，熔断期间直接跳过"""
+
+
+class RetryPolicy:
+    """指数退避：第 n 次重试前等待 delay * multiplier^(n-1)，不超过 max_delay，并加入少量随机抖动"""
+    __slots__ = ("retries", "delay", "multiplier", "max_delay")
+
+    def __init__(self, retries: int = 0, delay: float = 1.0, multiplier: float = 2.0, max_delay: float = 60.0):
+        self.retries = max(0, int(retries))
+        self.delay = max(0.0, float(delay))
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RetryPolicy":
+        return cls(data.get("retries", 0), data.get("delay", 1.0),
+                   data.get("multiplier", 2.0), data.get("max_delay", 60.0))
+
+    def backoff(self, retry: int) -> float:
+        base = min(self.max_delay, self.delay * self.multiplier ** (retry - 1))
+        # 抖动避免大量服务器在同一时刻一起重连
+        return base * random.uniform(0.8, 1.2)
+
+
+def build_policies(overrides: Optional[dict] = None) -> Dict[str, RetryPolicy]:
+    """合并默认策略与服务器配置中的 retry_policies"""
+    policies = {}
+    for failure, defaults in DEFAULT_RETRY_POLICIES.items():
+        data = dict(defaults)
+        data.update((overrides or {}).get(failure, {}))
+        policies[failure] = RetryPolicy.from_dict(data)
+    return policies
+
+
+def classify_failure(exc: BaseException) -> Optional[str]:
+    """把异常归入失败类别；返回 None 表示不应重试"""
+    if isinstance(exc, CircuitOpenError):
+        return None
+    if isinstance(exc, ConnectError):
+        return FAILURE_CONNECT
+    if isinstance(exc, LoginError):
+        return FAILURE_LOGIN
+    if isinstance(exc, ftplib.error_temp):
+        return FAILURE_4XX
+    if isinstance(exc, ftplib.error_perm):
+        return FAILURE_5XX
+    if isinstance(exc, (ftplib.error_reply, ftplib.error_proto, EOFError)):
+        return FAILURE_TRANSFER
+    if isinstance(exc, OSError):
+        if exc.errno in _LOCAL_ERRNOS and not isinstance(exc, ConnectionError):
+            return None
+        # 连接被重置、超时、数据流提前结束等
+        return FAILURE_TRANSFER
+    return None
+
+
+def call_with_retry(fn: Callable[[int], T], policies: Dict[str, RetryPolicy],
+                    on_retry: Optional[Callable[[BaseException, str, int, float], None]] = None,
+                    cancel_event: Optional[threading.Event] = None,
+                    retryable: Optional[Callable[[BaseException], bool]] = None) -> T:
+    """调用 fn(attempt)，按失败类别的策略重试；attempt 从 0 开始，调用方据此从失败处继续
+
+    on_retry(exc, failure, retry, delay) 在每次等待重试前调用。重试次数按类别分别计数；
+    retryable(exc) 返回 False 时不论类别都直接抛出。cancel_event 被置位时停止等待并抛出原异常。
+    """
+    used: Dict[str, int] = {}
+    attempt = 0
+    while True:
+        try:
+            return fn(attempt)
+        except Exception as e:
+            failure = classify_failure(e)
+            if retryable is not None and not retryable(e):
+                failure = None
+            policy = policies.get(failure) if failure else None
+            retry = used.get(failure, 0) + 1
+            if policy is None or retry > policy.retries:
+                raise
+            used[failure] = retry
+            delay = policy.backoff(retry)
+            logger.warning(f"{failure} failure ({e}), retry {retry}/{policy.retries} in {delay:.1f}s")
+            if on_retry:
+                on_retry(e, failure, retry, delay)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise
+            elif delay:
+                time.sleep(delay)
+            attempt += 1
+
+
+class CircuitBreaker:
+    """单个主机的熔断器：连续 threshold 次连接失败后打开，cooldown 秒后放行一次试探连接"""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_connect(self, name: str):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(f"{name} is unreachable (circuit open, retry in {max(0, int(remaining))}s)")
+            # 冷却结束：只放行一个试探连接，其余请求继续快速失败
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+
+class CircuitBreakerRegistry:
+    """按 (host, port) 管理熔断器，多个配置指向同一主机时共享状态"""
+
+    def __init__(self, threshold: int = 3, cooldown: float = 60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[Tuple[str, int], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, config) -> CircuitBreaker:
+        key = (config.host, config.port)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(self.threshold, self.cooldown)
+            return breaker
+
+    def reset(self, config):
+        self.get(config).record_success()
@@ -0,0 +1,234 @@
+import bisect
+import itertools
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+
+class ScheduledTask:
+    """调度器中的一个任务 (通常对应一台服务器的整次分发)"""
+    __slots__ = ("key", "host", "priority", "weight", "fn", "pool_key", "pool_limit", "state", "result", "error",
+                 "_seq")
+
+    def __init__(self, key: str, host: str, priority: int, weight: int, fn: Callable[[], Any], seq: int,
+                 pool_key: Optional[Hashable] = None, pool_limit: int = 0):
+        self.key = key
+        self.host = host
+        self.priority = priority
+        self.weight = weight
+        self.fn = fn
+        # 任务使用的连接池及其会话上限：共用同一连接池 (相同登录参数) 的任务合计不超过 pool_limit
+        self.pool_key = pool_key
+        self.pool_limit = pool_limit
+        self.state = PENDING
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self._seq = seq
+
+    def __lt__(self, other: "ScheduledTask") -> bool:
+        # 优先级高的先执行；同优先级按提交顺序
+        return (-self.priority, self._seq) < (-other.priority, other._seq)
+
+
+class JobHandle:
+    """一批调度任务的句柄：查询进度、等待完成、取消尚未开始的任务，以及注册完成回调
+
+    on_task_done(task) 在每个任务结束 (含取消) 时调用，on_all_done(handle) 在全部结束时调用一次；
+    二者都在执行任务的工作线程中触发，UI 需自行转发到 GUI 线程。
+    """
+
+    def __init__(self, scheduler: "TransferScheduler"):
+        self._scheduler = scheduler
+        self.tasks: Dict[str, ScheduledTask] = {}
+        self._remaining = 0
+        self._sealed = False
+        self._finished = False
+        self._lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._task_callbacks: List[Callable[[ScheduledTask], None]] = []
+        self._done_callbacks: List[Callable[["JobHandle"], None]] = []
+
+    def on_task_done(self, callback: Callable[[ScheduledTask], None]):
+        self._task_callbacks.append(callback)
+
+    def on_all_done(self, callback: Callable[["JobHandle"], None]):
+        with self._lock:
+            already_done = self._finished
+            if not already_done:
+                self._done_callbacks.append(callback)
+        if already_done:
+            callback(self)
+
+    def _add(self, task: ScheduledTask):
+        with self._lock:
+            self.tasks[task.key] = task
+            self._remaining += 1
+
+    def seal(self):
+        """所有任务已提交完毕；在此之前即使任务都已结束也不会触发 on_all_done"""
+        with self._lock:
+            self._sealed = True
+            empty = self._remaining == 0
+        if empty:
+            self._finish()
+
+    def _task_finished(self, task: ScheduledTask):
+        for callback in self._task_callbacks:
+            try:
+                callback(task)
+            except Exception as e:
+                logger.warning(f"Task callback failed for {task.key}: {e}")
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0 and self._sealed
+        if last:
+            self._finish()
+
+    def _finish(self):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            callbacks = list(self._done_callbacks)
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.warning(f"Job completion callback failed: {e}")
+        # 回调执行完后再唤醒 wait()，等待方看到的是完整的收尾状态
+        self._done_event.set()
+
+    def done(self) -> bool:
+        return self._done_event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done_event.wait(timeout)
+
+    def cancel(self):
+        """取消尚未开始的任务；已在运行的任务继续执行到结束"""
+        self._scheduler._cancel(self)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, CANCELLED: 0}
+        for task in list(self.tasks.values()):
+            counts[task.state] += 1
+        return counts
+
+
+class TransferScheduler:
+    """有界、带优先级的传输调度器
+
+    - 全局最多同时运行 max_concurrent 个任务 (工作线程按需创建，数量不随服务器数量增长)；
+    - 同一主机上正在使用的连接数 (各任务的 weight 之和) 不超过 per_host_limit，
+      多个配置共用一台主机时不会一起打满它的单 IP 连接上限；
+    - 提交时给出 pool_key/pool_limit 的任务，同一连接池上的 weight 之和不超过 pool_limit
+      (即该池的 max_connections)，避免后开始的任务在借会话时超时；
+    - priority 越大越先执行，例如金丝雀节点先分发。
+    """
+
+    def __init__(self, max_concurrent: int = 8, per_host_limit: int = 8):
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_host_limit = max(1, per_host_limit)
+        # 等待中的任务，按 (优先级, 提交顺序) 保持有序
+        self._pending: List[ScheduledTask] = []
+        self._handles: Dict[ScheduledTask, JobHandle] = {}
+        self._host_load: Dict[str, int] = {}
+        self._pool_load: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = 0
+        self._closed = False
+
+    def new_job(self) -> JobHandle:
+        return JobHandle(self)
+
+    def submit(self, handle: JobHandle, key: str, host: str, fn: Callable[[], Any],
+               priority: int = 0, weight: int = 1, pool_key: Optional[Hashable] = None,
+               pool_limit: int = 0) -> ScheduledTask:
+        task = ScheduledTask(key, host, priority, max(1, weight), fn, next(self._seq), pool_key, pool_limit)
+        handle._add(task)
+        with self._cond:
+            bisect.insort(self._pending, task)
+            self._handles[task] = handle
+            # 工作线程按需创建，空闲时退出，总数不超过 max_concurrent
+            if self._workers < self.max_concurrent:
+                self._workers += 1
+                threading.Thread(target=self._worker, name=f"transfer-{task.key}", daemon=True).start()
+            self._cond.notify_all()
+        return task
+
+    def _host_has_room(self, task: ScheduledTask) -> bool:
+        load = self._host_load.get(task.host, 0)
+        # 单个任务本身就超过上限时，只要该主机 (连接池) 空闲也允许运行，避免永远无法调度
+        if load and load + task.weight > self.per_host_limit:
+            return False
+        if task.pool_key is None or task.pool_limit <= 0:
+            return True
+        pool_load = self._pool_load.get(task.pool_key, 0)
+        return pool_load == 0 or pool_load + task.weight <= task.pool_limit
+
+    def _next_runnable(self) -> Optional[ScheduledTask]:
+        """按优先级找出第一个所在主机仍有余量的任务"""
+        for i, task in enumerate(self._pending):
+            if self._host_has_room(task):
+                del self._pending[i]
+                return task
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                task = None
+                while task is None:
+                    if self._closed or not self._pending:
+                        self._workers -= 1
+                        return
+                    task = self._next_runnable()
+                    if task is None:
+                        # 剩余任务所在的主机都已满载，等待有任务结束
+                        self._cond.wait()
+                task.state = RUNNING
+                self._host_load[task.host] = self._host_load.get(task.host, 0) + task.weight
+                if task.pool_key is not None:
+                    self._pool_load[task.pool_key] = self._pool_load.get(task.pool_key, 0) + task.weight
+                handle = self._handles[task]
+            try:
+                task.result = task.fn()
+            except BaseException as e:
+                logger.error(f"Scheduled task {task.key} failed: {e}", exc_info=True)
+                task.error = e
+            with self._cond:
+                task.state = DONE
+                self._host_load[task.host] -= task.weight
+                if task.pool_key is not None:
+                    self._pool_load[task.pool_key] -= task.weight
+                del self._handles[task]
+                self._cond.notify_all()
+            handle._task_finished(task)
+
+    def _cancel(self, handle: JobHandle):
+        cancelled = []
+        with self._cond:
+            for task in list(self._pending):
+                if self._handles.get(task) is handle:
+                    self._pending.remove(task)
+                    del self._handles[task]
+                    task.state = CANCELLED
+                    cancelled.append(task)
+            self._cond.notify_all()
+        for task in cancelled:
+            handle._task_finished(task)
+
+    def close(self):
+        """不再调度新任务；正在运行的任务不受影响"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
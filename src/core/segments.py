@@ -0,0 +1,224 @@
+import ftplib
+import json
+import os
+import threading
+from typing import Callable, List, Optional
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 小于该大小的文件不值得分段，单连接下载即可
+SEGMENTED_MIN_FILE_SIZE = 32 * 1024 * 1024
+# 每段至少这么大，避免为了分段而频繁建立数据连接
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+# 每下载这么多字节刷新一次分段记录文件
+_MAP_FLUSH_BYTES = 8 * 1024 * 1024
+
+
+class RestNotSupported(Exception):
+    """服务器拒绝 REST，无法按字节区间下载"""
+
+
+class Segment:
+    """文件中的一个字节区间 [start, end)，done 为该区间已写入的字节数"""
+    __slots__ = ("start", "end", "done")
+
+    def __init__(self, start: int, end: int, done: int = 0):
+        self.start = start
+        self.end = end
+        self.done = done
+
+    @property
+    def position(self) -> int:
+        return self.start + self.done
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= self.end
+
+
+class SegmentMap:
+    """分段下载的进度记录，保存在目标文件旁的 ``.ftpseg`` 文件中，用于失败后续传"""
+
+    SUFFIX = ".ftpseg"
+
+    def __init__(self, local_file: str, remote_file: str, size: int, segments: List[Segment]):
+        self.path = local_file + self.SUFFIX
+        self.local_file = local_file
+        self.remote_file = remote_file
+        self.size = size
+        self.segments = segments
+        self._lock = threading.Lock()
+        # 各段线程都会写记录文件，共用同一个临时文件，必须串行写入
+        self._save_lock = threading.Lock()
+
+    @classmethod
+    def plan(cls, local_file: str, remote_file: str, size: int, count: int) -> "SegmentMap":
+        step = -(-size // count)
+        segments = [Segment(start, min(start + step, size)) for start in range(0, size, step)]
+        return cls(local_file, remote_file, size, segments)
+
+    @classmethod
+    def load(cls, local_file: str, remote_file: str, size: int) -> Optional["SegmentMap"]:
+        """读取上次未完成的分段记录；远端文件或大小不一致时视为无效"""
+        path = local_file + cls.SUFFIX
+        if not os.path.exists(path) or not os.path.exists(local_file):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("remote") != remote_file or data.get("size") != size:
+                return None
+            if os.path.getsize(local_file) != size:
+                return None
+            return cls(local_file, remote_file, size, [Segment(*s) for s in data["segments"]])
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable segment map {path}: {e}")
+            return None
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                data = {
+                    "remote": self.remote_file,
+                    "size": self.size,
+                    "segments": [[s.start, s.end, s.done] for s in self.segments],
+                }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def downloaded(self) -> int:
+        return sum(s.done for s in self.segments)
+
+    @property
+    def complete(self) -> bool:
+        return all(s.finished for s in self.segments)
+
+
+def _fetch_segment(ftp: ftplib.FTP, seg_map: SegmentMap, segment: Segment, on_bytes: Callable[[int], None]) -> bool:
+    """用 REST + RETR 下载一个区间，写入预分配文件的对应位置
+
+    返回 True 表示读到区间末尾后主动断开了数据连接，该会话的应答状态不可靠，不应再复用。
+    """
+    ftp.voidcmd('TYPE I')
+    # 从文件开头下载的段不需要 REST：不支持 REST 的服务器上该段照常进行，由其它段报告 RestNotSupported
+    rest = segment.position or None
+    try:
+        conn = ftp.transfercmd(f'RETR {seg_map.remote_file}', rest=rest)
+    except ftplib.error_perm as e:
+        if rest and str(e).startswith(('500', '501', '502', '504')):
+            raise RestNotSupported(str(e))
+        raise
+
+    stopped_early = segment.end < seg_map.size
+    unflushed = 0
+    with conn, open(seg_map.local_file, 'r+b') as f:
+        f.seek(segment.position)
+        while not segment.finished:
+            data = conn.recv(min(65536, segment.end - segment.position))
+            if not data:
+                break
+            f.write(data)
+            with seg_map._lock:
+                segment.done += len(data)
+            on_bytes(len(data))
+            unflushed += len(data)
+            if unflushed >= _MAP_FLUSH_BYTES:
+                f.flush()
+                seg_map.save()
+                unflushed = 0
+        f.flush()
+
+    if not segment.finished:
+        seg_map.save()
+        raise IOError(f"Segment {segment.start}-{segment.end} of {seg_map.remote_file} ended early at {segment.position}")
+
+    if stopped_early:
+        # 提前关闭数据连接后服务器通常回复 426/451，读掉即可
+        try:
+            ftp.voidresp()
+        except (ftplib.error_temp, ftplib.error_perm, ftplib.error_reply):
+            pass
+    else:
+        ftp.voidresp()
+    seg_map.save()
+    return stopped_early
+
+
+def download_segmented(pool, config, main_ftp: ftplib.FTP, remote_file: str, local_file: str, size: int,
+                       count: int, progress_callback: Optional[Callable] = None,
+                       throttle: Optional[Callable[[int], None]] = None):
+    """用 count 条会话并行下载 remote_file 的不同区间
+
+    主会话负责最后一段 (自然读到 EOF，应答完整)，其余段从连接池借用会话。
+    throttle(nbytes) 在每块数据写入后调用，用于限速 (各段共享同一额度)。
+    存在有效的 ``.ftpseg`` 记录时从上次进度继续；完成后校验本地文件大小。
+    """
+    seg_map = SegmentMap.load(local_file, remote_file, size)
+    if seg_map is None:
+        seg_map = SegmentMap.plan(local_file, remote_file, size, count)
+        # 预分配完整大小，各段直接写入自己的位置
+        with open(local_file, 'wb') as f:
+            f.truncate(size)
+        seg_map.save()
+    else:
+        logger.info(f"Resuming segmented download of {remote_file} at {seg_map.downloaded}/{size} bytes")
+
+    lock = threading.Lock()
+    downloaded = seg_map.downloaded
+    errors: List[BaseException] = []
+
+    def on_bytes(nbytes: int):
+        nonlocal downloaded
+        if throttle:
+            throttle(nbytes)
+        with lock:
+            downloaded += nbytes
+            current = downloaded
+        if progress_callback:
+            progress_callback(config.host, current, size)
+
+    def run_pooled(segment: Segment):
+        try:
+            ftp = pool.checkout(config, timeout=30)
+        except Exception as e:
+            errors.append(e)
+            return
+        discard = True
+        try:
+            discard = _fetch_segment(ftp, seg_map, segment, on_bytes)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            pool.checkin(config, ftp, discard=discard)
+
+    pending = [s for s in seg_map.segments if not s.finished]
+    last = seg_map.segments[-1]
+    threads = [threading.Thread(target=run_pooled, args=(s,), name=f"segment-{s.start}", daemon=True)
+               for s in pending if s is not last]
+    for t in threads:
+        t.start()
+    try:
+        if not last.finished:
+            _fetch_segment(main_ftp, seg_map, last, on_bytes)
+    except BaseException as e:
+        errors.append(e)
+    for t in threads:
+        t.join()
+
+    if errors:
+        # 各段并行失败，先记录的未必是根本原因：只要有段报告服务器不支持 REST，就交给调用方改用单连接下载
+        raise next((e for e in errors if isinstance(e, RestNotSupported)), errors[0])
+    actual = os.path.getsize(local_file)
+    if not seg_map.complete or actual != size:
+        raise IOError(f"Segmented download of {remote_file} incomplete: {actual}/{size} bytes")
+    seg_map.remove()
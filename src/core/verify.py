@@ -0,0 +1,209 @@
+import ftplib
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+from src.core.checksums import DigestCache
+from src.core.modez import has_feature, server_features
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+METHOD_HASH = "HASH"
+METHOD_XSHA256 = "XSHA256"
+METHOD_XMD5 = "XMD5"
+METHOD_XCRC = "XCRC"
+METHOD_SIZE = "SIZE"
+
+# HASH 命令可选的算法 (按优先顺序) 及对应的本地算法名
+_HASH_ALGORITHMS = (("SHA-256", "sha256"), ("SHA-512", "sha512"), ("SHA-1", "sha1"),
+                    ("MD5", "md5"), ("CRC32", "crc32"))
+# 各算法十六进制摘要的长度，用于从回复中找出摘要字段
+_DIGEST_LENGTHS = {"sha256": 64, "sha512": 128, "sha1": 40, "md5": 32, "crc32": 8}
+# 失败明细最多保留的条数
+_MAX_REPORTED_ERRORS = 20
+
+
+def choose_method(ftp: ftplib.FTP) -> Tuple[str, Optional[str]]:
+    """按 FEAT 选择校验方式，返回 (命令, 本地算法名)；都不支持时为 (SIZE, None)
+
+    优先 HASH (draft-bryan-ftpext-hash)，其次 XSHA256 / XMD5 / XCRC。
+    """
+    if has_feature(ftp, "HASH"):
+        line = next(f for f in server_features(ftp) if f == "HASH" or f.startswith("HASH "))
+        offered = [name.strip() for name in line[4:].split(';') if name.strip()]
+        selected = next((name[:-1] for name in offered if name.endswith('*')), None)
+        names = {name.rstrip('*') for name in offered}
+        for name, algorithm in _HASH_ALGORITHMS:
+            if name not in names:
+                continue
+            if name != selected:
+                try:
+                    ftp.voidcmd(f'OPTS HASH {name}')
+                except (ftplib.error_perm, ftplib.error_reply):
+                    continue
+            return METHOD_HASH, algorithm
+    for method, algorithm in ((METHOD_XSHA256, "sha256"), (METHOD_XMD5, "md5"), (METHOD_XCRC, "crc32")):
+        if has_feature(ftp, method):
+            return method, algorithm
+    return METHOD_SIZE, None
+
+
+def _parse_digest(resp: str, algorithm: str) -> str:
+    """从 HASH / X* 的回复中取出摘要 (小写)；各服务器回复格式不一，按长度识别十六进制字段"""
+    expected = _DIGEST_LENGTHS[algorithm]
+    fields = resp.split()[1:]
+    for field in fields:
+        if len(field) == expected and all(c in "0123456789abcdefABCDEF" for c in field):
+            return field.lower()
+    if algorithm == "crc32":
+        # 部分服务器的 CRC 省略前导零
+        for field in fields:
+            if 0 < len(field) < expected and all(c in "0123456789abcdefABCDEF" for c in field):
+                return field.lower().rjust(expected, '0')
+    raise ftplib.error_reply(f"Unrecognised digest reply: {resp}")
+
+
+def remote_digest(ftp: ftplib.FTP, method: str, algorithm: str, remote_path: str) -> str:
+    """让服务器计算文件摘要 (HASH 使用会话当前选中的算法)"""
+    return _parse_digest(ftp.sendcmd(f'{method} {remote_path}'), algorithm)
+
+
+class VerifyReport:
+    """一台服务器的校验结果：mismatches 为 (上传任务, 原因)，可直接用于重传"""
+    __slots__ = ("server_id", "host", "method", "checked", "matched", "size_only", "mismatches",
+                 "errors", "error_count", "error")
+
+    def __init__(self, server_id: str, host: str):
+        self.server_id = server_id
+        self.host = host
+        self.method = ""
+        self.checked = 0
+        self.matched = 0
+        # 服务器拒绝对个别文件计算摘要、只比对了大小的文件数
+        self.size_only = 0
+        self.mismatches: List[Tuple[object, str]] = []
+        self.errors: List[Tuple[str, str]] = []
+        self.error_count = 0
+        # 整台服务器无法校验时的原因 (连接失败等)
+        self.error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.mismatches and self.error_count == 0
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f"Verify failed: {self.error}"
+        text = f"{self.matched}/{self.checked} files match ({self.method})"
+        if self.size_only:
+            text += f", {self.size_only} by size only"
+        if self.ok:
+            return text
+        lines = [f"{text}; {len(self.mismatches)} mismatched, {self.error_count} not checked:"]
+        lines.extend(f"  {job.remote_path}: {reason}" for job, reason in self.mismatches[:_MAX_REPORTED_ERRORS])
+        if len(self.mismatches) > _MAX_REPORTED_ERRORS:
+            lines.append(f"  ... and {len(self.mismatches) - _MAX_REPORTED_ERRORS} more mismatches")
+        lines.extend(f"  {path}: {msg}" for path, msg in self.errors)
+        if self.error_count > len(self.errors):
+            lines.append(f"  ... and {self.error_count - len(self.errors)} more errors")
+        return "\n".join(lines)
+
+
+class ServerVerifier:
+    """用多条会话并行校验一台服务器上的文件：先比对 SIZE，一致时再比对服务器端摘要"""
+
+    def __init__(self, pool, config, digests: Optional[DigestCache] = None, workers: int = 3,
+                 progress_callback: Optional[Callable] = None):
+        self.pool = pool
+        self.config = config
+        self.digests = digests or DigestCache()
+        self.workers = max(1, min(workers, getattr(config, 'max_connections', workers)))
+        # progress_callback(host, 已校验文件数, 文件总数)
+        self.progress_callback = progress_callback
+        self._lock = threading.Lock()
+
+    def _check(self, ftp: ftplib.FTP, report: VerifyReport, method: str, algorithm: Optional[str], job):
+        try:
+            remote_size = ftp.size(job.remote_path)
+        except ftplib.error_perm as e:
+            return "missing" if str(e).startswith('550') else f"SIZE failed: {e}"
+        if remote_size != job.size:
+            return f"size {remote_size} != local {job.size}"
+        if algorithm is None:
+            return None
+        try:
+            remote = remote_digest(ftp, method, algorithm, job.remote_path)
+        except (ftplib.error_perm, ftplib.error_reply) as e:
+            # 例如服务器对超大文件拒绝计算摘要：大小已一致，记为仅按大小校验
+            logger.info(f"{method} {job.remote_path} on {self.config.host} refused, size only: {e}")
+            with self._lock:
+                report.size_only += 1
+            return None
+        local = self.digests.get(job.local_path, algorithm, job.size, job.mtime)
+        if remote != local:
+            return f"{algorithm} {remote} != local {local}"
+        return None
+
+    def run(self, jobs: List) -> VerifyReport:
+        report = VerifyReport(self.config.server_id, self.config.host)
+        with self.pool.session(self.config, timeout=30) as ftp:
+            # 部分服务器在 ASCII 模式下拒绝 SIZE
+            ftp.voidcmd('TYPE I')
+            method, algorithm = choose_method(ftp)
+        report.method = method if algorithm is None or method != METHOD_HASH else f"HASH {algorithm}"
+        total = len(jobs)
+        done = 0
+        job_queue: "queue.Queue" = queue.Queue()
+        for job in jobs:
+            job_queue.put(job)
+
+        def worker():
+            nonlocal done
+            ftp = None
+            try:
+                while True:
+                    try:
+                        job = job_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        if ftp is None:
+                            ftp = self.pool.checkout(self.config, timeout=30)
+                            ftp.voidcmd('TYPE I')
+                            if method == METHOD_HASH:
+                                # HASH 算法是会话级选项，每条会话都要选择一次
+                                choose_method(ftp)
+                        reason = self._check(ftp, report, method, algorithm, job)
+                        with self._lock:
+                            report.checked += 1
+                            if reason is None:
+                                report.matched += 1
+                            else:
+                                report.mismatches.append((job, reason))
+                    except Exception as e:
+                        logger.warning(f"Verifying {job.remote_path} on {self.config.host} failed: {e}")
+                        with self._lock:
+                            report.error_count += 1
+                            if len(report.errors) < _MAX_REPORTED_ERRORS:
+                                report.errors.append((job.remote_path, str(e)))
+                        if ftp is not None and not isinstance(e, ftplib.error_perm):
+                            self.pool.checkin(self.config, ftp, discard=True)
+                            ftp = None
+                    with self._lock:
+                        done += 1
+                        current = done
+                    if self.progress_callback:
+                        self.progress_callback(self.config.host, current, total)
+            finally:
+                if ftp is not None:
+                    self.pool.checkin(self.config, ftp)
+
+        threads = [threading.Thread(target=worker, name=f"verify-{self.config.host}-{i}", daemon=True)
+                   for i in range(min(self.workers, max(1, total)))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        report.mismatches.sort(key=lambda item: item[0].remote_path)
+        logger.info(f"Verify {self.config.host}: {report.describe()}")
+        return report
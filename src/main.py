@@ -12,30 +12,46 @@ base_path = get_base_path()
 # 将项目根目录 (src 的上一级) 添加到 sys.path 中
 sys.path.append(base_path)
 
+from src.utils import startup
+
+# --profile-startup: 记录各启动阶段耗时，服务器列表构建完成后写入日志 (控制台与 logs/)
+if "--profile-startup" in sys.argv:
+    sys.argv.remove("--profile-startup")
+    startup.enable()
+
 from PyQt6.QtWidgets import QApplication
+startup.mark("import PyQt6.QtWidgets")
 from src.ui.main_window import MainWindow
+startup.mark("import main_window")
 from src.utils.logger import setup_logger
 
 def main():
     # 初始化全局日志
     setup_logger()
+    startup.mark("setup logger")
     
     app = QApplication(sys.argv)
+    startup.mark("create QApplication")
     
     # Optional: Enable high DPI scaling
     if hasattr(Qt, 'AA_EnableHighDpiScaling'):
         QApplication.setAttribute(Qt.ApplicationAttribute.AA_EnableHighDpiScaling, True)
     
     app.setStyle("Fusion")
+    startup.mark("apply Fusion style")
     
     # Load custom QSS styles
     qss_path = os.path.join(base_path, "assets", "style.qss")
     if os.path.exists(qss_path):
         with open(qss_path, "r", encoding="utf-8") as f:
             app.setStyleSheet(f.read())
+    startup.mark("load stylesheet")
     
+    # 远端浏览器在第一次打开时才构建，服务器列表在首次绘制之后分批构建
     window = MainWindow()
+    startup.mark("construct MainWindow")
     window.show()
+    startup.mark("show window")
     sys.exit(app.exec())
 
 if __name__ == '__main__':
@@ -0,0 +1,183 @@
+import time
+from array import array
+from typing import List, Optional
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
+from PyQt6.QtWidgets import QStyle, QApplication
+from src.core.listing import ListEntry
+
+_KIND_DIR = 0
+_KIND_FILE = 1
+
+
+def format_size(size_bytes: int) -> str:
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    elif size_bytes < 1024 * 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+    else:
+        return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+
+class EntryStore:
+    """按列存放的目录条目：名称列表 + 紧凑数组，避免为每行创建 dict 或 Qt 对象
+
+    修改时间以整数时间戳 (UTC) 保存，可直接排序，显示时再格式化；未知时为 -1。
+    """
+    __slots__ = ("names", "kinds", "sizes", "mtimes")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.kinds = bytearray()
+        self.sizes = array('q')
+        self.mtimes = array('q')
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, entry: ListEntry):
+        self.names.append(entry.name)
+        self.kinds.append(_KIND_DIR if entry.is_dir else _KIND_FILE)
+        self.sizes.append(entry.size)
+        self.mtimes.append(-1 if entry.mtime is None else int(entry.mtime))
+
+    def format_mtime(self, index: int) -> str:
+        value = self.mtimes[index]
+        if value < 0:
+            return ""
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(value))
+
+
+class RemoteEntryModel(QAbstractTableModel):
+    """远端目录的表格模型：只在视图请求可见行时才格式化文本"""
+
+    HEADERS = ["名称", "大小", "类型", "修改时间"]
+    # 供视图取回条目类型 ('dir' / 'file') 的角色
+    TypeRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = EntryStore()
+        # 行号 -> 存储下标的排列，排序只重排这个数组
+        self._order = array('l')
+        self._sort_column = 0
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        style = QApplication.style()
+        self._dir_icon = style.standardIcon(QStyle.StandardPixmap.SP_DirIcon)
+        self._file_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileIcon)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self._order[index.row()]
+        col = index.column()
+        store = self.store
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                return store.names[i]
+            if col == 1:
+                size = store.sizes[i]
+                return format_size(size) if size >= 0 and store.kinds[i] == _KIND_FILE else ""
+            if col == 2:
+                return "文件夹" if store.kinds[i] == _KIND_DIR else "文件"
+            return store.format_mtime(i)
+        if role == Qt.ItemDataRole.DecorationRole and col == 0:
+            return self._dir_icon if store.kinds[i] == _KIND_DIR else self._file_icon
+        if role == self.TypeRole:
+            return 'dir' if store.kinds[i] == _KIND_DIR else 'file'
+        return None
+
+    def entry_at(self, row: int) -> Optional[tuple]:
+        """返回 (名称, 是否目录)"""
+        if 0 <= row < len(self._order):
+            i = self._order[row]
+            return self.store.names[i], self.store.kinds[i] == _KIND_DIR
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self.store = EntryStore()
+        self._order = array('l')
+        self.endResetModel()
+
+    def append_entries(self, items: List[ListEntry]):
+        """流式追加一批条目 (追加在末尾，完成后再整体排序)"""
+        if not items:
+            return
+        start = len(self._order)
+        self.beginInsertRows(QModelIndex(), start, start + len(items) - 1)
+        for item in items:
+            self._order.append(len(self.store))
+            self.store.append(item)
+        self.endInsertRows()
+
+    def set_entries(self, items: List[ListEntry]):
+        self.beginResetModel()
+        self.store = EntryStore()
+        for item in items:
+            self.store.append(item)
+        self._order = array('l', range(len(self.store)))
+        self._apply_sort()
+        self.endResetModel()
+
+    def _sort_key(self, column: int):
+        store = self.store
+        if column == 1:
+            return store.sizes.__getitem__
+        if column == 3:
+            return store.mtimes.__getitem__
+        names = store.names
+        return lambda i: names[i].lower()
+
+    def _apply_sort(self):
+        store = self.store
+        descending = self._sort_order == Qt.SortOrder.DescendingOrder
+        rows = sorted(range(len(store)), key=self._sort_key(self._sort_column), reverse=descending)
+        # 无论升序降序，文件夹始终排在文件前面
+        kinds = store.kinds
+        self._order = array('l', [i for i in rows if kinds[i] == _KIND_DIR])
+        self._order.extend(i for i in rows if kinds[i] != _KIND_DIR)
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self._apply_sort()
+        self.layoutChanged.emit()
+
+
+class RemoteEntryProxyModel(QSortFilterProxyModel):
+    """按名称过滤；排序委托给源模型 (对数组排序远快于逐次调用 lessThan)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._needle = ""
+
+    def set_name_filter(self, text: str):
+        self._needle = text.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if not self._needle:
+            return True
+        entry = self.sourceModel().entry_at(source_row)
+        return entry is not None and self._needle in entry[0].lower()
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+    def entry_at(self, row: int) -> Optional[tuple]:
+        source_index = self.mapToSource(self.index(row, 0))
+        return self.sourceModel().entry_at(source_index.row())
@@ -1,13 +1,18 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QListWidget, QListWidgetItem, QLabel, 
                              QFileDialog, QProgressBar, QMessageBox, QGroupBox, QCheckBox,
-                             QSplitter, QMenu)
+                             QSplitter, QMenu, QSpinBox, QComboBox)
 from PyQt6.QtCore import Qt, QTimer
+import time
+from src.core.checksums import available_algorithms
 from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.core.metrics import format_rate, format_eta
+from src.utils import startup
 from src.utils.config import load_config, save_config
-from src.ui.server_dialog import ServerDialog
 from src.ui.signals import FtpSignals
-from src.ui.remote_browser import RemoteBrowserWidget
+
+# 分批构建服务器行时每批占用 GUI 线程的时长上限 (秒，约一帧)
+SERVER_ROW_BATCH_SECONDS = 0.016
 
 class ServerListItem(QWidget):
     def __init__(self, config: FtpServerConfig, toggle_callback=None):
@@ -31,13 +36,39 @@ class ServerListItem(QWidget):
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
         
+        # 速率 / ETA，详细的分阶段耗时放在提示中
+        self.metrics_label = QLabel("")
+        self.metrics_label.setStyleSheet("color: #6B7280;")
+        self.metrics_label.setFixedWidth(130)
+        
         layout.addWidget(self.enable_cb)
         layout.addWidget(self.name_label, stretch=3)
         layout.addWidget(self.progress_bar, stretch=2)
+        layout.addWidget(self.metrics_label)
         layout.addWidget(self.status_label, stretch=1)
         
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         
+    def show_metrics(self, snapshot: dict):
+        if snapshot["kind"] == "verify":
+            # 校验进度按文件数计，不显示字节速率
+            self.metrics_label.setText(f"{snapshot['bytes_done']}/{snapshot['bytes_total']} 文件")
+            self.metrics_label.setToolTip(f"已用时间: {format_eta(snapshot['elapsed'])}")
+            return
+        if snapshot["finished"] is None:
+            self.metrics_label.setText(f"{format_rate(snapshot['rate_ewma'])} · ETA {format_eta(snapshot['eta'])}")
+        else:
+            self.metrics_label.setText(f"平均 {format_rate(snapshot['rate_average'])}")
+        phases = snapshot["phases"]
+        self.metrics_label.setToolTip(
+            f"瞬时速率: {format_rate(snapshot['rate'])}\n"
+            f"平滑速率: {format_rate(snapshot['rate_ewma'])}\n"
+            f"已用时间: {format_eta(snapshot['elapsed'])}\n"
+            f"连接/登录: {phases.get('connect', 0):.2f}s\n"
+            f"建目录/切换目录: {phases.get('mkdir', 0):.2f}s\n"
+            f"数据传输: {phases.get('transfer', 0):.2f}s\n"
+            f"文件数: {snapshot['file_count']}")
+        
     def _on_toggle(self, state):
         is_checked = state == Qt.CheckState.Checked.value
         if self.toggle_callback:
@@ -68,18 +99,43 @@ class MainWindow(QMainWindow):
         self.resize(1000, 600)
         self.setAcceptDrops(True)
         
+        # 服务器行在窗口首次绘制之后才分批构建；远端浏览器在第一次打开时才构建
+        self.server_rows = {}
+        self._pending_servers = []
+        self._row_generation = 0
+        self._painted = False
+        self.remote_browser = None
+        
         self.ftp_manager = FtpManager()
         self.load_servers()
         
         self.signals = FtpSignals()
         self.signals.progress.connect(self.update_progress)
         self.signals.status.connect(self.update_status)
+        self.signals.finished.connect(self.on_upload_finished)
+        self.signals.verify_finished.connect(self.on_verify_finished)
         
         self.setup_ui()
         
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.check_threads)
-        self.threads = []
+        self.upload_job = None
+        self.verify_job = None
+        
+    def closeEvent(self, e):
+        # 退出时取消尚未开始的分发，并关闭连接池中保持的 FTP 会话
+        if self.upload_job:
+            self.upload_job.cancel()
+        if self.verify_job:
+            self.verify_job.cancel()
+        self.ftp_manager.close()
+        super().closeEvent(e)
+        
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if not self._painted:
+            self._painted = True
+            startup.mark("first paint")
+            generation = self._row_generation
+            QTimer.singleShot(0, lambda: self._build_server_rows(generation))
         
     def dragEnterEvent(self, e):
         if e.mimeData().hasUrls():
@@ -161,63 +217,117 @@ class MainWindow(QMainWindow):
         
         # --- Actions Area ---
         action_layout = QHBoxLayout()
+        self.broadcast_cb = QCheckBox("广播模式 (本地文件只读取一次)")
+        self.broadcast_cb.setToolTip("所有服务器共享同一个读取流，适合向大量节点分发大文件")
+        action_layout.addWidget(self.broadcast_cb)
+        self.resume_cb = QCheckBox("断点续传")
+        self.resume_cb.setToolTip("远端已存在较小的同名文件时，从其末尾继续上传 (REST/APPE)")
+        action_layout.addWidget(self.resume_cb)
+        self.delta_cb = QCheckBox("增量分发")
+        self.delta_cb.setToolTip("只传输新增或变化的文件，未变化的文件直接跳过")
+        action_layout.addWidget(self.delta_cb)
+        action_layout.addWidget(QLabel("总限速:"))
+        self.bandwidth_spin = QSpinBox()
+        self.bandwidth_spin.setRange(0, 10 * 1024 * 1024)
+        self.bandwidth_spin.setSingleStep(256)
+        self.bandwidth_spin.setSuffix(" KB/s")
+        self.bandwidth_spin.setSpecialValueText("不限速")
+        self.bandwidth_spin.setToolTip("所有传输共享的带宽上限，分发过程中修改立即生效")
+        self.bandwidth_spin.valueChanged.connect(self.on_bandwidth_changed)
+        action_layout.addWidget(self.bandwidth_spin)
+        action_layout.addWidget(QLabel("摘要:"))
+        self.checksum_combo = QComboBox()
+        for algorithm in available_algorithms():
+            self.checksum_combo.addItem(algorithm.upper(), algorithm)
+        self.checksum_combo.addItem("不计算", None)
+        self.checksum_combo.setToolTip("传输时对数据块顺带计算摘要，写入 data/checksums/ 下的清单文件，不额外读取文件")
+        self.checksum_combo.currentIndexChanged.connect(self.on_checksum_changed)
+        action_layout.addWidget(self.checksum_combo)
         self.btn_upload = QPushButton("开始上传及分发")
         self.btn_upload.setObjectName("primaryButton")
         self.btn_upload.clicked.connect(self.start_upload)
         action_layout.addWidget(self.btn_upload)
+        self.btn_verify = QPushButton("校验分发结果")
+        self.btn_verify.setToolTip("按服务器支持情况用 HASH/XSHA256/XMD5/XCRC 比对远端文件与本地文件，都不支持时比对大小")
+        self.btn_verify.clicked.connect(self.start_verify)
+        action_layout.addWidget(self.btn_verify)
+        self.btn_reupload = QPushButton("重传不一致文件")
+        self.btn_reupload.setToolTip("只重新上传最近一次校验中不一致或缺失的文件，完成后再次校验")
+        self.btn_reupload.setEnabled(False)
+        self.btn_reupload.clicked.connect(self.start_reupload)
+        action_layout.addWidget(self.btn_reupload)
+        self.btn_export_metrics = QPushButton("导出统计...")
+        self.btn_export_metrics.setToolTip("把最近一次分发的速率、耗时与逐文件记录导出为 JSON")
+        self.btn_export_metrics.setEnabled(False)
+        self.btn_export_metrics.clicked.connect(self.export_metrics)
+        action_layout.addWidget(self.btn_export_metrics)
         left_layout.addLayout(action_layout)
         
-        # --- Right Panel (Remote Browser) ---
-        self.remote_browser = RemoteBrowserWidget(self.ftp_manager)
-        self.remote_browser.hide()
-        
+        # 右侧的远端浏览器由 open_remote_browser 在第一次使用时加入
         self.splitter.addWidget(left_widget)
-        self.splitter.addWidget(self.remote_browser)
-        self.splitter.setSizes([600, 400])
         
         self.selected_paths = []
         
     def load_servers(self):
         configs = load_config()
-        self.ftp_manager.load_servers(configs)
+        if self.ftp_manager.load_servers(configs):
+            # 旧配置没有 id：把推导出的 ID 写回，之后即使改了主机或路径也保持不变
+            self.save_servers()
         
     def save_servers(self):
         save_config(self.ftp_manager.get_servers_as_dicts())
         
     def refresh_server_list(self):
+        """重建服务器列表：行控件按顺序分批创建，每批不超过 SERVER_ROW_BATCH_SECONDS，期间界面保持响应
+
+        窗口首次绘制之前只记录待建的行，由 paintEvent 开始构建；正在进行的旧构建会被放弃。
+        """
         self.server_list_widget.clear()
+        # server_id -> 行控件，进度/状态更新直接按 ID 定位，无需遍历列表
+        self.server_rows = {}
+        self._pending_servers = list(reversed(self.ftp_manager.servers))
+        self._row_generation += 1
+        if self._painted:
+            self._build_server_rows(self._row_generation)
+
+    def _build_server_rows(self, generation: int):
+        if generation != self._row_generation:
+            return
+        deadline = time.perf_counter() + SERVER_ROW_BATCH_SECONDS
+        while self._pending_servers:
+            self._add_server_row(self._pending_servers.pop())
+            if time.perf_counter() >= deadline:
+                break
+        if self._pending_servers:
+            QTimer.singleShot(0, lambda: self._build_server_rows(generation))
+            return
+        startup.mark(f"build {len(self.server_rows)} server rows")
+        startup.report()
+
+    def _add_server_row(self, config: FtpServerConfig):
+        item = QListWidgetItem(self.server_list_widget)
+        widget = ServerListItem(config, self._on_server_toggled)
         
-        def on_server_toggled(config, is_enabled):
-            config.enabled = is_enabled
-            self.save_servers()
-            
-        for i, config in enumerate(self.ftp_manager.servers):
-            item = QListWidgetItem(self.server_list_widget)
-            widget = ServerListItem(config, on_server_toggled)
-            
-            # Setup Context Menu for this row
-            widget.customContextMenuRequested.connect(
-                lambda pos, cfg=config: self.show_server_context_menu(pos, cfg)
-            )
-            
-            item.setSizeHint(widget.sizeHint())
-            
-            # Save references mapped by host to update from thread dynamically
-            item.setData(Qt.ItemDataRole.UserRole, {
-                "host": config.host,
-                "progress_bar": widget.progress_bar,
-                "status_label": widget.status_label
-            })
-            
-            self.server_list_widget.setItemWidget(item, widget)
+        # Setup Context Menu for this row
+        widget.customContextMenuRequested.connect(
+            lambda pos, cfg=config: self.show_server_context_menu(pos, cfg)
+        )
+        
+        item.setSizeHint(widget.sizeHint())
+        self.server_rows[config.server_id] = widget
+        
+        self.server_list_widget.setItemWidget(item, widget)
+
+    def _on_server_toggled(self, config: FtpServerConfig, is_enabled: bool):
+        config.enabled = is_enabled
+        self.save_servers()
 
     def _reset_progress(self):
-        for i in range(self.server_list_widget.count()):
-            item = self.server_list_widget.item(i)
-            data = item.data(Qt.ItemDataRole.UserRole)
-            data["progress_bar"].setValue(0)
-            data["status_label"].setText("等待上传")
-            data["status_label"].setStyleSheet("color: black;")
+        for row in self.server_rows.values():
+            row.progress_bar.setValue(0)
+            row.metrics_label.setText("")
+            row.status_label.setText("等待上传")
+            row.status_label.setStyleSheet("color: black;")
 
     def show_server_context_menu(self, pos, config: FtpServerConfig):
         menu = QMenu(self)
@@ -228,6 +338,12 @@ class MainWindow(QMainWindow):
             self.open_remote_browser(config)
             
     def open_remote_browser(self, config: FtpServerConfig):
+        if self.remote_browser is None:
+            # 第一次打开时才导入并构建远端浏览器 (表格模型、后台任务等)
+            from src.ui.remote_browser import RemoteBrowserWidget
+            self.remote_browser = RemoteBrowserWidget(self.ftp_manager)
+            self.splitter.addWidget(self.remote_browser)
+            self.splitter.setSizes([600, 400])
         self.remote_browser.show()
         # If the window is too small, expand it a bit
         if self.width() < 900:
@@ -279,6 +395,7 @@ class MainWindow(QMainWindow):
         self._reset_progress()
 
     def add_server(self):
+        from src.ui.server_dialog import ServerDialog
         dlg = ServerDialog(self)
         if dlg.exec():
             data = dlg.get_data()
@@ -293,11 +410,17 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "提示", "请先选择需要编辑的目标服务器。")
             return
             
+        from src.ui.server_dialog import ServerDialog
         config = self.ftp_manager.servers[row]
         dlg = ServerDialog(self, config.to_dict())
         if dlg.exec():
             data = dlg.get_data()
-            self.ftp_manager.servers[row] = FtpServerConfig.from_dict(data)
+            new_config = FtpServerConfig.from_dict(data)
+            self.ftp_manager.servers[row] = new_config
+            # 旧配置的会话 (地址/账号可能已改变) 不再复用，借出中的会话归还时关闭
+            self.ftp_manager.pool.close_server(config)
+            # 正在进行的传输也按新的单服务器限速执行
+            self.ftp_manager.bandwidth.set_server_limit(new_config, new_config.bandwidth_limit * 1024)
             self.save_servers()
             self.refresh_server_list()
             
@@ -327,59 +450,136 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "测试结果", f"❌ 无法连接到 {config.name}:\n{msg}")
 
     def start_upload(self):
-        if not self.selected_paths:
-            QMessageBox.warning(self, "提示", "请先选择至少一个待上传的文件或文件夹。")
-            return
-            
-        if not self.ftp_manager.servers:
-            QMessageBox.warning(self, "提示", "请至少配置并添加一台目标服务器。")
+        if not self._check_ready():
             return
             
         self.btn_upload.setEnabled(False)
+        self.btn_verify.setEnabled(False)
+        self.btn_reupload.setEnabled(False)
+        self.btn_export_metrics.setEnabled(False)
         self.btn_upload.setText("资源分发中，请稍后...")
         
-        def prog_cb(host, u, t):
-            self.signals.progress.emit(host, u, t)
+        # 进度已在 FtpManager 中合并为约 10 Hz 的快照，这里直接转发到 GUI 线程
+        def prog_cb(server_id, u, t):
+            self.signals.progress.emit(server_id, u, t)
             
-        def stat_cb(host, msg, code):
-            self.signals.status.emit(host, msg, code)
+        def stat_cb(server_id, msg, code):
+            self.signals.status.emit(server_id, msg, code)
             
-        self.threads = self.ftp_manager.upload_to_all(self.selected_paths, "", prog_cb, stat_cb)
-        self.timer.start(500) # Check every 500ms if upload is completely done
-        
-    def check_threads(self):
-        all_done = True
-        for th in self.threads:
-            if th.is_alive():
-                all_done = False
-                break
-                
-        if all_done:
-            self.timer.stop()
-            self.btn_upload.setEnabled(True)
-            self.btn_upload.setText("开始上传及分发")
-            QMessageBox.information(self, "完工", "所有分发任务已执行完毕，请看详细状态！")
+        self.upload_job = self.ftp_manager.upload_to_all(self.selected_paths, "", prog_cb, stat_cb,
+                                                         broadcast=self.broadcast_cb.isChecked(),
+                                                         resume=self.resume_cb.isChecked(),
+                                                         delta=self.delta_cb.isChecked())
+        # 由调度器在全部服务器结束时通知，而不是定时轮询线程状态
+        self.upload_job.on_all_done(lambda job: self.signals.finished.emit())
+        
+    def _check_ready(self) -> bool:
+        if not self.selected_paths:
+            QMessageBox.warning(self, "提示", "请先选择至少一个待上传的文件或文件夹。")
+            return False
+        if not self.ftp_manager.servers:
+            QMessageBox.warning(self, "提示", "请至少配置并添加一台目标服务器。")
+            return False
+        return True
+
+    def _set_verify_busy(self, text: str):
+        self.btn_upload.setEnabled(False)
+        self.btn_verify.setEnabled(False)
+        self.btn_reupload.setEnabled(False)
+        self.btn_verify.setText(text)
+        self._reset_progress()
+
+    def start_verify(self):
+        if not self._check_ready():
+            return
+        self._set_verify_busy("校验中...")
+        self.verify_job = self.ftp_manager.verify_all(self.selected_paths, "",
+                                                      lambda sid, done, total: self.signals.progress.emit(sid, done, total),
+                                                      lambda sid, msg, code: self.signals.status.emit(sid, msg, code))
+        self.verify_job.on_all_done(lambda job: self.signals.verify_finished.emit())
+
+    def start_reupload(self):
+        self._set_verify_busy("重传中...")
+        self.verify_job = self.ftp_manager.reupload_mismatches(
+            lambda sid, done, total: self.signals.progress.emit(sid, done, total),
+            lambda sid, msg, code: self.signals.status.emit(sid, msg, code))
+        self.verify_job.on_all_done(lambda job: self.signals.verify_finished.emit())
+
+    def on_verify_finished(self):
+        self.verify_job = None
+        self.btn_upload.setEnabled(True)
+        self.btn_verify.setEnabled(True)
+        self.btn_verify.setText("校验分发结果")
+        reports = self.ftp_manager.verify_reports
+        names = {server.server_id: server.name or server.host for server in self.ftp_manager.servers}
+        bad = [r for r in reports.values() if not r.ok]
+        self.btn_reupload.setEnabled(any(r.mismatches for r in bad))
+        if not bad:
+            QMessageBox.information(self, "校验完成", f"{len(reports)} 台服务器上的文件与本地一致。")
+            return
+        box = QMessageBox(QMessageBox.Icon.Warning, "校验完成",
+                          f"{len(bad)} / {len(reports)} 台服务器存在不一致或无法校验的文件，"
+                          f"可点击“重传不一致文件”只重传这些文件。", parent=self)
+        box.setDetailedText("\n\n".join(f"[{names.get(r.server_id, r.host)}] {r.describe()}" for r in bad))
+        box.exec()
+
+    def on_upload_finished(self):
+        self.upload_job = None
+        self.btn_upload.setEnabled(True)
+        self.btn_verify.setEnabled(True)
+        self.btn_upload.setText("开始上传及分发")
+        self.btn_export_metrics.setEnabled(self.ftp_manager.upload_metrics is not None)
+        message = "所有分发任务已执行完毕，请看详细状态！"
+        checksums = self.ftp_manager.upload_checksums
+        if checksums is not None and checksums.path:
+            message += f"\n\n{checksums.algorithm.upper()} 摘要清单:\n{checksums.path}"
+        QMessageBox.information(self, "完工", message)
             
-    def update_progress(self, host, uploaded, total):
-        for i in range(self.server_list_widget.count()):
-            item = self.server_list_widget.item(i)
-            data = item.data(Qt.ItemDataRole.UserRole)
-            if data["host"] == host:
-                if total > 0:
-                    percent = int((uploaded / total) * 100)
-                    data["progress_bar"].setValue(percent)
-                break
+    def update_progress(self, server_id, uploaded, total):
+        row = self.server_rows.get(server_id)
+        if row and total > 0:
+            percent = int((uploaded / total) * 100)
+            row.progress_bar.setValue(percent)
+        self._show_server_metrics(server_id)
+        
+    def _show_server_metrics(self, server_id):
+        row = self.server_rows.get(server_id)
+        # 校验/重传期间显示其自身的统计，而不是上一次分发的
+        registry = self.ftp_manager.verify_metrics if self.verify_job is not None else self.ftp_manager.upload_metrics
+        metrics = registry.get(server_id) if registry else None
+        if row and metrics:
+            row.show_metrics(metrics.snapshot())
                 
-    def update_status(self, host, message, status_code):
-        for i in range(self.server_list_widget.count()):
-            item = self.server_list_widget.item(i)
-            data = item.data(Qt.ItemDataRole.UserRole)
-            if data["host"] == host:
-                data["status_label"].setText(message)
-                if status_code == 1:
-                    data["status_label"].setStyleSheet("color: green;")
-                elif status_code == -1:
-                    data["status_label"].setStyleSheet("color: red;")
-                else:
-                    data["status_label"].setStyleSheet("color: #FF9800;")
-                break
+    def update_status(self, server_id, message, status_code):
+        row = self.server_rows.get(server_id)
+        if not row:
+            return
+        row.status_label.setText(message)
+        row.status_label.setToolTip(message)
+        if status_code != 0:
+            self._show_server_metrics(server_id)
+        if status_code == 1:
+            row.status_label.setStyleSheet("color: green;")
+        elif status_code == -1:
+            row.status_label.setStyleSheet("color: red;")
+        else:
+            row.status_label.setStyleSheet("color: #FF9800;")
+            
+    def on_bandwidth_changed(self, kb_per_second: int):
+        self.ftp_manager.bandwidth.set_global_limit(kb_per_second * 1024)
+
+    def on_checksum_changed(self, index: int):
+        self.ftp_manager.checksum_algorithm = self.checksum_combo.itemData(index)
+
+    def export_metrics(self):
+        registry = self.ftp_manager.upload_metrics
+        if registry is None:
+            return
+        default_name = time.strftime("ftptool-metrics-%Y%m%d-%H%M%S.json")
+        path, _ = QFileDialog.getSaveFileName(self, "导出分发统计", default_name, "JSON (*.json)")
+        if not path:
+            return
+        try:
+            registry.export_json(path)
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", f"无法写入统计文件:\n{e}")
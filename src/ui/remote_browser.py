@@ -1,10 +1,13 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                             QPushButton, QTableWidget, QTableWidgetItem, 
+                             QPushButton, QTableView, QAbstractItemView,
                              QHeaderView, QLineEdit, QLabel, QMessageBox,
-                             QMenu, QFileDialog, QProgressDialog, QApplication)
-from PyQt6.QtCore import Qt
+                             QMenu, QFileDialog, QProgressDialog)
+from PyQt6.QtCore import Qt, QThreadPool
 import os
+import time
 from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.ui.tasks import FtpTask
+from src.ui.entry_model import RemoteEntryModel, RemoteEntryProxyModel
 
 class RemoteBrowserWidget(QWidget):
     def __init__(self, ftp_manager: FtpManager):
@@ -13,6 +16,12 @@ class RemoteBrowserWidget(QWidget):
         self.current_config = None
         self.current_path = ""
         
+        # 所有网络操作都在线程池中执行，GUI 线程只负责展示
+        self.thread_pool = QThreadPool.globalInstance()
+        self._active_tasks = set()
+        self._listing_task = None
+        self._listing_id = 0
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -32,17 +41,48 @@ class RemoteBrowserWidget(QWidget):
         self.btn_refresh = QPushButton("刷新")
         self.btn_refresh.clicked.connect(self.refresh_current_dir)
         
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("筛选名称")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setMaximumWidth(160)
+        
         nav_layout.addWidget(self.btn_up)
         nav_layout.addWidget(self.path_edit, stretch=1)
+        nav_layout.addWidget(self.filter_edit)
         nav_layout.addWidget(self.btn_refresh)
         
+        # --- Index Bar: 搜索/变更查询只读本地索引，不访问网络 ---
+        index_layout = QHBoxLayout()
+        self.index_search_edit = QLineEdit()
+        self.index_search_edit.setPlaceholderText("在索引中搜索文件名 (支持 * ?，回车搜索)")
+        self.index_search_edit.setClearButtonEnabled(True)
+        self.index_search_edit.returnPressed.connect(self.search_index)
+        
+        self.btn_changes = QPushButton("上次爬取的变更")
+        self.btn_changes.clicked.connect(self.show_index_changes)
+        
+        self.btn_index = QPushButton("更新索引")
+        self.btn_index.setToolTip("并行爬取整个服务器的目录树；只重新列举修改时间变化的目录")
+        self.btn_index.clicked.connect(self.build_index)
+        
+        index_layout.addWidget(self.index_search_edit, stretch=1)
+        index_layout.addWidget(self.btn_changes)
+        index_layout.addWidget(self.btn_index)
+        
         # --- File Table ---
         self.server_label = QLabel("当前未连接任何服务器")
         self.server_label.setStyleSheet("font-weight: bold; color: #1F2937; padding: 2px 0;")
         
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["名称", "大小", "类型", "修改时间"])
+        # 模型/视图：条目按列存放在模型中，视图只绘制可见行，十万级目录也不会为每格创建对象
+        self.model = RemoteEntryModel(self)
+        self.proxy = RemoteEntryProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.filter_edit.textChanged.connect(self.proxy.set_name_filter)
+        
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.SortOrder.AscendingOrder)
         
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Interactive)
@@ -51,17 +91,22 @@ class RemoteBrowserWidget(QWidget):
         header.setSectionResizeMode(2, QHeaderView.ResizeMode.Interactive)
         header.setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
         
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        # 固定行高，视图无需逐行计算尺寸
+        v_header = self.table.verticalHeader()
+        v_header.setVisible(False)
+        v_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        v_header.setDefaultSectionSize(self.fontMetrics().height() + 8)
         self.table.setShowGrid(False)
-        self.table.cellDoubleClicked.connect(self.on_item_double_clicked)
+        self.table.doubleClicked.connect(self.on_item_double_clicked)
         
         # Context Menu
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         
         layout.addLayout(nav_layout)
+        layout.addLayout(index_layout)
         layout.addWidget(self.server_label)
         layout.addWidget(self.table)
         
@@ -74,49 +119,140 @@ class RemoteBrowserWidget(QWidget):
         target_dir = config.remote_dir.strip() if config.remote_dir else "/"
         self.load_directory(target_dir)
         
-    def load_directory(self, path: str):
+    def _start_task(self, task: FtpTask, on_finished):
+        # 保持对任务的引用，直到结果回到 GUI 线程
+        self._active_tasks.add(task)
+
+        def _done(result):
+            self._active_tasks.discard(task)
+            on_finished(result)
+
+        task.signals.finished.connect(_done)
+        self.thread_pool.start(task)
+        
+    def load_directory(self, path: str, use_cache: bool = True):
         if not self.current_config:
             return
             
+        # 用户已切换目录，旧的列举请求直接取消
+        if self._listing_task is not None:
+            self._listing_task.cancel()
+        self._listing_id += 1
+        request_id = self._listing_id
+            
         self.path_edit.setText(f"Loading {path} ...")
-        self.table.setRowCount(0)
+        self.model.clear()
+        
+        task = FtpTask(self.ftp_manager.list_directory, self.current_config, path, use_cache)
+        task.kwargs["batch_callback"] = task.signals.batch.emit
+        task.kwargs["cancel_event"] = task.cancel_event
+        task.signals.batch.connect(lambda rows: self._on_listing_batch(request_id, rows))
+        self._listing_task = task
+        self._start_task(task, lambda result: self._on_listing_done(request_id, result))
         
-        success, items, actual_path = self.ftp_manager.list_directory(self.current_config, path)
+    def _on_listing_batch(self, request_id: int, rows):
+        if request_id == self._listing_id:
+            self.model.append_entries(rows)
+            
+    def _on_listing_done(self, request_id: int, result):
+        if request_id != self._listing_id:
+            return
+        self._listing_task = None
+        success, items, actual_path = result
         if success:
             self.current_path = actual_path
             self.path_edit.setText(actual_path)
+            # 流式加载的行是未排序的，完成后按当前排序 (文件夹在前) 重新展示
             self.populate_table(items)
-        else:
+            # 后台预取子目录，双击进入时可直接命中缓存
+            subdirs = [self._get_remote_path_for_item(item.name) for item in items if item.is_dir]
+            self.ftp_manager.prefetch_directories(self.current_config, subdirs)
+        elif actual_path != "Cancelled":
             self.path_edit.setText(self.current_path) # 回退显示之前的路径
             QMessageBox.warning(self, "浏览失败", f"无法加载目录内容:\n{actual_path}")
             
     def populate_table(self, items):
-        self.table.setRowCount(len(items))
-        for row, item in enumerate(items):
-            # Name
-            name_item = QTableWidgetItem(item['name'])
-            if item['type'] == 'dir':
-                name_item.setData(Qt.ItemDataRole.UserRole, 'dir')
-                name_item.setIcon(self.style().standardIcon(self.style().StandardPixmap.SP_DirIcon))
+        # 一次性重建模型并按当前排序列排序
+        self.model.set_entries(items)
+        
+    def _query_index(self, fn, *args, on_result):
+        """在线程池中执行索引查询 (打开/查询 SQLite 可能较慢)；与目录列举共用请求编号，只展示最新一次请求的结果"""
+        if self._listing_task is not None:
+            self._listing_task.cancel()
+            self._listing_task = None
+        self._listing_id += 1
+        request_id = self._listing_id
+        self.path_edit.setText("Querying index ...")
+
+        def _on_finished(result):
+            if request_id != self._listing_id:
+                return
+            # FtpTask 在查询抛出异常时返回 (False, 错误信息)
+            if isinstance(result, tuple):
+                self.path_edit.setText(self.current_path)
+                QMessageBox.warning(self, "索引查询失败", f"无法读取本地索引:\n{result[1]}")
+                return
+            on_result(result)
+
+        self._start_task(FtpTask(fn, *args), _on_finished)
+        
+    def _show_index_entries(self, items, title: str):
+        """在表格中展示索引查询结果 (名称为绝对路径)；进入目录或刷新后回到普通浏览"""
+        self.path_edit.setText(title)
+        self.populate_table(items)
+        
+    def search_index(self):
+        if not self.current_config:
+            return
+        text = self.index_search_edit.text().strip()
+        if not text:
+            return
+        self._query_index(self.ftp_manager.search_index, self.current_config, text,
+                          on_result=lambda items: self._show_index_entries(
+                              items, f"[索引搜索] {text}: {len(items)} 项"))
+        
+    def show_index_changes(self):
+        if not self.current_config:
+            return
+        self._query_index(self.ftp_manager.index_changes, self.current_config,
+                          on_result=self._show_index_changes)
+        
+    def _show_index_changes(self, changes):
+        since = (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(changes.since_time))
+                 if changes.since_time else "首次爬取")
+        self._show_index_entries(changes.added + changes.modified,
+                                 f"[变更: 自 {since}] 新增 {len(changes.added)}，修改 {len(changes.modified)}，"
+                                 f"删除 {len(changes.removed)}")
+        if changes.removed:
+            box = QMessageBox(QMessageBox.Icon.Information, "已删除的条目",
+                              f"自 {since} 以来有 {len(changes.removed)} 个条目已从服务器上删除。", parent=self)
+            box.setDetailedText("\n".join(f"{path}{'/' if entry_type == 'dir' else ''}"
+                                           for path, entry_type in changes.removed))
+            box.exec()
+        
+    def build_index(self):
+        if not self.current_config:
+            return
+        config = self.current_config
+        self.btn_index.setEnabled(False)
+        self.btn_index.setText("索引中...")
+        
+        def _on_progress(done, known):
+            self.btn_index.setText(f"索引中 {done}/{known}")
+            
+        def _on_finished(result):
+            success, msg = result
+            self.btn_index.setEnabled(True)
+            self.btn_index.setText("更新索引")
+            if success:
+                QMessageBox.information(self, "索引完成", f"[{config.name}]\n{msg}")
             else:
-                name_item.setData(Qt.ItemDataRole.UserRole, 'file')
-                name_item.setIcon(self.style().standardIcon(self.style().StandardPixmap.SP_FileIcon))
+                QMessageBox.warning(self, "索引未完整完成", f"[{config.name}]\n{msg}")
                 
-            # Size
-            size_str = self.format_size(item['size']) if item['size'] else ""
-            size_item = QTableWidgetItem(size_str)
-            
-            # Type
-            type_str = "文件夹" if item['type'] == 'dir' else "文件"
-            type_item = QTableWidgetItem(type_str)
-            
-            # Modify
-            mod_item = QTableWidgetItem(item['modify'])
-            
-            self.table.setItem(row, 0, name_item)
-            self.table.setItem(row, 1, size_item)
-            self.table.setItem(row, 2, type_item)
-            self.table.setItem(row, 3, mod_item)
+        task = FtpTask(self.ftp_manager.index_server, config)
+        task.kwargs["progress_callback"] = lambda host, done, known: task.signals.progress.emit(done, known)
+        task.signals.progress.connect(_on_progress)
+        self._start_task(task, _on_finished)
 
     def go_up(self):
         if not self.current_path or self.current_path == "/":
@@ -135,45 +271,23 @@ class RemoteBrowserWidget(QWidget):
         
     def refresh_current_dir(self):
         if self.current_path:
-            self.load_directory(self.current_path)
+            self.load_directory(self.current_path, use_cache=False)
             
-    def on_item_double_clicked(self, row, col):
-        name_item = self.table.item(row, 0)
-        if not name_item:
+    def on_item_double_clicked(self, index):
+        entry = self.proxy.entry_at(index.row())
+        if not entry:
             return
             
-        item_type = name_item.data(Qt.ItemDataRole.UserRole)
-        if item_type == 'dir':
-            folder_name = name_item.text()
-            # 拼接路径
-            if self.current_path.endswith('/'):
-                new_path = f"{self.current_path}{folder_name}"
-            else:
-                new_path = f"{self.current_path}/{folder_name}"
-            
-            self.load_directory(new_path)
-        
-    def format_size(self, size_bytes_str):
-        try:
-            size_bytes = int(size_bytes_str)
-            if size_bytes < 1024:
-                return f"{size_bytes} B"
-            elif size_bytes < 1024 * 1024:
-                return f"{size_bytes / 1024:.1f} KB"
-            elif size_bytes < 1024 * 1024 * 1024:
-                return f"{size_bytes / (1024 * 1024):.1f} MB"
-            else:
-                return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
-        except (ValueError, TypeError):
-            return size_bytes_str
-
+        folder_name, is_dir = entry
+        if is_dir:
+            self.load_directory(self._get_remote_path_for_item(folder_name))
+        
     def show_context_menu(self, pos):
-        item = self.table.itemAt(pos)
-        if not item:
+        index = self.table.indexAt(pos)
+        entry = self.proxy.entry_at(index.row()) if index.isValid() else None
+        if not entry:
             return
-            
-        row = item.row()
-        name_item = self.table.item(row, 0)
+        filename, is_dir = entry
         
         menu = QMenu(self)
         download_action = menu.addAction("⬇️ 下载")
@@ -181,19 +295,20 @@ class RemoteBrowserWidget(QWidget):
         
         action = menu.exec(self.table.mapToGlobal(pos))
         if action == download_action:
-            self.download_selected(row, name_item)
+            self.download_selected(filename, is_dir)
         elif action == delete_action:
-            self.delete_selected(row, name_item)
+            self.delete_selected(filename, is_dir)
             
     def _get_remote_path_for_item(self, filename: str) -> str:
+        # 索引搜索/变更结果中的名称已是绝对路径
+        if filename.startswith('/'):
+            return filename
         if self.current_path.endswith('/'):
             return f"{self.current_path}{filename}"
         else:
             return f"{self.current_path}/{filename}"
             
-    def download_selected(self, row, name_item):
-        filename = name_item.text()
-        is_dir = name_item.data(Qt.ItemDataRole.UserRole) == 'dir'
+    def download_selected(self, filename: str, is_dir: bool):
         remote_path = self._get_remote_path_for_item(filename)
         
         # User selects local save directory
@@ -207,33 +322,49 @@ class RemoteBrowserWidget(QWidget):
         progress_dialog.setAutoClose(True)
         progress_dialog.setAutoReset(True)
         
-        def _prog_cb(host, downloaded, total_size):
+        def _on_progress(downloaded, total_size):
             if total_size > 0:
                 pct = int((downloaded / total_size) * 100)
-                progress_dialog.setValue(pct)
+                progress_dialog.setValue(min(pct, 99))
             else:
                 progress_dialog.setValue(0) # indeterminate-like behavior if unknown size
-            QApplication.processEvents()
                 
+        def _on_finished(result):
+            success, msg = result
+            progress_dialog.setValue(100)
+            if success:
+                QMessageBox.information(self, "下载完成", f"已成功下载至:\n{local_dir}")
+            else:
+                QMessageBox.critical(self, "下载失败", f"下载错误:\n{msg}")
+                
+        task = FtpTask(self.ftp_manager.download_path, self.current_config, remote_path, local_dir, is_dir)
+        task.kwargs["progress_callback"] = lambda host, downloaded, total_size: task.signals.progress.emit(downloaded, total_size)
+        task.signals.progress.connect(_on_progress)
         progress_dialog.show()
-        success, msg = self.ftp_manager.download_path(self.current_config, remote_path, local_dir, is_dir, _prog_cb)
-        progress_dialog.setValue(100)
-        
-        if success:
-            QMessageBox.information(self, "下载完成", f"已成功下载至:\n{local_dir}")
-        else:
-            QMessageBox.critical(self, "下载失败", f"下载错误:\n{msg}")
+        self._start_task(task, _on_finished)
             
-    def delete_selected(self, row, name_item):
-        filename = name_item.text()
-        is_dir = name_item.data(Qt.ItemDataRole.UserRole) == 'dir'
+    def delete_selected(self, filename: str, is_dir: bool):
         remote_path = self._get_remote_path_for_item(filename)
         
         reply = QMessageBox.question(self, "确认删除", f"确定要彻底删除该远端 {'目录' if is_dir else '文件'} 吗？\n{remote_path}\n此操作不可逆！", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if reply == QMessageBox.StandardButton.Yes:
-            success, msg = self.ftp_manager.delete_path(self.current_config, remote_path, is_dir)
-            if success:
-                self.refresh_current_dir()
-            else:
-                QMessageBox.critical(self, "删除失败", f"删除遇到错误:\n{msg}")
+            self.path_edit.setText(f"Deleting {remote_path} ...")
+            
+            def _on_finished(result):
+                success, msg = result
+                if success:
+                    self.refresh_current_dir()
+                else:
+                    # 部分删除成功时列表也已变化
+                    self.refresh_current_dir()
+                    QMessageBox.critical(self, "删除失败", f"删除遇到错误:\n{msg}")
+                    
+            def _on_progress(deleted, total):
+                self.path_edit.setText(f"Deleting {remote_path} ... {deleted}/{total}")
+                    
+            task = FtpTask(self.ftp_manager.delete_path, self.current_config, remote_path, is_dir)
+            if is_dir:
+                task.kwargs["progress_callback"] = lambda host, deleted, total: task.signals.progress.emit(deleted, total)
+                task.signals.progress.connect(_on_progress)
+            self._start_task(task, _on_finished)
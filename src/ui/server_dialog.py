@@ -4,7 +4,7 @@ class ServerDialog(QDialog):
     def __init__(self, parent=None, server_data=None):
         super().__init__(parent)
         self.setWindowTitle("FTP 服务器配置")
-        self.resize(300, 250)
+        self.resize(300, 560)
         self.server_data = server_data or {}
         
         layout = QVBoxLayout(self)
@@ -25,6 +25,29 @@ class ServerDialog(QDialog):
         self.dir_edit = QLineEdit(self.server_data.get("remote_dir", ""))
         self.dir_edit.setPlaceholderText("留空则使用全局默认路径")
         
+        self.conn_edit = QLineEdit(str(self.server_data.get("max_connections", 4)))
+        self.conn_edit.setPlaceholderText("同时保持的最大会话数")
+        
+        self.workers_edit = QLineEdit(str(self.server_data.get("upload_workers", 3)))
+        self.workers_edit.setPlaceholderText("同时上传的会话数")
+        
+        self.download_workers_edit = QLineEdit(str(self.server_data.get("download_workers", 3)))
+        self.download_workers_edit.setPlaceholderText("下载目录时同时使用的会话数")
+        
+        self.segments_edit = QLineEdit(str(self.server_data.get("download_segments", 4)))
+        self.segments_edit.setPlaceholderText("大文件分段并行下载的段数")
+        
+        self.priority_edit = QLineEdit(str(self.server_data.get("priority", 0)))
+        self.priority_edit.setPlaceholderText("数值越大越先分发，金丝雀节点可设为 10")
+        
+        self.bandwidth_edit = QLineEdit(str(self.server_data.get("bandwidth_limit", 0)))
+        self.bandwidth_edit.setPlaceholderText("单台服务器的带宽上限 (KB/s)，0 表示不限速")
+        
+        self.modez_cb = QCheckBox("压缩传输 (MODE Z，服务器不支持时自动回退)")
+        self.modez_cb.setChecked(self.server_data.get("mode_z", False))
+        self.modez_level_edit = QLineEdit(str(self.server_data.get("mode_z_level", 6)))
+        self.modez_level_edit.setPlaceholderText("压缩级别 1-9，越大压缩率越高、越耗 CPU")
+        
         self.passive_cb = QCheckBox("被动模式 (Passive Mode)")
         self.passive_cb.setChecked(self.server_data.get("passive_mode", True))
         
@@ -40,7 +63,21 @@ class ServerDialog(QDialog):
         layout.addWidget(self.pass_edit)
         layout.addWidget(QLabel("自定义上传路径 (Remote Dir):"))
         layout.addWidget(self.dir_edit)
+        layout.addWidget(QLabel("最大连接数 (Max Connections):"))
+        layout.addWidget(self.conn_edit)
+        layout.addWidget(QLabel("并发上传数 (Upload Workers):"))
+        layout.addWidget(self.workers_edit)
+        layout.addWidget(QLabel("并发下载数 (Download Workers):"))
+        layout.addWidget(self.download_workers_edit)
+        layout.addWidget(QLabel("分段下载数 (Download Segments):"))
+        layout.addWidget(self.segments_edit)
+        layout.addWidget(QLabel("分发优先级 (Priority):"))
+        layout.addWidget(self.priority_edit)
+        layout.addWidget(QLabel("限速 KB/s (Bandwidth Limit):"))
+        layout.addWidget(self.bandwidth_edit)
         layout.addWidget(self.passive_cb)
+        layout.addWidget(self.modez_cb)
+        layout.addWidget(self.modez_level_edit)
         
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("保存")
@@ -63,14 +100,36 @@ class ServerDialog(QDialog):
             QMessageBox.warning(self, "错误", "端口必须是数字！")
             return
             
+        try:
+            max_connections = max(1, int(self.conn_edit.text().strip()))
+            upload_workers = max(1, int(self.workers_edit.text().strip()))
+            download_workers = max(1, int(self.download_workers_edit.text().strip()))
+            download_segments = max(1, int(self.segments_edit.text().strip()))
+            priority = int(self.priority_edit.text().strip() or 0)
+            bandwidth_limit = max(0, int(self.bandwidth_edit.text().strip() or 0))
+            mode_z_level = min(9, max(1, int(self.modez_level_edit.text().strip() or 6)))
+        except ValueError:
+            QMessageBox.warning(self, "错误", "最大连接数、并发上传数、并发下载数、分段下载数、优先级、限速和压缩级别必须是数字！")
+            return
+            
+        # 保留对话框未展示的字段 (如 enabled)，避免编辑后丢失
         self.server_data = {
+            **self.server_data,
             "name": self.name_edit.text().strip() or self.host_edit.text().strip(),
             "host": self.host_edit.text().strip(),
             "port": port,
             "username": self.user_edit.text().strip() or "anonymous",
             "password": self.pass_edit.text(),
             "remote_dir": self.dir_edit.text().strip(),
-            "passive_mode": self.passive_cb.isChecked()
+            "passive_mode": self.passive_cb.isChecked(),
+            "max_connections": max_connections,
+            "upload_workers": upload_workers,
+            "download_workers": download_workers,
+            "download_segments": download_segments,
+            "priority": priority,
+            "bandwidth_limit": bandwidth_limit,
+            "mode_z": self.modez_cb.isChecked(),
+            "mode_z_level": mode_z_level
         }
         self.accept()
         
@@ -1,7 +1,19 @@
 from PyQt6.QtCore import QObject, pyqtSignal
 
 class FtpSignals(QObject):
-    # host, uploaded_bytes, total_bytes
-    progress = pyqtSignal(str, int, int)
-    # host, message, status_code (-1: error, 0: in progress, 1: success)
+    # server_id, uploaded_bytes, total_bytes (字节数可能超过 32 位，使用 object 传递)
+    progress = pyqtSignal(str, object, object)
+    # server_id, message, status_code (-1: error, 0: in progress, 1: success)
     status = pyqtSignal(str, str, int)
+    # 整批分发任务全部结束
+    finished = pyqtSignal()
+    # 整批校验 (或重传不一致文件) 任务全部结束
+    verify_finished = pyqtSignal()
+
+class TaskSignals(QObject):
+    # 后台任务的返回值 (任意 Python 对象)
+    finished = pyqtSignal(object)
+    # done, total (字节数可能超过 32 位，使用 object 传递)
+    progress = pyqtSignal(object, object)
+    # 流式返回的一批数据，例如目录条目
+    batch = pyqtSignal(object)
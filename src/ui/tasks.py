@@ -0,0 +1,28 @@
+import threading
+from PyQt6.QtCore import QRunnable
+from src.ui.signals import TaskSignals
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class FtpTask(QRunnable):
+    """在 QThreadPool 中执行一次 FtpManager 调用，结果通过 TaskSignals 回到 GUI 线程"""
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            logger.error(f"Background task {getattr(self.fn, '__name__', self.fn)} failed: {e}", exc_info=True)
+            result = (False, str(e))
+        self.signals.finished.emit(result)
@@ -11,6 +11,12 @@ def get_config_dir():
 
 CONFIG_FILE = os.path.join(get_config_dir(), "ftp_config.json")
 
+def get_data_dir(*parts: str) -> str:
+    """程序运行时数据 (推送清单、索引等) 的存放目录，不存在时自动创建"""
+    path = os.path.join(get_config_dir(), "data", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
 def load_config() -> List[dict]:
     """从本地加载 FTP 服务器配置列表"""
     if not os.path.exists(CONFIG_FILE):
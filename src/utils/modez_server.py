@@ -0,0 +1,321 @@
+"""本地 FTP 替身服务器：支持 MODE Z (deflate)，用于离线验证压缩传输
+
+只实现本工具用到的命令子集 (被动模式、MLSD/MLST/LIST/NLST、RETR/STOR/APPE/REST、
+SIZE/MDTM、MKD/RMD/DELE 等)，不做身份校验，只应在本机测试时使用::
+
+    python -m src.utils.modez_server --root D:/ftp-root --port 2121
+
+MODE Z 下所有数据连接 (包括目录列表) 都经过 deflate 压缩；日志中会输出每次传输的
+原始字节数与线上字节数。
+"""
+import argparse
+import os
+import socket
+import socketserver
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FEATURES = ("MLST type*;size*;modify*;", "SIZE", "MDTM", "REST STREAM", "UTF8", "MODE Z")
+
+
+class _DataChannel:
+    """一次数据连接：MODE Z 时收发都经过 deflate，并统计原始/线上字节数"""
+
+    def __init__(self, conn: socket.socket, compress: bool, level: int):
+        self.conn = conn
+        self.compressor = zlib.compressobj(level) if compress else None
+        self.decompressor = zlib.decompressobj() if compress else None
+        self.payload = 0
+        self.wire = 0
+
+    def send(self, data: bytes):
+        self.payload += len(data)
+        if self.compressor:
+            data = self.compressor.compress(data)
+        self.wire += len(data)
+        self.conn.sendall(data)
+
+    def recv(self) -> bytes:
+        while True:
+            data = self.conn.recv(65536)
+            self.wire += len(data)
+            if not data:
+                tail = self.decompressor.flush() if self.decompressor else b''
+                self.payload += len(tail)
+                return tail
+            if self.decompressor:
+                data = self.decompressor.decompress(data)
+                if not data:
+                    continue
+            self.payload += len(data)
+            return data
+
+    def close(self):
+        try:
+            if self.compressor:
+                tail = self.compressor.flush()
+                self.wire += len(tail)
+                self.conn.sendall(tail)
+        finally:
+            self.conn.close()
+
+
+class _Session(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def resolve(self, path: str) -> Tuple[str, str]:
+        """返回 (虚拟绝对路径, 本地路径)；不允许越出根目录"""
+        if not path:
+            path = self.cwd
+        if not path.startswith("/"):
+            path = self.cwd.rstrip("/") + "/" + path
+        parts = []
+        for seg in path.split("/"):
+            if seg in ("", "."):
+                continue
+            if seg == "..":
+                if parts:
+                    parts.pop()
+                continue
+            parts.append(seg)
+        return "/" + "/".join(parts), os.path.join(self.server.root, *parts)
+
+    def open_data(self) -> _DataChannel:
+        if self.passive is None:
+            raise ConnectionError("no PASV issued")
+        conn, _ = self.passive.accept()
+        self.passive.close()
+        self.passive = None
+        return _DataChannel(conn, self.mode_z, self.level)
+
+    def handle(self):
+        self.cwd = "/"
+        self.passive: Optional[socket.socket] = None
+        self.rest = 0
+        self.mode_z = False
+        self.level = 6
+        self.reply("220 FtpTool MODE Z stand-in server ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                break
+            cmd, _, arg = raw.decode("utf-8", "replace").rstrip("\r\n").partition(" ")
+            try:
+                if self.dispatch(cmd.upper(), arg) == "quit":
+                    break
+            except OSError as e:
+                self.reply(f"550 {e}")
+
+    def dispatch(self, cmd: str, arg: str) -> Optional[str]:
+        if cmd == "USER":
+            self.reply("331 Any password will do")
+        elif cmd == "PASS":
+            self.reply("230 Logged in")
+        elif cmd == "QUIT":
+            self.reply("221 Bye")
+            return "quit"
+        elif cmd == "FEAT":
+            self.reply("211-Features:")
+            for feature in FEATURES:
+                self.reply(" " + feature)
+            self.reply("211 End")
+        elif cmd == "OPTS":
+            words = arg.upper().split()
+            if words[:3] == ["MODE", "Z", "LEVEL"] and len(words) == 4 and words[3].isdigit():
+                self.level = max(0, min(9, int(words[3])))
+                self.reply(f"200 MODE Z LEVEL set to {self.level}")
+            else:
+                self.reply("200 OK")
+        elif cmd in ("TYPE", "NOOP", "SYST"):
+            self.reply("200 OK" if cmd != "SYST" else "215 UNIX Type: L8")
+        elif cmd == "MODE":
+            mode = arg.strip().upper()
+            if mode in ("S", "Z"):
+                self.mode_z = mode == "Z"
+                self.reply(f"200 MODE {mode} ok")
+            else:
+                self.reply("504 Unsupported mode")
+        elif cmd == "PWD":
+            self.reply(f'257 "{self.cwd}"')
+        elif cmd in ("CWD", "CDUP"):
+            virt, real = self.resolve(".." if cmd == "CDUP" else arg)
+            if os.path.isdir(real):
+                self.cwd = virt
+                self.reply("250 OK")
+            else:
+                self.reply("550 No such directory")
+        elif cmd == "MKD":
+            virt, real = self.resolve(arg)
+            os.mkdir(real)
+            self.reply(f'257 "{virt}" created')
+        elif cmd == "RMD":
+            os.rmdir(self.resolve(arg)[1])
+            self.reply("250 OK")
+        elif cmd == "DELE":
+            real = self.resolve(arg)[1]
+            if os.path.isdir(real):
+                self.reply("550 Is a directory")
+            else:
+                os.remove(real)
+                self.reply("250 OK")
+        elif cmd == "SIZE":
+            real = self.resolve(arg)[1]
+            self.reply(f"213 {os.path.getsize(real)}" if os.path.isfile(real) else "550 No such file")
+        elif cmd == "MDTM":
+            real = self.resolve(arg)[1]
+            if os.path.exists(real):
+                self.reply("213 " + time.strftime("%Y%m%d%H%M%S", time.gmtime(os.path.getmtime(real))))
+            else:
+                self.reply("550 No such file")
+        elif cmd == "REST":
+            self.rest = int(arg)
+            self.reply(f"350 Restarting at {self.rest}")
+        elif cmd == "PASV":
+            self.passive = socket.socket()
+            self.passive.bind((self.server.server_address[0], 0))
+            self.passive.listen(1)
+            host = self.server.server_address[0].replace(".", ",")
+            port = self.passive.getsockname()[1]
+            self.reply(f"227 Entering Passive Mode ({host},{port >> 8},{port & 255})")
+        elif cmd == "MLST":
+            virt, real = self.resolve(arg)
+            if os.path.exists(real):
+                self.reply(f"250-Listing {virt}")
+                self.reply(" " + self._facts(real) + f" {virt}")
+                self.reply("250 End")
+            else:
+                self.reply("550 No such file or directory")
+        elif cmd in ("LIST", "NLST", "MLSD"):
+            self.send_listing(cmd, arg)
+        elif cmd == "RETR":
+            self.send_file(arg)
+        elif cmd in ("STOR", "APPE"):
+            self.receive_file(cmd, arg)
+        else:
+            self.reply("502 Command not implemented")
+        return None
+
+    def send_listing(self, cmd: str, arg: str):
+        real = self.resolve("" if arg.startswith("-") else arg)[1]
+        if not os.path.isdir(real):
+            self.reply("550 No such directory")
+            return
+        lines = []
+        for name in sorted(os.listdir(real)):
+            st = os.stat(os.path.join(real, name))
+            is_dir = os.path.isdir(os.path.join(real, name))
+            if cmd == "NLST":
+                lines.append(name)
+            elif cmd == "MLSD":
+                lines.append(f"{self._facts(os.path.join(real, name))} {name}")
+            else:
+                stamp = time.strftime("%b %d %H:%M", time.gmtime(st.st_mtime))
+                lines.append(f"{'d' if is_dir else '-'}rw-r--r--   1 owner group {st.st_size:>12} {stamp} {name}")
+        self.reply("150 Here comes the listing")
+        channel = self.open_data()
+        try:
+            channel.send("".join(line + "\r\n" for line in lines).encode("utf-8"))
+        except OSError:
+            # 客户端取消列举，提前关闭了数据连接
+            channel.conn.close()
+            self.reply("426 Transfer aborted")
+            return
+        channel.close()
+        self.reply("226 Listing sent")
+
+    @staticmethod
+    def _facts(real: str) -> str:
+        st = os.stat(real)
+        modify = time.strftime("%Y%m%d%H%M%S", time.gmtime(st.st_mtime))
+        return f"type={'dir' if os.path.isdir(real) else 'file'};size={st.st_size};modify={modify};"
+
+    def send_file(self, arg: str):
+        real = self.resolve(arg)[1]
+        if not os.path.isfile(real):
+            self.reply("550 No such file")
+            return
+        self.reply("150 Opening data connection")
+        channel = self.open_data()
+        with open(real, "rb") as f:
+            f.seek(self.rest)
+            self.rest = 0
+            try:
+                for block in iter(lambda: f.read(65536), b''):
+                    channel.send(block)
+                channel.close()
+            except OSError:
+                # 客户端提前关闭 (分段下载)
+                self.reply("426 Transfer aborted")
+                return
+        self._log_transfer("RETR", arg, channel)
+        self.reply("226 Transfer complete")
+
+    def receive_file(self, cmd: str, arg: str):
+        real = self.resolve(arg)[1]
+        self.reply("150 Ready to receive")
+        channel = self.open_data()
+        if cmd == "APPE":
+            mode = "ab"
+        else:
+            mode = "r+b" if self.rest and os.path.exists(real) else "wb"
+        with open(real, mode) as f:
+            if self.rest and cmd == "STOR":
+                f.seek(self.rest)
+                f.truncate()
+            self.rest = 0
+            while True:
+                data = channel.recv()
+                if not data:
+                    break
+                f.write(data)
+        channel.conn.close()
+        self._log_transfer(cmd, arg, channel)
+        self.reply("226 Transfer complete")
+
+    def _log_transfer(self, cmd: str, arg: str, channel: _DataChannel):
+        mode = f"MODE Z level {self.level}" if self.mode_z else "MODE S"
+        logger.info(f"{cmd} {arg}: {channel.payload} bytes, {channel.wire} on the wire ({mode})")
+
+
+class ModeZServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root: str, host: str = "127.0.0.1", port: int = 2121):
+        self.root = os.path.abspath(root)
+        super().__init__((host, port), _Session)
+
+
+def start_server(root: str, host: str = "127.0.0.1", port: int = 0) -> ModeZServer:
+    """在后台线程中启动服务器并返回；port=0 时由系统分配 (见 server.server_address)"""
+    server = ModeZServer(root, host, port)
+    threading.Thread(target=server.serve_forever, name="modez-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FTP stand-in server with MODE Z support")
+    parser.add_argument("--root", default=".", help="served directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2121)
+    args = parser.parse_args()
+    server = ModeZServer(args.root, args.host, args.port)
+    logger.info(f"Serving {server.root} on {args.host}:{server.server_address[1]} (MODE Z enabled)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
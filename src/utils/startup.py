@@ -0,0 +1,43 @@
+import logging
+import sys
+import time
+from typing import List, Tuple
+
+# 本模块应是入口最先导入的模块，之后的耗时都以此为起点
+_T0 = time.perf_counter()
+_enabled = False
+_reported = False
+# (阶段名, 时间点, 当时已加载的模块数)
+_marks: List[Tuple[str, float, int]] = []
+
+
+def enable():
+    """开启启动耗时记录 (--profile-startup)；未开启时 mark()/report() 不做任何事"""
+    global _enabled
+    _enabled = True
+    _marks.append(("entry point started", _T0, len(sys.modules)))
+
+
+def mark(label: str):
+    """记录一个启动阶段的结束时间点"""
+    if _enabled:
+        _marks.append((label, time.perf_counter(), len(sys.modules)))
+
+
+def format_report() -> str:
+    lines = ["Startup profile (ms since entry point, +ms for the phase, modules loaded):"]
+    previous = _T0
+    for label, at, modules in _marks:
+        lines.append(f"  {(at - _T0) * 1000:8.1f}  +{(at - previous) * 1000:7.1f}  {modules:5d}  {label}")
+        previous = at
+    return "\n".join(lines)
+
+
+def report():
+    """输出一次启动耗时报告，之后的调用不再重复输出"""
+    global _reported
+    if not _enabled or _reported:
+        return
+    _reported = True
+    # 经由日志输出：开发时显示在控制台，打包后的窗口程序 (没有标准错误) 也会写入日志文件
+    logging.getLogger(__name__).info(format_report())
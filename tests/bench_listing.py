@@ -0,0 +1,61 @@
+"""目录列表解析器的吞吐量基准 (不是 pytest 用例)：python tests/bench_listing.py [行数]"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.listing import parse_list_line, parse_mlsd_line
+
+
+def _legacy_split_parse(line: str):
+    """旧实现 (split + startswith('d'))，仅用于基准对比"""
+    parts = line.split(None, 8)
+    if len(parts) >= 9:
+        return {'name': parts[-1], 'type': 'dir' if line.startswith('d') else 'file',
+                'size': parts[4], 'modify': f"{parts[5]} {parts[6]} {parts[7]}"}
+    return None
+
+
+def _legacy_mlsd_parse(line: str):
+    """旧实现 (ftplib.mlsd 每行一个事实字典，再转换为条目字典)，仅用于基准对比"""
+    facts_found, _, name = line.partition(' ')
+    facts = {}
+    for fact in facts_found[:-1].split(";"):
+        key, _, value = fact.partition("=")
+        facts[key.lower()] = value
+    modify = facts.get('modify', '')
+    if modify and len(modify) >= 14:
+        modify = f"{modify[0:4]}-{modify[4:6]}-{modify[6:8]} {modify[8:10]}:{modify[10:12]}:{modify[12:14]}"
+    return {'name': name, 'type': 'dir' if facts.get('type') in ('dir', 'cdir', 'pdir') else 'file',
+            'size': facts.get('size', ''), 'modify': modify}
+
+
+def benchmark(count: int = 1_000_000):
+    """在合成的百万行列表上测量各解析器的吞吐量：python tests/bench_listing.py [行数]"""
+    unix = [f"-rw-r--r--   1 owner group {i * 7:>10} Jan {i % 28 + 1:>2} 12:{i % 60:02d} file_{i}.log"
+            if i % 10 else f"drwxr-xr-x   2 owner group       4096 Mar  3  2023 dir_{i}"
+            for i in range(count)]
+    dos = [f"01-{i % 28 + 1:02d}-24  09:{i % 60:02d}PM {i * 7:>14} file_{i}.log"
+           if i % 10 else f"01-{i % 28 + 1:02d}-24  09:{i % 60:02d}AM       <DIR>          dir_{i}"
+           for i in range(count)]
+    mlsd = [f"type=file;size={i * 7};modify=20240131{i % 24:02d}0000;perm=r; file_{i}.log"
+            if i % 10 else f"type=dir;modify=20240131000000;perm=el; dir_{i}"
+            for i in range(count)]
+    now = time.time()
+    cases = (
+        ("legacy split (unix)", unix, _legacy_split_parse),
+        ("unix LIST", unix, lambda line: parse_list_line(line, now)),
+        ("DOS LIST", dos, lambda line: parse_list_line(line, now)),
+        ("legacy ftplib MLSD", mlsd, _legacy_mlsd_parse),
+        ("MLSD", mlsd, parse_mlsd_line),
+    )
+    for label, lines, parser in cases:
+        start = time.perf_counter()
+        parsed = sum(1 for line in lines if parser(line) is not None)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22} {parsed:>9} entries  {elapsed:6.2f}s  {count / elapsed / 1e6:5.2f} M lines/s")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
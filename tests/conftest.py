@@ -0,0 +1,57 @@
+"""测试公共夹具：本机 FTP 替身服务器 (src/utils/modez_server.py) 与隔离的运行时数据目录"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.utils import config as app_config
+from src.utils.modez_server import start_server
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """推送清单、校验和清单、索引等写到临时目录，不污染仓库下的 data/"""
+    path = tmp_path / "app"
+    monkeypatch.setattr(app_config, "get_config_dir", lambda: str(path))
+    return path
+
+
+@pytest.fixture
+def ftp_root(tmp_path):
+    """替身服务器的根目录 (远端 "/")"""
+    root = tmp_path / "remote"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def ftp_server(ftp_root):
+    server = start_server(str(ftp_root))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def server_config(ftp_server):
+    return FtpServerConfig("127.0.0.1", ftp_server.server_address[1], "tester", "secret", name="local")
+
+
+@pytest.fixture
+def manager(server_config):
+    manager = FtpManager()
+    manager.servers = [server_config]
+    yield manager
+    manager.close()
+
+
+def write_tree(base, files: dict):
+    """按 {相对路径: 内容} 创建本地文件，返回 base"""
+    for rel_path, content in files.items():
+        path = base / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return base
@@ -0,0 +1,95 @@
+import threading
+import time
+import types
+
+import pytest
+
+from src.core import bandwidth
+from src.core.bandwidth import BandwidthGovernor, TokenBucket
+from src.core.ftp_manager import FtpServerConfig
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """虚拟时钟：sleep 只推进时间，记录总共睡了多久"""
+    state = types.SimpleNamespace(now=1000.0, slept=0.0)
+
+    def sleep(seconds):
+        state.now += seconds
+        state.slept += seconds
+
+    monkeypatch.setattr(bandwidth, "time", types.SimpleNamespace(monotonic=lambda: state.now, sleep=sleep))
+    return state
+
+
+def test_unlimited_bucket_never_sleeps(clock):
+    bucket = TokenBucket(0)
+    for _ in range(100):
+        bucket.consume(1024 * 1024)
+    assert clock.slept == 0
+
+
+def test_burst_then_steady_rate(clock):
+    bucket = TokenBucket(rate=100_000, burst=50_000)
+    bucket.consume(50_000)
+    assert clock.slept == 0
+    for _ in range(10):
+        bucket.consume(10_000)
+    # 突发额度用完后按 rate 发送：10 × 10 KB 需要 1 秒
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_idle_time_restores_burst_only(clock):
+    bucket = TokenBucket(rate=100_000, burst=50_000)
+    bucket.consume(100_000)
+    clock.now += 60
+    clock.slept = 0
+    bucket.consume(50_000)
+    assert clock.slept == 0
+    bucket.consume(100_000)
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_set_rate_takes_effect_immediately(clock):
+    bucket = TokenBucket(rate=1000, burst=0)
+    bucket.consume(10_000)
+    assert clock.slept == pytest.approx(10.0)
+    bucket.set_rate(0)
+    clock.slept = 0
+    bucket.consume(10_000)
+    assert clock.slept == 0
+
+
+def test_governor_applies_server_and_global_limits(clock):
+    governor = BandwidthGovernor(global_limit=0)
+    slow = FtpServerConfig("a", 21, "u", "pw", bandwidth_limit=10)
+    fast = FtpServerConfig("b", 21, "u", "pw")
+    governor.throttle(fast, 1024 * 1024)
+    assert clock.slept == 0
+    governor.throttle(slow, 10 * 1024 + 256 * 1024)
+    assert clock.slept == pytest.approx(1.0)
+
+    governor.set_server_limit(slow, 0)
+    governor.set_global_limit(512 * 1024)
+    clock.slept = 0
+    governor.throttle(slow, 256 * 1024 + 512 * 1024)
+    assert clock.slept == pytest.approx(1.0)
+
+
+def test_shared_bucket_splits_bandwidth_between_threads():
+    bucket = TokenBucket(rate=400_000, burst=0)
+    sent = {"a": 0, "b": 0}
+
+    def run(key):
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            bucket.consume(10_000)
+            sent[key] += 10_000
+
+    threads = [threading.Thread(target=run, args=(key,)) for key in sent]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(sent.values()) <= 400_000 * 0.5 + 40_000
+    assert min(sent.values()) >= max(sent.values()) * 0.5
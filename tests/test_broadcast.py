@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import write_tree
+from src.core.broadcast import BroadcastHub
+from src.core.ftp_manager import FtpServerConfig
+
+CHUNK = 1024
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / "payload.bin"
+    path.write_bytes(os.urandom(CHUNK * 64 + 123))
+    return str(path)
+
+
+def _read_all(reader) -> bytes:
+    parts = []
+    with reader:
+        while True:
+            data = reader.read()
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+
+def _read_in_threads(hub, path, keys):
+    results = {}
+
+    def run(key):
+        results[key] = _read_all(hub.open(path, key))
+
+    threads = [threading.Thread(target=run, args=(key,)) for key in keys]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_all_consumers_receive_the_file(source_file):
+    hub = BroadcastHub(["a", "b", "c"], chunk_size=CHUNK, capacity=4, spill_timeout=5)
+    results = _read_in_threads(hub, source_file, ["a", "b", "c"])
+    expected = open(source_file, "rb").read()
+    assert results == {"a": expected, "b": expected, "c": expected}
+
+
+def test_lagging_consumer_spills_to_local_reread(source_file):
+    hub = BroadcastHub(["fast", "slow"], chunk_size=CHUNK, capacity=4, spill_timeout=0.1)
+    slow = hub.open(source_file, "slow")
+    started = time.monotonic()
+    fast_data = _read_all(hub.open(source_file, "fast"))
+    assert time.monotonic() - started < 5
+    # 慢的一方一直没有读取，被移出共享缓冲区后从本地文件续读，数据仍然完整
+    slow_data = _read_all(slow)
+    assert slow.spilled
+    expected = open(source_file, "rb").read()
+    assert fast_data == expected and slow_data == expected
+
+
+def test_consumer_that_never_opens_is_dropped(source_file):
+    hub = BroadcastHub(["a", "absent"], chunk_size=CHUNK, capacity=4, spill_timeout=0.1)
+    assert _read_all(hub.open(source_file, "a")) == open(source_file, "rb").read()
+
+
+def test_released_consumer_does_not_hold_the_stream(source_file):
+    hub = BroadcastHub(["a", "failed"], chunk_size=CHUNK, capacity=4, spill_timeout=30)
+    hub.release("failed")
+    started = time.monotonic()
+    _read_all(hub.open(source_file, "a"))
+    assert time.monotonic() - started < 5
+
+
+def test_skipped_consumer_does_not_hold_the_stream(source_file):
+    hub = BroadcastHub(["a", "b"], chunk_size=CHUNK, capacity=4, spill_timeout=30)
+    hub.skip(source_file, "b")
+    started = time.monotonic()
+    _read_all(hub.open(source_file, "a"))
+    assert time.monotonic() - started < 5
+
+
+def test_late_joiner_does_not_wait_for_consumers_past_the_file(source_file):
+    hub = BroadcastHub(["a", "b"], chunk_size=CHUNK, capacity=4, spill_timeout=30)
+    _read_in_threads(hub, source_file, ["a", "b"])
+    # a、b 仍在传输其它文件；后加入的 c 重新打开该文件时不应等待它们
+    hub.add_consumer("c")
+    started = time.monotonic()
+    assert _read_all(hub.open(source_file, "c")) == open(source_file, "rb").read()
+    assert time.monotonic() - started < 5
+
+
+def test_small_files_are_not_held_for_absent_consumers(tmp_path):
+    # 文件都小于环形缓冲区；"absent" 从不打开任何文件，文件读完后不应继续保留数据块
+    hub = BroadcastHub(["a", "absent"], chunk_size=CHUNK, capacity=8, spill_timeout=30)
+    readers = []
+    for i in range(50):
+        path = tmp_path / f"small-{i}.bin"
+        path.write_bytes(os.urandom(CHUNK * 3))
+        reader = hub.open(str(path), "a")
+        assert reader.read() and reader.read() and reader.read()
+        assert reader.read() == b""
+        readers.append(reader)
+        retained = sum(len(source.chunks) for source in list(hub._sources.values()))
+        assert retained <= 3 and hub.buffered <= 3 * CHUNK
+    for reader in readers:
+        reader.close()
+    assert hub.buffered == 0 and not hub._sources
+    # 迟到的服务器从本地重读，数据仍然完整
+    late = tmp_path / "small-0.bin"
+    assert _read_all(hub.open(str(late), "absent")) == late.read_bytes()
+
+
+def test_buffered_bytes_stay_within_budget(tmp_path):
+    # 多个文件同时被打开但读取很慢：合计缓存不超过 max_buffered (外加每个文件流至多一块)
+    hub = BroadcastHub(["a", "absent"], chunk_size=CHUNK, capacity=16, spill_timeout=30, max_buffered=8 * CHUNK)
+    readers = []
+    for i in range(4):
+        path = tmp_path / f"big-{i}.bin"
+        path.write_bytes(os.urandom(CHUNK * 40))
+        readers.append((hub.open(str(path), "a"), path.read_bytes()))
+    time.sleep(0.3)
+    assert hub.buffered <= 8 * CHUNK + 4 * CHUNK
+    for reader, expected in readers:
+        assert _read_all(reader) == expected
+    assert hub.buffered == 0
+
+
+def test_broadcast_distribution_to_two_servers(manager, server_config, tmp_path, ftp_root):
+    files = {f"f{i}.bin": os.urandom(CHUNK * (i + 1) * 50) for i in range(6)}
+    site = write_tree(tmp_path / "site", files)
+    manager.servers.append(FtpServerConfig(server_config.host, server_config.port, "tester", "secret",
+                                           name="mirror", remote_dir="/mirror"))
+    handle = manager.upload_to_all([str(site)], "/up", broadcast=True)
+    assert handle.wait(20)
+    assert all(task.result[0] for task in handle.tasks.values())
+    for remote in (ftp_root / "up" / "site", ftp_root / "mirror" / "site"):
+        assert {p.name: p.read_bytes() for p in remote.iterdir()} == files
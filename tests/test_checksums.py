@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import pytest
+
+from conftest import write_tree
+from src.core import checksums
+from src.core.checksums import ChecksumManifest, DigestCache, available_algorithms, local_digest, new_hasher
+
+DATA = b"checksum me " * 1000
+
+
+@pytest.mark.parametrize("algorithm, expected", [
+    ("sha256", hashlib.sha256(DATA).hexdigest()),
+    ("md5", hashlib.md5(DATA).hexdigest()),
+    ("crc32", f"{zlib.crc32(DATA):08x}"),
+])
+def test_new_hasher_streams_blocks(algorithm, expected):
+    hasher = new_hasher(algorithm)
+    for i in range(0, len(DATA), 777):
+        hasher.update(DATA[i:i + 777])
+    assert hasher.hexdigest() == expected
+
+
+def test_crc32_keeps_leading_zeros():
+    hasher = new_hasher("crc32")
+    assert hasher.hexdigest() == "00000000"
+    hasher.update(b"33")
+    assert hasher.hexdigest() == "0a6216d9"
+
+
+def test_xxh64_is_optional(monkeypatch):
+    monkeypatch.setattr(checksums, "xxhash", None)
+    assert available_algorithms() == ["sha256", "crc32"]
+    with pytest.raises(ValueError):
+        new_hasher("xxh64")
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+def test_digest_cache_computes_each_file_once(monkeypatch, local_file):
+    calls = []
+
+    def slow_digest(path, algorithm):
+        calls.append(path)
+        time.sleep(0.1)
+        return local_digest(path, algorithm)
+
+    monkeypatch.setattr(checksums, "local_digest", slow_digest)
+    cache = DigestCache()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(local_file, "sha256", len(DATA), 1.0)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [hashlib.sha256(DATA).hexdigest()] * 4
+    assert calls == [local_file]
+    # mtime 变化视为另一个文件版本
+    cache.get(local_file, "sha256", len(DATA), 2.0)
+    assert len(calls) == 2
+
+
+def test_claimed_digest_is_recorded_or_released(local_file):
+    cache = DigestCache()
+    assert cache.claim(local_file, "crc32", len(DATA), 1.0)
+    assert not cache.claim(local_file, "crc32", len(DATA), 1.0)
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(cache.get(local_file, "crc32", len(DATA), 1.0)))
+    thread.start()
+    time.sleep(0.05)
+    assert not waiter
+    cache.record(local_file, "crc32", len(DATA), 1.0, "cafebabe")
+    thread.join(5)
+    # 等待中的 get() 直接使用传输时算出的结果
+    assert waiter == ["cafebabe"] and cache.peek(local_file, "crc32", len(DATA), 1.0) == "cafebabe"
+
+    assert cache.claim(local_file, "sha256", len(DATA), 1.0)
+    cache.release(local_file, "sha256", len(DATA), 1.0)
+    assert cache.peek(local_file, "sha256", len(DATA), 1.0) is None
+    assert cache.get(local_file, "sha256", len(DATA), 1.0) == hashlib.sha256(DATA).hexdigest()
+
+
+def test_manifest_merges_servers_and_saves(data_dir):
+    manifest = ChecksumManifest("upload", "sha256")
+    manifest.add("/l/a.txt", 3, None, "s1", "/r/a.txt", "uploaded")
+    manifest.add("/l/a.txt", 3, "abc", "s2", "/r/a.txt", "skipped")
+    manifest.add("/l/b.txt", 5, None)
+    cache = DigestCache()
+    cache.record("/l/b.txt", "sha256", 5, 9.0, "def")
+    manifest.fill_digests(cache, {"/l/b.txt": 9.0})
+    assert manifest.digests() == {"/l/a.txt": "abc", "/l/b.txt": "def"}
+
+    path = manifest.save()
+    assert path.startswith(str(data_dir / "data" / "checksums")) and manifest.path == path
+    data = json.loads(open(path, encoding="utf-8").read())
+    assert data["kind"] == "upload" and data["algorithm"] == "sha256"
+    assert data["files"]["/l/a.txt"]["servers"] == {
+        "s1": {"remote_path": "/r/a.txt", "status": "uploaded"},
+        "s2": {"remote_path": "/r/a.txt", "status": "skipped"}}
+
+
+def test_digest_cache_evicts_least_recently_used():
+    cache = DigestCache(max_entries=2)
+    cache.record("/a", "crc32", 1, 1.0, "aaaaaaaa")
+    cache.record("/b", "crc32", 1, 1.0, "bbbbbbbb")
+    assert cache.peek("/a", "crc32", 1, 1.0) == "aaaaaaaa"
+    cache.record("/c", "crc32", 1, 1.0, "cccccccc")
+    # /b 最久未使用，被淘汰
+    assert cache.peek("/b", "crc32", 1, 1.0) is None
+    assert cache.peek("/a", "crc32", 1, 1.0) == "aaaaaaaa"
+    assert cache.peek("/c", "crc32", 1, 1.0) == "cccccccc"
+
+
+def test_manifest_save_keeps_recent_files(data_dir):
+    saved = []
+    for i in range(5):
+        manifest = ChecksumManifest("upload", "sha256")
+        manifest.add(f"/l/{i}.txt", i, None)
+        saved.append(manifest.save(keep=3))
+        # 按修改时间判断新旧；显式错开，避免文件系统时间戳精度不足
+        os.utime(saved[-1], (1_700_000_000 + i, 1_700_000_000 + i))
+    download = ChecksumManifest("download", "sha256").save(keep=3)
+    directory = data_dir / "data" / "checksums"
+    remaining = sorted(str(p) for p in directory.glob("*.json"))
+    # 每种清单分别保留最近 3 个
+    assert remaining == sorted(saved[2:] + [download])
+
+    explicit = ChecksumManifest("upload", "sha256").save(str(data_dir / "mine.json"), keep=1)
+    assert (data_dir / "mine.json").exists() and explicit not in remaining
+    assert len(list(directory.glob("upload-*.json"))) == 3
+
+
+def test_transfers_record_inline_digests(manager, server_config, tmp_path, ftp_root):
+    site = write_tree(tmp_path / "site", {"a.txt": DATA, "b.txt": b"b" * 10})
+    handle = manager.upload_to_all([str(site)], "/up")
+    assert handle.wait(10)
+    uploaded = manager.upload_checksums
+    assert uploaded.path is not None
+    assert uploaded.digests()[str(site / "a.txt")] == hashlib.sha256(DATA).hexdigest()
+    assert uploaded.files[str(site / "b.txt")]["servers"][server_config.server_id]["status"] == "uploaded"
+    # 上传时算出的摘要进入共享缓存，校验时不再读取文件
+    assert manager.digests.peek(str(site / "a.txt"), "sha256", len(DATA), (site / "a.txt").stat().st_mtime)
+
+    manager.checksum_algorithm = "crc32"
+    ok, message = manager.download_path(server_config, "/up/site/a.txt", str(tmp_path / "down"))
+    assert ok, message
+    downloaded = manager.download_checksums
+    assert downloaded.algorithm == "crc32"
+    assert downloaded.digests()[str(tmp_path / "down" / "a.txt")] == f"{zlib.crc32(DATA):08x}"
@@ -0,0 +1,115 @@
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import write_tree
+from src import cli
+
+
+@pytest.fixture
+def config_file(tmp_path, server_config):
+    second = server_config.to_dict()
+    second.update(name="mirror", id="mirror-01", remote_dir="/mirror")
+    path = tmp_path / "servers.json"
+    path.write_text(json.dumps([server_config.to_dict(), second]), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def run(capsys, config_file):
+    """运行 CLI，返回 (退出码, 按事件类型分组的 JSON 行)"""
+    def run(*argv):
+        code = cli.main(["--config", config_file, "--no-progress", *argv])
+        events = {}
+        for line in capsys.readouterr().out.splitlines():
+            event = json.loads(line)
+            events.setdefault(event["event"], []).append(event)
+        return code, events
+    return run
+
+
+def test_test_command(run):
+    code, events = run("test")
+    assert code == cli.EXIT_OK
+    assert [r["server"] for r in events["result"]] == ["local", "mirror"]
+    assert all(r["ok"] for r in events["result"])
+    assert events["summary"] == [{**events["summary"][0], "command": "test", "ok": True, "servers": 2, "failed": 0}]
+
+
+def test_distribute_verify_and_delta(run, tmp_path, ftp_root):
+    site = write_tree(tmp_path / "site", {"index.html": b"<html></html>", "css/app.css": b"body {}"})
+    code, events = run("distribute", str(site), "--verify", "--checksum", "crc32")
+    assert code == cli.EXIT_OK
+    for remote in (ftp_root / "site", ftp_root / "mirror" / "site"):
+        assert (remote / "css" / "app.css").read_bytes() == b"body {}"
+    assert all(r["verify"]["ok"] and r["metrics"]["bytes_done"] == 20 for r in events["result"])
+    assert events["checksums"][0]["algorithm"] == "crc32"
+
+    code, events = run("--server", "mirror", "distribute", str(site), "--delta")
+    assert code == cli.EXIT_OK
+    [result] = events["result"]
+    assert result["server_id"] == "mirror-01" and result["ok"]
+
+
+def test_list_download_delete(run, tmp_path, ftp_root):
+    write_tree(ftp_root / "docs", {"a.txt": b"aaa", "sub/b.txt": b"b"})
+    code, events = run("-s", "local", "list", "/docs")
+    assert code == cli.EXIT_OK
+    [result] = events["result"]
+    assert sorted((e["name"], e["type"]) for e in result["entries"]) == [("a.txt", "file"), ("sub", "dir")]
+
+    code, events = run("-s", "local", "download", "-r", "/docs", str(tmp_path / "down"))
+    assert code == cli.EXIT_OK
+    assert (tmp_path / "down" / "docs" / "sub" / "b.txt").read_bytes() == b"b"
+
+    code, events = run("-s", "local", "delete", "-r", "/docs")
+    assert code == cli.EXIT_OK
+    assert not (ftp_root / "docs").exists()
+
+
+def test_failed_operation_exits_1(run):
+    code, events = run("list", "/missing")
+    assert code == cli.EXIT_FAILED
+    assert not any(r["ok"] for r in events["result"])
+    assert events["summary"][0]["failed"] == 2
+
+
+@pytest.mark.parametrize("argv, message", [
+    (("-s", "nope", "test"), "No server matches 'nope'"),
+    (("download", "/a.txt"), "download needs exactly one server"),
+    (("distribute", "/no/such/path"), "Local path not found"),
+    (("distribute", ".", "--checksum", "md4"), "Unsupported checksum 'md4'"),
+])
+def test_usage_errors_exit_2(run, argv, message):
+    code, events = run(*argv)
+    assert code == cli.EXIT_USAGE
+    assert events["error"][0]["message"].startswith(message)
+
+
+def test_missing_config_and_bad_arguments(capsys, tmp_path):
+    assert cli.main(["--config", str(tmp_path / "none.json"), "test"]) == cli.EXIT_USAGE
+    assert "Config file not found" in capsys.readouterr().out
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["frobnicate"])
+    assert exc.value.code == cli.EXIT_USAGE
+
+
+def test_progress_events_are_rate_limited(server_config):
+    stream = io.StringIO()
+    out = cli.JsonEmitter(stream, interval=60)
+    for done in range(0, 101, 10):
+        out.progress(server_config, done, 100)
+    assert [json.loads(line)["done"] for line in stream.getvalue().splitlines()] == [0, 100]
+
+
+def test_import_does_not_load_transfer_modules():
+    code = ("import sys, src.cli; "
+            "loaded = [m for m in ('src.core.ftp_manager', 'ftplib') if m in sys.modules]; "
+            "print(','.join(loaded))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=str(Path(cli.__file__).parents[1]))
+    assert out.stdout.strip() == ""
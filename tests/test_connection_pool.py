@@ -0,0 +1,86 @@
+import ftplib
+import threading
+import time
+
+import pytest
+
+
+def test_session_is_reused(manager, server_config):
+    with manager.pool.session(server_config) as first:
+        pass
+    with manager.pool.session(server_config) as second:
+        assert second is first
+
+
+def test_reused_session_returns_to_home_dir(manager, server_config, ftp_root):
+    (ftp_root / "sub").mkdir()
+    with manager.pool.session(server_config) as ftp:
+        ftp.cwd("/sub")
+    with manager.pool.session(server_config) as ftp:
+        assert ftp.pwd() == "/"
+
+
+def test_checkout_waits_for_max_connections(manager, server_config):
+    server_config.max_connections = 1
+    with manager.pool.session(server_config):
+        with pytest.raises(TimeoutError):
+            manager.pool.checkout(server_config, timeout=0.2)
+
+
+def test_permission_error_keeps_session(manager, server_config):
+    with pytest.raises(ftplib.error_perm):
+        with manager.pool.session(server_config) as ftp:
+            ftp.cwd("/missing")
+    with manager.pool.session(server_config) as again:
+        assert again is ftp
+
+
+def test_stale_session_is_replaced(manager, server_config):
+    with manager.pool.session(server_config) as ftp:
+        pass
+    ftp.close()
+    with manager.pool.session(server_config) as fresh:
+        assert fresh is not ftp
+        assert fresh.pwd() == "/"
+
+
+def test_configs_with_same_login_share_a_pool(manager, server_config):
+    other = type(server_config).from_dict({**server_config.to_dict(), "id": "other", "remote_dir": "/x"})
+    with manager.pool.session(server_config) as first:
+        pass
+    with manager.pool.session(other) as second:
+        assert second is first
+
+
+def test_close_server_closes_leased_sessions_on_checkin(manager, server_config):
+    leased = manager.pool.checkout(server_config)
+    with manager.pool.session(server_config) as idle:
+        pass
+    with manager.pool.session(server_config) as ftp:
+        assert ftp is idle
+    try:
+        manager.pool.close_server(server_config)
+        assert idle.sock is None
+        # 借出中的会话继续可用，直到归还
+        assert leased.pwd() == "/"
+    finally:
+        manager.pool.checkin(server_config, leased)
+    assert leased.sock is None
+    with manager.pool.session(server_config) as fresh:
+        assert fresh is not leased
+
+
+def test_close_server_wakes_waiting_checkout(manager, server_config):
+    server_config.max_connections = 1
+    leased = manager.pool.checkout(server_config)
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(manager.pool.checkout(server_config, timeout=5)))
+    waiter.start()
+    time.sleep(0.1)
+    manager.pool.close_server(server_config)
+    waiter.join(5)
+    # 等待者改到新池中借出，不必等旧会话归还
+    assert result and result[0] is not leased
+    manager.pool.checkin(server_config, result[0])
+    manager.pool.checkin(server_config, leased)
+    assert leased.sock is None
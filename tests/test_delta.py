@@ -0,0 +1,99 @@
+import ftplib
+import os
+
+import pytest
+
+from conftest import write_tree
+from src.core.delta import DeltaPlanner, PushManifest
+
+
+def test_push_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = PushManifest(path)
+    manifest.record("/up/a.txt", 10, 1700000000.5)
+    manifest.save()
+    reloaded = PushManifest(path)
+    assert reloaded.is_unchanged("/up/a.txt", 10, 1700000000.5)
+    assert not reloaded.is_unchanged("/up/a.txt", 11, 1700000000.5)
+    assert not reloaded.is_unchanged("/up/a.txt", 10, 1700000001.0)
+    assert not reloaded.is_unchanged("/up/b.txt", 10, 1700000000.5)
+
+
+def test_corrupt_push_manifest_is_ignored(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json")
+    assert not PushManifest(str(path)).is_unchanged("/up/a.txt", 1, 1.0)
+
+
+@pytest.fixture
+def local_tree(tmp_path):
+    return write_tree(tmp_path / "local", {"a.txt": b"a" * 1000, "sub/b.txt": b"b" * 2000})
+
+
+def _distribute(manager, config, local_tree):
+    statuses = {}
+    paths = [str(local_tree / "a.txt"), str(local_tree / "sub")]
+    ok, message = manager.upload_paths_to_server(
+        config, paths, "/up", delta=True,
+        file_callback=lambda host, result: statuses.__setitem__(os.path.basename(result.local_path), result.status))
+    assert ok, message
+    return statuses
+
+
+def test_unchanged_files_are_skipped(manager, server_config, local_tree):
+    assert _distribute(manager, server_config, local_tree) == {"a.txt": "uploaded", "b.txt": "uploaded"}
+    assert _distribute(manager, server_config, local_tree) == {"a.txt": "skipped", "b.txt": "skipped"}
+
+
+def test_changed_local_file_is_uploaded(manager, server_config, local_tree, ftp_root):
+    _distribute(manager, server_config, local_tree)
+    (local_tree / "a.txt").write_bytes(b"changed")
+    assert _distribute(manager, server_config, local_tree) == {"a.txt": "uploaded", "b.txt": "skipped"}
+    assert (ftp_root / "up" / "a.txt").read_bytes() == b"changed"
+
+
+def test_manifest_hit_is_confirmed_on_the_server(manager, server_config, local_tree, ftp_root):
+    _distribute(manager, server_config, local_tree)
+    # 推送清单仍记录着这两个文件，但远端一个被删除、一个被截断
+    (ftp_root / "up" / "a.txt").unlink()
+    (ftp_root / "up" / "sub" / "b.txt").write_bytes(b"b" * 10)
+    assert _distribute(manager, server_config, local_tree) == {"a.txt": "uploaded", "b.txt": "uploaded"}
+    assert (ftp_root / "up" / "sub" / "b.txt").read_bytes() == b"b" * 2000
+
+
+def test_files_already_on_the_server_are_skipped_without_a_manifest(manager, server_config, local_tree, ftp_root):
+    write_tree(ftp_root / "up", {"a.txt": b"a" * 1000, "sub/b.txt": b"b" * 2000})
+    assert _distribute(manager, server_config, local_tree) == {"a.txt": "skipped", "b.txt": "skipped"}
+
+
+class _Job:
+    def __init__(self, remote_dir, name, size, mtime=0.0):
+        self.remote_dir, self.name, self.size, self.mtime = remote_dir, name, size, mtime
+        self.remote_path = f"{remote_dir}/{name}"
+
+
+def test_missing_remote_dir_keeps_mlsd(manager, server_config, tmp_path, ftp_root):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "a.txt").write_bytes(b"a" * 10)
+    planner = DeltaPlanner(server_config, PushManifest(str(tmp_path / "manifest.json")))
+    with manager.pool.session(server_config) as ftp:
+        # 目录不存在 (550) 视为空目录，不影响其它目录继续使用 MLSD
+        assert not planner.should_skip(ftp, _Job("/new", "a.txt", 10))
+        assert planner.should_skip(ftp, _Job("/up", "a.txt", 10))
+    assert planner._mlsd_supported and planner._listings["/new"] == {}
+
+
+def test_unsupported_mlsd_falls_back_to_size(manager, server_config, tmp_path, ftp_root):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "a.txt").write_bytes(b"a" * 10)
+    planner = DeltaPlanner(server_config, PushManifest(str(tmp_path / "manifest.json")))
+    with manager.pool.session(server_config) as ftp:
+        sendcmd = ftp.sendcmd
+
+        def reject_mlsd(cmd):
+            if cmd.startswith("MLSD"):
+                raise ftplib.error_perm("502 Not implemented")
+            return sendcmd(cmd)
+        ftp.sendcmd = reject_mlsd
+        assert planner.should_skip(ftp, _Job("/up", "a.txt", 10))
+    assert not planner._mlsd_supported
@@ -0,0 +1,66 @@
+import ftplib
+
+import pytest
+
+from conftest import write_tree
+from src.core.dir_delete import DeleteSummary, DirectoryDeleter
+
+
+@pytest.fixture
+def remote_tree(ftp_root):
+    write_tree(ftp_root / "site", {
+        "index.html": b"i",
+        "css/app.css": b"c",
+        "js/app.js": b"j",
+        "js/vendor/lib.js": b"l",
+        "js/vendor/deep/x.js": b"x",
+    })
+    (ftp_root / "site" / "empty").mkdir()
+    (ftp_root / "keep.txt").write_bytes(b"k")
+    return ftp_root / "site"
+
+
+def test_recursive_delete(manager, server_config, remote_tree, ftp_root):
+    progress = []
+    ok, message = manager.delete_path(server_config, "/site", is_dir=True, workers=3,
+                                      progress_callback=lambda host, done, total: progress.append((done, total)))
+    assert ok, message
+    assert "Deleted 5 files and 6 directories" in message
+    assert not remote_tree.exists()
+    assert (ftp_root / "keep.txt").exists()
+    assert progress[-1] == (11, 11)
+
+
+def test_delete_single_file(manager, server_config, ftp_root):
+    (ftp_root / "a.txt").write_bytes(b"a")
+    assert manager.delete_path(server_config, "/a.txt") == (True, "Delete Success")
+    assert not (ftp_root / "a.txt").exists()
+    ok, message = manager.delete_path(server_config, "/a.txt")
+    assert not ok
+
+
+def test_partial_failure_keeps_parents(monkeypatch, manager, server_config, remote_tree):
+    delete = ftplib.FTP.delete
+
+    def guarded(self, path):
+        if path.endswith("lib.js"):
+            raise ftplib.error_perm("550 Permission denied")
+        return delete(self, path)
+
+    monkeypatch.setattr(ftplib.FTP, "delete", guarded)
+    summary = DirectoryDeleter(manager.pool, server_config, workers=2).run("/site")
+    assert not summary.ok
+    assert summary.files_deleted == 4 and summary.failure_count == 1
+    assert summary.failures == [("/site/js/vendor/lib.js", "550 Permission denied")]
+    # lib.js 的各级目录保留，其余目录照常删除
+    assert summary.dirs_skipped == 3 and summary.dirs_deleted == 3
+    assert (remote_tree / "js" / "vendor" / "lib.js").exists()
+    assert not (remote_tree / "css").exists() and not (remote_tree / "js" / "vendor" / "deep").exists()
+
+
+def test_summary_truncates_failures():
+    summary = DeleteSummary("/site")
+    summary.failures = [(f"/site/{i}", "550") for i in range(2)]
+    summary.failure_count = 5
+    text = summary.describe()
+    assert "5 failed" in text and "... and 3 more" in text
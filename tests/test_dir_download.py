@@ -0,0 +1,44 @@
+from conftest import write_tree
+from src.core.dir_download import DirectoryDownloader
+
+TREE = {
+    "site/index.html": b"<html></html>",
+    "site/empty.txt": b"",
+    "site/css/app.css": b"body {}" * 100,
+    "site/js/vendor/lib.js": b"x" * 200_000,
+    "site/js/vendor/deep/more/data.bin": b"y" * 5000,
+}
+
+
+def _local_files(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+
+def test_download_directory_tree(manager, server_config, ftp_root, tmp_path):
+    write_tree(ftp_root, TREE)
+    (ftp_root / "site" / "empty_dir").mkdir()
+    ok, message = manager.download_path(server_config, "/site", str(tmp_path / "out"), is_dir=True, workers=3)
+    assert ok, message
+    assert _local_files(tmp_path / "out") == TREE
+    assert (tmp_path / "out" / "site" / "empty_dir").is_dir()
+
+
+def test_downloader_reports_totals(manager, server_config, ftp_root, tmp_path):
+    write_tree(ftp_root, TREE)
+    progress = []
+    downloader = DirectoryDownloader(manager.pool, server_config, workers=2,
+                                     progress_callback=lambda host, done, total: progress.append((done, total)))
+    downloader.run("/site", str(tmp_path / "out"))
+    total = sum(len(content) for content in TREE.values())
+    assert downloader.file_count == len(TREE)
+    assert downloader.total_size == downloader.downloaded_size == total
+    assert progress[-1] == (total, total)
+
+
+def test_skip_complete_keeps_existing_files(manager, server_config, ftp_root, tmp_path):
+    write_tree(ftp_root, TREE)
+    out = write_tree(tmp_path / "out", {"css/app.css": b"z" * len(TREE["site/css/app.css"])})
+    DirectoryDownloader(manager.pool, server_config, skip_complete=True).run("/site", str(out))
+    # 大小一致的本地文件在重试时不会重新下载
+    assert (out / "css" / "app.css").read_bytes() == b"z" * len(TREE["site/css/app.css"])
+    assert (out / "js" / "vendor" / "lib.js").read_bytes() == TREE["site/js/vendor/lib.js"]
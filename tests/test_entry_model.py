@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
+
+from src.core.listing import TYPE_DIR, TYPE_FILE, ListEntry
+from src.ui.entry_model import EntryStore, RemoteEntryModel, RemoteEntryProxyModel, format_size
+
+ENTRIES = [
+    ListEntry("b.txt", TYPE_FILE, 2048, 1700000000.0),
+    ListEntry("Zeta", TYPE_DIR, 0, None),
+    ListEntry("a.bin", TYPE_FILE, 10, 1600000000.0),
+    ListEntry("alpha", TYPE_DIR, 0, 1500000000.0),
+]
+
+
+@pytest.fixture(scope="module")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+def _names(model):
+    return [model.entry_at(row)[0] for row in range(model.rowCount())]
+
+
+def test_entry_store_columns():
+    store = EntryStore()
+    for entry in ENTRIES:
+        store.append(entry)
+    assert len(store) == 4
+    assert list(store.sizes) == [2048, 0, 10, 0]
+    assert store.format_mtime(0) == "2023-11-14 22:13:20"
+    assert store.format_mtime(1) == ""
+
+
+def test_format_size():
+    assert format_size(10) == "10 B"
+    assert format_size(2048) == "2.0 KB"
+    assert format_size(5 * 1024 * 1024) == "5.0 MB"
+
+
+def test_directories_sort_first(qapp):
+    model = RemoteEntryModel()
+    model.set_entries(ENTRIES)
+    assert _names(model) == ["alpha", "Zeta", "a.bin", "b.txt"]
+    model.sort(1, Qt.SortOrder.DescendingOrder)
+    assert _names(model) == ["Zeta", "alpha", "b.txt", "a.bin"]
+    model.sort(3, Qt.SortOrder.AscendingOrder)
+    assert _names(model) == ["Zeta", "alpha", "a.bin", "b.txt"]
+
+
+def test_display_data(qapp):
+    model = RemoteEntryModel()
+    model.set_entries(ENTRIES)
+    assert model.data(model.index(2, 1)) == "10 B"
+    assert model.data(model.index(0, 1)) == ""
+    assert model.data(model.index(0, 2)) == "文件夹"
+    assert model.data(model.index(0, 0), RemoteEntryModel.TypeRole) == "dir"
+
+
+def test_streamed_batches_append_rows(qapp):
+    model = RemoteEntryModel()
+    model.append_entries(ENTRIES[:2])
+    model.append_entries(ENTRIES[2:])
+    assert _names(model) == ["b.txt", "Zeta", "a.bin", "alpha"]
+    model.clear()
+    assert model.rowCount() == 0
+
+
+def test_proxy_filters_by_name(qapp):
+    model = RemoteEntryModel()
+    model.set_entries(ENTRIES)
+    proxy = RemoteEntryProxyModel()
+    proxy.setSourceModel(model)
+    proxy.set_name_filter("  A ")
+    assert [proxy.entry_at(row) for row in range(proxy.rowCount())] == \
+           [("alpha", True), ("Zeta", True), ("a.bin", False)]
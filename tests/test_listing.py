@@ -0,0 +1,164 @@
+import calendar
+import ftplib
+import threading
+
+import pytest
+
+from src.core.listing import (TYPE_DIR, TYPE_FILE, TYPE_LINK, DirectoryLister, mlst, parse_ftp_time,
+                              parse_list_line, parse_mlsd_line)
+
+NOW = calendar.timegm((2024, 3, 1, 0, 0, 0))
+
+
+def _ts(*parts):
+    return float(calendar.timegm(parts + (0,) * (6 - len(parts))))
+
+
+@pytest.mark.parametrize("line, name, type, size, mtime", [
+    ("drwxr-xr-x   2 owner group   4096 Jan 31 12:34 www", "www", TYPE_DIR, 4096, _ts(2024, 1, 31, 12, 34)),
+    ("-rw-r--r--   1 owner group    123 Dec 31 23:59 last year.txt", "last year.txt", TYPE_FILE, 123,
+     _ts(2023, 12, 31, 23, 59)),
+    ("-rw-r--r--   1 owner group 5000000000 Jun  5  2019 big.iso", "big.iso", TYPE_FILE, 5000000000,
+     _ts(2019, 6, 5)),
+    ("-rw-r--r--   1 owner    10 Feb  2 10:00  leading space", " leading space", TYPE_FILE, 10,
+     _ts(2024, 2, 2, 10)),
+    ("lrwxrwxrwx   1 owner group     11 Jan  1  2020 current -> releases/42", "current", TYPE_LINK, 11,
+     _ts(2020, 1, 1)),
+    ("-rw-r--r--+  1 owner group      7 Mar  1 00:00 acl.txt", "acl.txt", TYPE_FILE, 7, _ts(2024, 3, 1)),
+    ("01-31-24  12:34PM       <DIR>          My Documents", "My Documents", TYPE_DIR, -1,
+     _ts(2024, 1, 31, 12, 34)),
+    ("01-31-2024  12:05AM          1234 report 2024.pdf", "report 2024.pdf", TYPE_FILE, 1234,
+     _ts(2024, 1, 31, 0, 5)),
+    ("12-25-99  23:59          42 old.txt", "old.txt", TYPE_FILE, 42, _ts(1999, 12, 25, 23, 59)),
+])
+def test_parse_list_line(line, name, type, size, mtime):
+    entry = parse_list_line(line, NOW)
+    assert (entry.name, entry.type, entry.size, entry.mtime) == (name, type, size, mtime)
+
+
+@pytest.mark.parametrize("line", [
+    "total 42",
+    "drwxr-xr-x   2 owner group   4096 Jan 31 12:34 .",
+    "drwxr-xr-x   2 owner group   4096 Jan 31 12:34 ..",
+    "01-31-24  12:34PM       <DIR>          ..",
+    "garbage",
+    "",
+])
+def test_parse_list_line_ignores_other_lines(line):
+    assert parse_list_line(line, NOW) is None
+
+
+@pytest.mark.parametrize("line, name, type, size, mtime", [
+    ("type=file;size=123;modify=20240131123456; a file.txt", "a file.txt", TYPE_FILE, 123,
+     _ts(2024, 1, 31, 12, 34, 56)),
+    ("Type=DIR;Modify=20240131123456.5;UNIX.mode=0755; www", "www", TYPE_DIR, -1, _ts(2024, 1, 31, 12, 34, 56) + 0.5),
+    ("type=OS.unix=slink:/target;size=6; link", "link", TYPE_LINK, 6, None),
+    ("size=10;type=file; noterm", "noterm", TYPE_FILE, 10, None),
+    ("type=file;sizd=99;modify=bogus; odd", "odd", TYPE_FILE, 99, None),
+    ("unique=1;perm=r; untyped", "untyped", TYPE_FILE, -1, None),
+])
+def test_parse_mlsd_line(line, name, type, size, mtime):
+    entry = parse_mlsd_line(line)
+    assert (entry.name, entry.type, entry.size, entry.mtime) == (name, type, size, mtime)
+
+
+@pytest.mark.parametrize("line", ["type=cdir; .", "type=pdir; ..", "type=dir; .", "type=cdir; /home", "nospace"])
+def test_parse_mlsd_line_skips_self_and_parent(line):
+    assert parse_mlsd_line(line) is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("20240131123456", _ts(2024, 1, 31, 12, 34, 56)),
+    ("20240131123456.250", _ts(2024, 1, 31, 12, 34, 56) + 0.25),
+    ("19700101000000", 0.0),
+    ("20241301000000", None),
+    ("20240131250000", None),
+    ("2024013112", None),
+    ("", None),
+    ("abcdefghijklmn", None),
+])
+def test_parse_ftp_time(value, expected):
+    assert parse_ftp_time(value) == expected
+
+
+@pytest.fixture
+def ftp(manager, server_config, ftp_root):
+    (ftp_root / "docs").mkdir()
+    (ftp_root / "docs" / "a b.txt").write_bytes(b"12345")
+    (ftp_root / "docs" / "sub").mkdir()
+    with manager.pool.session(server_config) as ftp:
+        yield ftp
+
+
+def _reject_mlsd(ftp, reply):
+    sendcmd = ftp.sendcmd
+
+    def guarded(cmd):
+        if cmd.upper().startswith("MLSD"):
+            raise ftplib.error_perm(reply)
+        return sendcmd(cmd)
+    ftp.sendcmd = guarded
+
+
+def test_lister_uses_mlsd(ftp):
+    lister = DirectoryLister("local")
+    entries = {e.name: e for e in lister.list(ftp, "/docs")}
+    assert lister.mlsd_supported
+    assert entries["a b.txt"].size == 5 and entries["sub"].is_dir
+    assert entries["a b.txt"].mtime is not None
+
+
+@pytest.mark.parametrize("code", ["500", "501", "502", "504"])
+def test_lister_falls_back_to_list(ftp, code):
+    _reject_mlsd(ftp, f"{code} Command not understood")
+    ftp.cwd("/docs/sub")
+    lister = DirectoryLister("local")
+    seen = []
+    entries = lister.list(ftp, "/docs", on_entry=seen.append)
+    assert not lister.mlsd_supported
+    # LIST 需要切换目录，列出后恢复原工作目录
+    assert ftp.pwd() == "/docs/sub"
+    assert sorted((e.name, e.type) for e in entries) == [("a b.txt", TYPE_FILE), ("sub", TYPE_DIR)]
+    assert entries[0].size == 5
+    assert seen == entries
+
+
+def test_lister_propagates_550(ftp):
+    _reject_mlsd(ftp, "550 No such directory")
+    lister = DirectoryLister("local")
+    with pytest.raises(ftplib.error_perm, match="550"):
+        lister.list(ftp, "/missing")
+    assert lister.mlsd_supported
+
+
+@pytest.mark.parametrize("code", [None, "502"])
+def test_cancel_aborts_listing_midway(ftp, ftp_root, code):
+    if code:
+        _reject_mlsd(ftp, f"{code} Command not understood")
+    big = ftp_root / "big"
+    big.mkdir()
+    for i in range(5000):
+        (big / f"file-with-a-long-name-{i:05d}.txt").touch()
+    cancel = threading.Event()
+    seen = []
+
+    def on_entry(entry):
+        seen.append(entry)
+        if len(seen) == 10:
+            cancel.set()
+
+    entries = DirectoryLister("local").list(ftp, "/big", on_entry=on_entry, cancel_event=cancel)
+    # 每行都检查取消：不会先收完整个列表再返回
+    assert len(entries) == 10
+    assert ftp.pwd() == "/"
+    # 中止传输的应答已读掉，会话仍可继续使用
+    assert [e.name for e in DirectoryLister("local").list(ftp, "/docs")] == ["a b.txt", "sub"]
+
+
+def test_mlst_single_path(ftp):
+    entry = mlst(ftp, "/docs")
+    assert entry.is_dir
+    entry = mlst(ftp, "/docs/a b.txt")
+    assert entry.type == TYPE_FILE and entry.size == 5
+    with pytest.raises(ftplib.error_perm):
+        mlst(ftp, "/missing")
@@ -0,0 +1,75 @@
+import time
+
+from src.core.ftp_manager import FtpServerConfig
+from src.core.listing import TYPE_FILE, ListEntry
+from src.core.listing_cache import ListingCache, normalize_remote_path
+
+CONFIG = FtpServerConfig("ftp.example.com", 21, "user", "pw")
+OTHER = FtpServerConfig("ftp.example.org", 21, "user", "pw")
+
+
+def _entries(*names):
+    return [ListEntry(name, TYPE_FILE, 1, None) for name in names]
+
+
+def test_normalize_remote_path():
+    assert normalize_remote_path("/a//b/") == "/a/b"
+    assert normalize_remote_path("/a/./b/../c") == "/a/c"
+    assert normalize_remote_path("") == "/"
+    assert normalize_remote_path("\\win\\dir") == "/win/dir"
+
+
+def test_get_returns_entries_by_normalized_path():
+    cache = ListingCache()
+    cache.put(CONFIG, "/a/b/", _entries("x"))
+    assert [e.name for e in cache.get(CONFIG, "/a//b")] == ["x"]
+    assert cache.get(OTHER, "/a/b") is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ListingCache(ttl=0.05)
+    cache.put(CONFIG, "/a", _entries("x"))
+    time.sleep(0.1)
+    assert cache.get(CONFIG, "/a") is None
+
+
+def test_item_limit_evicts_least_recently_used():
+    cache = ListingCache(max_items=4)
+    cache.put(CONFIG, "/a", _entries("1", "2"))
+    cache.put(CONFIG, "/b", _entries("3", "4"))
+    cache.get(CONFIG, "/a")
+    cache.put(CONFIG, "/c", _entries("5"))
+    assert cache.get(CONFIG, "/b") is None
+    assert cache.get(CONFIG, "/a") is not None and cache.get(CONFIG, "/c") is not None
+
+
+def test_invalidate_clears_subtree_and_ancestors():
+    cache = ListingCache()
+    for path in ("/", "/a", "/a/b", "/a/b/c", "/a/bc", "/d"):
+        cache.put(CONFIG, path, _entries("x"))
+    cache.put(OTHER, "/a/b", _entries("x"))
+    cache.invalidate(CONFIG, "/a/b")
+    assert [p for p in ("/", "/a", "/a/b", "/a/b/c", "/a/bc", "/d") if cache.get(CONFIG, p)] == ["/a/bc", "/d"]
+    assert cache.get(OTHER, "/a/b") is not None
+
+
+def test_list_directory_uses_cache_until_refresh(manager, server_config, ftp_root):
+    (ftp_root / "dir").mkdir()
+    (ftp_root / "dir" / "a.txt").write_bytes(b"a")
+    ok, items, path = manager.list_directory(server_config, "/dir")
+    assert ok and path == "/dir" and [e.name for e in items] == ["a.txt"]
+
+    (ftp_root / "dir" / "b.txt").write_bytes(b"b")
+    assert [e.name for e in manager.list_directory(server_config, "/dir")[1]] == ["a.txt"]
+    assert sorted(e.name for e in manager.list_directory(server_config, "/dir", use_cache=False)[1]) == \
+           ["a.txt", "b.txt"]
+
+
+def test_upload_invalidates_listing(manager, server_config, ftp_root, tmp_path):
+    (ftp_root / "up").mkdir()
+    assert manager.list_directory(server_config, "/up")[1] == []
+    local_file = tmp_path / "new.txt"
+    local_file.write_bytes(b"new")
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_file)], "/up")
+    assert ok, message
+    assert [e.name for e in manager.list_directory(server_config, "/up")[1]] == ["new.txt"]
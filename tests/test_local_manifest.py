@@ -0,0 +1,57 @@
+import os
+
+from conftest import write_tree
+from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.core.local_manifest import LocalManifest
+
+
+def test_scan_orders_files_and_directories(tmp_path):
+    site = write_tree(tmp_path / "site", {
+        "a.txt": b"a" * 10,
+        "big.bin": b"b" * 1000,
+        "sub/c.txt": b"c" * 10,
+        "sub/deep/d.txt": b"d" * 500,
+    })
+    (site / "empty").mkdir()
+    single = write_tree(tmp_path, {"single.txt": b"s" * 20}) / "single.txt"
+
+    manifest = LocalManifest.scan([str(site), str(single), str(tmp_path / "missing")])
+    assert len(manifest) == 5
+    assert manifest.total_size == 1540
+    # 大文件优先；同大小的文件保持扫描顺序
+    assert [f.size for f in manifest.files] == sorted((f.size for f in manifest.files), reverse=True)
+    assert {f.rel_path for f in manifest.files} == {
+        "site/a.txt", "site/big.bin", "site/sub/c.txt", "site/sub/deep/d.txt", "single.txt"}
+    # 父目录总在子目录之前，空目录也要创建
+    assert set(manifest.dirs) == {"site", "site/sub", "site/sub/deep", "site/empty"}
+    assert manifest.dirs.index("site/sub") < manifest.dirs.index("site/sub/deep")
+    top = next(f for f in manifest.files if f.name == "single.txt")
+    assert top.rel_dir == "" and top.local_path == os.path.normpath(str(single))
+    assert top.mtime == os.stat(single).st_mtime
+
+
+def test_manifest_jobs_map_to_remote_directories(tmp_path):
+    site = write_tree(tmp_path / "site", {"a.txt": b"a", "sub/b.txt": b"bb"})
+    single = write_tree(tmp_path, {"top.txt": b"t"}) / "top.txt"
+    jobs = FtpManager._manifest_jobs(LocalManifest.scan([str(site), str(single)]), "/www/")
+    assert {job.remote_path for job in jobs} == {"/www/site/a.txt", "/www/site/sub/b.txt", "/www/top.txt"}
+
+
+def test_distribution_scans_once_for_all_servers(monkeypatch, manager, server_config, tmp_path, ftp_root):
+    site = write_tree(tmp_path / "site", {"a.txt": b"a" * 100, "sub/b.txt": b"b" * 200})
+    scans = []
+    scan = LocalManifest.scan.__func__
+
+    def counting_scan(cls, local_paths):
+        scans.append(list(local_paths))
+        return scan(cls, local_paths)
+
+    monkeypatch.setattr(LocalManifest, "scan", classmethod(counting_scan))
+    second = FtpServerConfig(server_config.host, server_config.port, "tester", "secret",
+                             name="second", remote_dir="/mirror")
+    manager.servers.append(second)
+    handle = manager.upload_to_all([str(site)], "/up")
+    assert handle.wait(10)
+    assert all(task.result[0] for task in handle.tasks.values())
+    assert len(scans) == 1
+    assert (ftp_root / "up" / "site" / "sub" / "b.txt").read_bytes() == b"b" * 200
@@ -0,0 +1,66 @@
+import json
+import time
+
+from src.core.ftp_manager import FtpServerConfig
+from src.core.metrics import PHASE_TRANSFER, MetricsRegistry, TransferMetrics
+
+CONFIG = FtpServerConfig("ftp.example.com", 21, "user", "pw", name="web-01")
+
+
+def test_rate_and_eta_from_samples(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    metrics = TransferMetrics(CONFIG)
+    metrics.update(0, 1000)
+    metrics.snapshot()
+    clock[0] += 1.0
+    metrics.update(100, 1000)
+    snapshot = metrics.snapshot()
+    assert snapshot["rate"] == 100.0
+    assert snapshot["eta"] == 9.0
+    # 采样间隔过短时沿用上一次的速率
+    clock[0] += 0.1
+    metrics.update(500, 1000)
+    assert metrics.snapshot()["rate"] == 100.0
+
+
+def test_finished_transfer_has_no_eta():
+    metrics = TransferMetrics(CONFIG)
+    metrics.update(10, 100)
+    metrics.finish(False, "boom")
+    snapshot = metrics.snapshot()
+    assert snapshot["eta"] == 0.0 and snapshot["rate"] == 0.0
+    assert snapshot["success"] is False and snapshot["message"] == "boom"
+
+
+def test_phases_and_files_are_recorded():
+    metrics = TransferMetrics(CONFIG)
+    with metrics.phase(PHASE_TRANSFER):
+        time.sleep(0.01)
+    metrics.add_time("connect", 0.5)
+    metrics.record_file("/up/a.txt", 10, "uploaded", 100.0, 101.5)
+    data = metrics.to_dict()
+    assert data["phases"]["transfer"] > 0 and data["phases"]["connect"] == 0.5
+    assert data["files"] == [{"path": "/up/a.txt", "size": 10, "status": "uploaded",
+                              "started": 100.0, "finished": 101.5, "seconds": 1.5}]
+
+
+def test_registry_export(tmp_path):
+    registry = MetricsRegistry()
+    registry.start(CONFIG).update(5, 10)
+    path = tmp_path / "metrics.json"
+    registry.export_json(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert [s["server_id"] for s in data["servers"]] == [CONFIG.server_id]
+    assert data["servers"][0]["bytes_done"] == 5
+
+
+def test_upload_records_per_file_timing(manager, server_config, tmp_path):
+    local_file = tmp_path / "a.txt"
+    local_file.write_bytes(b"a" * 1000)
+    metrics = TransferMetrics(server_config)
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_file)], "/up", metrics=metrics)
+    assert ok, message
+    snapshot = metrics.snapshot()
+    assert snapshot["bytes_done"] == snapshot["bytes_total"] == 1000
+    assert snapshot["success"] and snapshot["file_count"] == 1
@@ -0,0 +1,78 @@
+import logging
+import os
+import re
+
+import pytest
+
+from src.core import modez
+
+DATA = b"".join(b"line %06d: the quick brown fox jumps over the lazy dog\n" % i for i in range(20_000))
+
+
+@pytest.fixture
+def server_log(caplog):
+    caplog.set_level(logging.INFO, logger="src.utils.modez_server")
+
+    def transfers(verb):
+        """替身服务器记录的 (原始字节数, 线上字节数, 模式)"""
+        found = []
+        for record in caplog.records:
+            match = re.match(rf"{verb} \S+: (\d+) bytes, (\d+) on the wire \((MODE \w)", record.getMessage())
+            if match:
+                found.append((int(match.group(1)), int(match.group(2)), match.group(3)))
+        return found
+    return transfers
+
+
+def test_enable_mode_z_follows_feat(manager, server_config):
+    with manager.pool.session(server_config) as ftp:
+        assert modez.has_feature(ftp, "MODE Z") and modez.has_feature(ftp, "MLST")
+        assert not modez.has_feature(ftp, "HASH")
+        assert modez.enable_mode_z(ftp, 9) and modez.is_mode_z(ftp)
+        modez.disable_mode_z(ftp)
+        assert not modez.is_mode_z(ftp)
+        # 未声明 MODE Z 的服务器保持 MODE S，不发送 MODE 命令
+        modez.server_features(ftp).discard("MODE Z")
+        assert not modez.enable_mode_z(ftp)
+        assert not modez.is_mode_z(ftp)
+
+
+def test_pool_returns_sessions_in_mode_s(manager, server_config):
+    with manager.pool.session(server_config) as ftp:
+        modez.enable_mode_z(ftp)
+        first = ftp
+    with manager.pool.session(server_config) as ftp:
+        assert ftp is first
+        assert not modez.is_mode_z(ftp)
+
+
+def test_compressed_upload(manager, server_config, tmp_path, ftp_root, server_log):
+    server_config.mode_z = True
+    local_file = tmp_path / "log.txt"
+    local_file.write_bytes(DATA)
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_file)], "/up")
+    assert ok, message
+    assert (ftp_root / "up" / "log.txt").read_bytes() == DATA
+    [(payload, wire, mode)] = server_log("STOR")
+    assert mode == "MODE Z" and payload == len(DATA) and wire < len(DATA) // 10
+
+
+def test_compressed_download(manager, server_config, tmp_path, ftp_root, server_log):
+    server_config.mode_z = True
+    (ftp_root / "log.txt").write_bytes(DATA)
+    (ftp_root / "random.bin").write_bytes(os.urandom(50_000))
+    for name in ("log.txt", "random.bin"):
+        ok, message = manager.download_path(server_config, f"/{name}", str(tmp_path / "down"))
+        assert ok, message
+        assert (tmp_path / "down" / name).read_bytes() == (ftp_root / name).read_bytes()
+    transfers = server_log("RETR")
+    assert [mode for _, _, mode in transfers] == ["MODE Z", "MODE Z"]
+    assert transfers[0][1] < len(DATA) // 10
+
+
+def test_uncompressed_by_default(manager, server_config, tmp_path, ftp_root, server_log):
+    local_file = tmp_path / "log.txt"
+    local_file.write_bytes(DATA)
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_file)], "/up")
+    assert ok, message
+    assert server_log("STOR") == [(len(DATA), len(DATA), "MODE S")]
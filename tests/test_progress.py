@@ -0,0 +1,70 @@
+import time
+
+from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.core.progress import ProgressAggregator
+
+
+def test_flush_reports_only_changed_counters():
+    calls = []
+    aggregator = ProgressAggregator(lambda key, done, total: calls.append((key, done, total)))
+    aggregator.update("a", 10, 100)
+    aggregator.add("a", 5)
+    aggregator.set_total("b", 50)
+    aggregator.flush()
+    assert sorted(calls) == [("a", 15, 100), ("b", 0, 50)]
+    calls.clear()
+    aggregator.flush()
+    assert calls == []
+    aggregator.add("b", 1)
+    aggregator.flush()
+    assert calls == [("b", 1, 50)]
+
+
+def test_background_flush_coalesces_updates():
+    calls = []
+    aggregator = ProgressAggregator(lambda key, done, total: calls.append(done), interval=0.05).start()
+    for _ in range(10_000):
+        aggregator.add("a", 1)
+    time.sleep(0.2)
+    aggregator.close()
+    assert calls[-1] == 10_000
+    assert len(calls) < 100
+
+
+def test_failing_callback_does_not_stop_flushing():
+    calls = []
+
+    def callback(key, done, total):
+        calls.append(key)
+        raise RuntimeError("ui gone")
+
+    aggregator = ProgressAggregator(callback)
+    aggregator.add("a", 1)
+    aggregator.add("b", 1)
+    aggregator.flush()
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_server_id_is_stable_without_id_in_config():
+    data = [{"host": "h1", "port": 21, "username": "u"}, {"host": "h1", "port": 21, "username": "u"},
+            {"host": "h2", "id": "fixed"}]
+    first, second = FtpManager(), FtpManager()
+    try:
+        assert first.load_servers(data)
+        second.load_servers(data)
+        ids = [s.server_id for s in first.servers]
+        assert ids == [s.server_id for s in second.servers]
+        assert len(set(ids)) == 3 and ids[2] == "fixed"
+        # 写回配置后再加载，ID 不变且不再需要写回
+        assert not second.load_servers(first.get_servers_as_dicts())
+        assert [s.server_id for s in second.servers] == ids
+    finally:
+        first.close()
+        second.close()
+
+
+def test_derived_id_depends_on_connection_target():
+    base = FtpServerConfig("h", 21, "u", "pw")
+    assert FtpServerConfig("h", 21, "u", "other-pw").server_id == base.server_id
+    assert FtpServerConfig("h", 2121, "u", "pw").server_id != base.server_id
+    assert FtpServerConfig("h", 21, "u", "pw", remote_dir="/www").server_id != base.server_id
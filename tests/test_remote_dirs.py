@@ -0,0 +1,90 @@
+import ftplib
+
+import pytest
+
+from conftest import write_tree
+from src.core.remote_dirs import RemoteDirPlanner, resolve_remote_dir
+
+
+class _Recorder:
+    """包装 ftp 会话，记录 MKD 与列举命令"""
+
+    def __init__(self, ftp):
+        self.ftp = ftp
+        self.commands = []
+        self._sendcmd = ftp.sendcmd
+        self._voidcmd = ftp.voidcmd
+        ftp.sendcmd = self.sendcmd
+        ftp.voidcmd = self.voidcmd
+
+    def sendcmd(self, cmd):
+        self.commands.append(cmd)
+        return self._sendcmd(cmd)
+
+    def voidcmd(self, cmd):
+        self.commands.append(cmd)
+        return self._voidcmd(cmd)
+
+    def named(self, verb):
+        return [c.split(" ", 1)[1] for c in self.commands if c.upper().startswith(verb + " ")]
+
+
+@pytest.fixture
+def ftp(manager, server_config):
+    with manager.pool.session(server_config) as ftp:
+        yield ftp
+
+
+def test_resolve_remote_dir(ftp):
+    assert resolve_remote_dir(ftp, "") == "/"
+    assert resolve_remote_dir(ftp, "/") == "/"
+    assert resolve_remote_dir(ftp, "www\\site/") == "/www/site"
+    assert resolve_remote_dir(ftp, "/a//b/./c") == "/a/b/c"
+
+
+def test_plan_creates_only_missing_dirs(ftp, ftp_root):
+    (ftp_root / "www" / "site" / "css").mkdir(parents=True)
+    planner = RemoteDirPlanner("/www/site", ["site-root", "css", "css/img", "js", "js/lib"])
+    assert planner.plan(ftp) == ["/www/site/site-root", "/www/site/css/img", "/www/site/js", "/www/site/js/lib"]
+
+    recorder = _Recorder(ftp)
+    assert planner.ensure(ftp) == 4
+    assert recorder.named("MKD") == ["/www/site/site-root", "/www/site/css/img", "/www/site/js", "/www/site/js/lib"]
+    assert (ftp_root / "www" / "site" / "js" / "lib").is_dir()
+    # 全部存在后不再创建任何目录
+    assert planner.ensure(ftp) == 0
+
+
+def test_missing_parent_is_not_listed(ftp, ftp_root):
+    recorder = _Recorder(ftp)
+    planner = RemoteDirPlanner("/new", ["a", "a/b", "a/b/c"])
+    assert planner.ensure(ftp) == 4
+    # 只列举了根目录；/new 不存在，其下的目录直接判定为缺失
+    listed = [c for c in recorder.commands if c.split(" ", 1)[0].upper() in ("MLSD", "LIST")]
+    assert [c.split(" ", 1)[-1] for c in listed] == ["/"]
+    assert (ftp_root / "new" / "a" / "b" / "c").is_dir()
+
+
+def test_unlistable_dir_is_probed(monkeypatch, ftp, ftp_root):
+    (ftp_root / "locked" / "existing").mkdir(parents=True)
+    planner = RemoteDirPlanner("/locked", ["existing", "fresh"])
+    iter_entries = planner._lister.iter
+
+    def deny(ftp, path):
+        if path == "/locked":
+            raise ftplib.error_perm("550 Permission denied")
+        return iter_entries(ftp, path)
+
+    monkeypatch.setattr(planner._lister, "iter", deny)
+    assert planner.plan(ftp) == ["/locked/existing", "/locked/fresh"]
+    assert planner.ensure(ftp) == 1
+    assert (ftp_root / "locked" / "fresh").is_dir()
+
+
+def test_upload_into_nested_dirs(manager, server_config, tmp_path, ftp_root):
+    (ftp_root / "deploy").mkdir()
+    site = write_tree(tmp_path / "site", {"a/b/c/deep.txt": b"deep", "a/top.txt": b"top"})
+    ok, message = manager.upload_paths_to_server(server_config, [str(site)], "deploy/releases")
+    assert ok, message
+    assert (ftp_root / "deploy" / "releases" / "site" / "a" / "b" / "c" / "deep.txt").read_bytes() == b"deep"
+    assert (ftp_root / "deploy" / "releases" / "site" / "a" / "top.txt").read_bytes() == b"top"
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from conftest import write_tree
+from src.core.listing import TYPE_DIR, TYPE_FILE, ListEntry
+from src.core.remote_index import RemoteIndex, server_key
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RemoteIndex(str(tmp_path / "index.db"))
+    yield index
+    index.close()
+
+
+def _crawl(index, server, listings):
+    """按 {目录: [ListEntry]} 模拟一次完整爬取，返回 crawl id"""
+    crawl_id = index.begin_crawl(server, "/")
+    for path, entries in listings.items():
+        index.apply_listing(server, crawl_id, path, None, entries)
+    index.commit()
+    index.finish_crawl(crawl_id)
+    return crawl_id
+
+
+def test_search_supports_substrings_and_wildcards(index):
+    _crawl(index, "s", {
+        "/": [ListEntry("www", TYPE_DIR), ListEntry("README.md", TYPE_FILE, 10)],
+        "/www": [ListEntry("index.html", TYPE_FILE, 5), ListEntry("app_v2.js", TYPE_FILE, 7),
+                 ListEntry("appXv2.js", TYPE_FILE, 8)],
+    })
+    assert [e.name for e in index.search("s", "INDEX")] == ["/www/index.html"]
+    assert [e.name for e in index.search("s", "*.js")] == ["/www/appXv2.js", "/www/app_v2.js"]
+    # 不含通配符时 _ 按字面匹配
+    assert [e.name for e in index.search("s", "app_")] == ["/www/app_v2.js"]
+    assert [e.name for e in index.search("s", "app?v2*")] == ["/www/appXv2.js", "/www/app_v2.js"]
+    assert index.search("s", "  ") == [] and index.search("other", "index") == []
+    assert index.search("s", "*", limit=2)[1].name == "/www"
+
+
+def test_changes_between_crawls(index):
+    first = _crawl(index, "s", {
+        "/": [ListEntry("a.txt", TYPE_FILE, 1), ListEntry("old", TYPE_DIR), ListEntry("b.txt", TYPE_FILE, 2)],
+        "/old": [ListEntry("x.txt", TYPE_FILE, 3)],
+    })
+    changes = index.changes("s")
+    assert changes.since == 0 and changes.since_time is None
+    assert len(changes.added) == 4 and not changes.modified and not changes.removed
+
+    _crawl(index, "s", {"/": [ListEntry("a.txt", TYPE_FILE, 1), ListEntry("b.txt", TYPE_FILE, 20),
+                              ListEntry("c.txt", TYPE_FILE, 3)]})
+    changes = index.changes("s")
+    assert changes.since == first and changes.since_time is not None
+    assert [e.name for e in changes.added] == ["/c.txt"]
+    assert [(e.name, e.size) for e in changes.modified] == [("/b.txt", 20)]
+    # 目录连同其内容一并移除，只记录目录本身
+    assert changes.removed == [("/old", TYPE_DIR)]
+    assert index.search("s", "x.txt") == []
+    assert changes.describe() == "1 added, 1 modified, 1 removed"
+    assert len(index.changes("s", since=0).added) == 3
+
+
+def _set_mtime(path, stamp):
+    os.utime(path, (stamp, stamp))
+
+
+def test_index_server_incremental_crawl(manager, server_config, ftp_root):
+    write_tree(ftp_root, {"www/index.html": b"i", "www/css/app.css": b"c", "docs/guide.txt": b"g"})
+    for i, rel in enumerate(("", "www", "www/css", "docs")):
+        _set_mtime(ftp_root / rel, 1_600_000_000 + i)
+
+    ok, message = manager.index_server(server_config)
+    assert ok, message
+    assert "listed 4 directories, 0 unchanged" in message
+    key = server_key(server_config)
+    assert [e.name for e in manager.search_index(server_config, "*.css")] == ["/www/css/app.css"]
+
+    # 修改 docs 并更新其 mtime；www 及其子目录 mtime 不变，不会重新列举
+    (ftp_root / "docs" / "guide.txt").unlink()
+    (ftp_root / "docs" / "new.txt").write_bytes(b"n")
+    _set_mtime(ftp_root / "docs", 1_700_000_000)
+    progress = []
+    ok, message = manager.index_server(server_config, progress_callback=lambda host, done, known:
+                                       progress.append((done, known)))
+    assert ok, message
+    assert "listed 1 directories, 3 unchanged" in message
+    assert progress[-1] == (4, 4)
+    changes = manager.index_changes(server_config)
+    assert [e.name for e in changes.added] == ["/docs/new.txt"]
+    assert changes.removed == [("/docs/guide.txt", TYPE_FILE)]
+    assert [e.name for e in changes.modified] == ["/docs"]
+    assert manager.remote_index.last_crawl(key)[0] == changes.since + 1
+
+    ok, message = manager.index_server(server_config, full=True)
+    assert ok and "listed 4 directories, 0 unchanged" in message
+
+
+def test_index_server_reports_failures(manager, server_config):
+    ok, message = manager.index_server(server_config, root="/missing")
+    assert not ok
+    assert "1 directories failed" in message and "/missing" in message
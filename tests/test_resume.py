@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from src.core.ftp_manager import UploadJob
+
+SIZE = 512 * 1024
+
+
+@pytest.fixture
+def local_file(tmp_path):
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(SIZE))
+    return path
+
+
+def _upload(manager, config, local_file):
+    results = []
+    ok, message = manager.upload_paths_to_server(config, [str(local_file)], "/up", resume=True,
+                                                 file_callback=lambda host, result: results.append(result))
+    assert ok, message
+    return results[0]
+
+
+def test_partial_remote_file_is_resumed(manager, server_config, local_file, ftp_root):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "big.bin").write_bytes(local_file.read_bytes()[:100_000])
+    result = _upload(manager, server_config, local_file)
+    assert result.status == "resumed"
+    assert result.offset == 100_000
+    assert (ftp_root / "up" / "big.bin").read_bytes() == local_file.read_bytes()
+
+
+def test_complete_remote_file_is_not_sent_again(manager, server_config, local_file, ftp_root):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "big.bin").write_bytes(local_file.read_bytes())
+    assert _upload(manager, server_config, local_file).status == "complete"
+
+
+def test_larger_remote_file_is_overwritten(manager, server_config, local_file, ftp_root):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "big.bin").write_bytes(b"z" * (SIZE + 1))
+    assert _upload(manager, server_config, local_file).status == "uploaded"
+    assert (ftp_root / "up" / "big.bin").read_bytes() == local_file.read_bytes()
+
+
+@pytest.mark.parametrize("resume", [True, False])
+def test_failed_attempt_rolls_back_its_progress(manager, server_config, local_file, ftp_root, resume):
+    (ftp_root / "up").mkdir()
+    (ftp_root / "up" / "big.bin").write_bytes(local_file.read_bytes()[:100_000])
+    job = UploadJob(str(local_file), "/up", "big.bin", SIZE, local_file.stat().st_mtime)
+    progress = []
+
+    with pytest.raises(ConnectionResetError):
+        with manager.pool.session(server_config) as ftp:
+            ftp.voidcmd("TYPE I")
+            storbinary = ftp.storbinary
+
+            def failing_storbinary(cmd, fp, blocksize=8192, callback=None, rest=None):
+                sent = 0
+
+                def on_block(block):
+                    nonlocal sent
+                    callback(block)
+                    sent += len(block)
+                    if sent >= 128 * 1024:
+                        raise ConnectionResetError("connection dropped mid-transfer")
+                return storbinary(cmd, fp, blocksize, on_block, rest=rest)
+
+            ftp.storbinary = failing_storbinary
+            manager._upload_file(ftp, server_config, job, lambda block: progress.append(len(block)),
+                                 progress.append, resume=resume)
+    # 已计入的续传偏移与已发送的字节都要扣回，整体进度不会虚高
+    assert sum(progress) == 0
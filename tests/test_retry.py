@@ -0,0 +1,158 @@
+import errno
+import ftplib
+import socket
+import threading
+
+import pytest
+
+from src.core.ftp_manager import FtpManager, FtpServerConfig
+from src.core.retry import (FAILURE_4XX, FAILURE_5XX, FAILURE_CONNECT, FAILURE_LOGIN, FAILURE_TRANSFER,
+                            CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError, ConnectError, LoginError,
+                            RetryPolicy, build_policies, call_with_retry, classify_failure)
+
+NO_DELAY = {name: {"delay": 0} for name in (FAILURE_CONNECT, FAILURE_LOGIN, FAILURE_TRANSFER, FAILURE_4XX)}
+
+
+@pytest.mark.parametrize("exc, failure", [
+    (ConnectError("refused"), FAILURE_CONNECT),
+    (LoginError("530"), FAILURE_LOGIN),
+    (ftplib.error_temp("421 busy"), FAILURE_4XX),
+    (ftplib.error_perm("553 denied"), FAILURE_5XX),
+    (EOFError(), FAILURE_TRANSFER),
+    (ConnectionResetError(errno.ECONNRESET, "reset"), FAILURE_TRANSFER),
+    (socket.timeout("timed out"), FAILURE_TRANSFER),
+    (FileNotFoundError(errno.ENOENT, "missing"), None),
+    (CircuitOpenError("open"), None),
+    (ValueError("bug"), None),
+])
+def test_classify_failure(exc, failure):
+    assert classify_failure(exc) == failure
+
+
+def test_backoff_grows_exponentially_with_cap():
+    policy = RetryPolicy(retries=5, delay=1.0, multiplier=2.0, max_delay=3.0)
+    assert 0.8 <= policy.backoff(1) <= 1.2
+    assert 1.6 <= policy.backoff(2) <= 2.4
+    assert 2.4 <= policy.backoff(5) <= 3.6
+
+
+def test_build_policies_merges_overrides():
+    policies = build_policies({FAILURE_TRANSFER: {"retries": 7}})
+    assert policies[FAILURE_TRANSFER].retries == 7
+    assert policies[FAILURE_TRANSFER].delay == 1.0
+    assert policies[FAILURE_5XX].retries == 0
+
+
+def test_retries_until_success_and_counts_attempts():
+    attempts, retries = [], []
+
+    def flaky(attempt):
+        attempts.append(attempt)
+        if attempt < 2:
+            raise ConnectionResetError("reset")
+        return "ok"
+
+    result = call_with_retry(flaky, build_policies(NO_DELAY),
+                             on_retry=lambda exc, failure, retry, delay: retries.append((failure, retry)))
+    assert result == "ok"
+    assert attempts == [0, 1, 2]
+    assert retries == [(FAILURE_TRANSFER, 1), (FAILURE_TRANSFER, 2)]
+
+
+def test_retry_budget_is_per_failure_class():
+    policies = build_policies({**NO_DELAY, FAILURE_TRANSFER: {"retries": 1, "delay": 0}})
+    errors = iter([EOFError(), ftplib.error_temp("421"), EOFError()])
+
+    def fn(attempt):
+        raise next(errors)
+
+    with pytest.raises(EOFError):
+        call_with_retry(fn, policies)
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    def fn(attempt):
+        calls.append(attempt)
+        raise ftplib.error_perm("550 denied")
+
+    with pytest.raises(ftplib.error_perm):
+        call_with_retry(fn, build_policies(NO_DELAY))
+    assert calls == [0]
+
+
+def test_retryable_predicate_and_cancel():
+    calls = []
+
+    def fn(attempt):
+        calls.append(attempt)
+        raise EOFError()
+
+    with pytest.raises(EOFError):
+        call_with_retry(fn, build_policies(NO_DELAY), retryable=lambda exc: False)
+    assert calls == [0]
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(EOFError):
+        call_with_retry(fn, build_policies(), cancel_event=cancel)
+    assert calls == [0, 0]
+
+
+def test_circuit_breaker_state_transitions(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("src.core.retry.time.monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+
+    breaker.before_connect("h")
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_connect("h")
+
+    # 冷却结束后只放行一个试探连接
+    clock[0] += 10
+    breaker.before_connect("h")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_connect("h")
+    # 试探失败：重新打开并重新计时
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_connect("h")
+    clock[0] += 10
+    breaker.before_connect("h")
+    breaker.record_success()
+    assert not breaker.is_open
+    breaker.before_connect("h")
+    breaker.before_connect("h")
+
+
+def test_registry_shares_breakers_per_host_and_port():
+    registry = CircuitBreakerRegistry(threshold=1, cooldown=60)
+    a = FtpServerConfig("h", 21, "u1", "pw")
+    b = FtpServerConfig("h", 21, "u2", "pw")
+    c = FtpServerConfig("h", 2121, "u1", "pw")
+    assert registry.get(a) is registry.get(b)
+    assert registry.get(a) is not registry.get(c)
+    registry.get(a).record_failure()
+    assert registry.get(b).is_open
+    registry.reset(b)
+    assert not registry.get(a).is_open
+
+
+def test_unreachable_host_trips_the_breaker():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    manager = FtpManager(breaker_threshold=1, breaker_cooldown=60)
+    config = FtpServerConfig("127.0.0.1", port, "u", "pw")
+    try:
+        with pytest.raises(ConnectError):
+            manager._get_ftp_connection(config, timeout=2)
+        with pytest.raises(CircuitOpenError):
+            manager._get_ftp_connection(config, timeout=2)
+    finally:
+        manager.close()
@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from src.core.scheduler import CANCELLED, DONE, TransferScheduler
+
+
+class _Probe:
+    """记录任务的开始顺序与各分组的最大并发 (按 weight 计)"""
+
+    def __init__(self):
+        self.order = []
+        self.load = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+
+    def task(self, key, group="all", weight=1, seconds=0.05, gate=None):
+        def run():
+            with self.lock:
+                self.order.append(key)
+                self.load[group] = self.load.get(group, 0) + weight
+                self.peak[group] = max(self.peak.get(group, 0), self.load[group])
+            if gate is not None:
+                gate.wait(5)
+            time.sleep(seconds)
+            with self.lock:
+                self.load[group] -= weight
+            return key
+        return run
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = TransferScheduler(max_concurrent=2, per_host_limit=8)
+    yield scheduler
+    scheduler.close()
+
+
+def test_higher_priority_starts_first():
+    scheduler = TransferScheduler(max_concurrent=1, per_host_limit=8)
+    probe = _Probe()
+    gate = threading.Event()
+    handle = scheduler.new_job()
+    # 先占住唯一的工作线程，其余任务排队后按优先级开始，同优先级按提交顺序
+    scheduler.submit(handle, "blocker", "h0", probe.task("blocker", gate=gate))
+    deadline = time.monotonic() + 5
+    while not probe.order and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for key, priority in (("low", 0), ("canary", 10), ("mid", 5), ("low-2", 0)):
+        scheduler.submit(handle, key, f"host-{key}", probe.task(key), priority=priority)
+    handle.seal()
+    gate.set()
+    assert handle.wait(5)
+    assert probe.order == ["blocker", "canary", "mid", "low", "low-2"]
+    scheduler.close()
+
+
+def test_global_concurrency_is_bounded(scheduler):
+    probe = _Probe()
+    handle = scheduler.new_job()
+    for i in range(6):
+        scheduler.submit(handle, f"t{i}", f"host-{i}", probe.task(f"t{i}"))
+    handle.seal()
+    assert handle.wait(5)
+    assert probe.peak["all"] == 2
+    assert handle.counts()[DONE] == 6
+    assert {task.result for task in handle.tasks.values()} == {f"t{i}" for i in range(6)}
+
+
+def test_per_host_limit_counts_weights():
+    scheduler = TransferScheduler(max_concurrent=8, per_host_limit=4)
+    probe = _Probe()
+    handle = scheduler.new_job()
+    for i in range(4):
+        scheduler.submit(handle, f"same-{i}", "shared", probe.task(f"same-{i}", "shared", weight=2), weight=2)
+    scheduler.submit(handle, "other", "elsewhere", probe.task("other", "elsewhere", weight=2), weight=2)
+    handle.seal()
+    assert handle.wait(5)
+    assert probe.peak["shared"] == 4
+    scheduler.close()
+
+
+def test_pool_limit_caps_configs_sharing_a_pool():
+    scheduler = TransferScheduler(max_concurrent=8, per_host_limit=8)
+    probe = _Probe()
+    handle = scheduler.new_job()
+    for i in range(3):
+        scheduler.submit(handle, f"cfg-{i}", "host", probe.task(f"cfg-{i}", "pool", weight=2), weight=2,
+                         pool_key="account", pool_limit=2)
+    handle.seal()
+    assert handle.wait(5)
+    assert probe.peak["pool"] == 2
+    scheduler.close()
+
+
+def test_oversized_task_runs_when_host_is_idle():
+    scheduler = TransferScheduler(max_concurrent=2, per_host_limit=2)
+    handle = scheduler.new_job()
+    scheduler.submit(handle, "big", "host", lambda: "ok", weight=10)
+    handle.seal()
+    assert handle.wait(5)
+    assert handle.tasks["big"].result == "ok"
+    scheduler.close()
+
+
+def test_cancel_skips_pending_tasks(scheduler):
+    gate = threading.Event()
+    finished = []
+    handle = scheduler.new_job()
+    handle.on_task_done(lambda task: finished.append((task.key, task.state)))
+    started = threading.Semaphore(0)
+
+    def running():
+        started.release()
+        gate.wait(5)
+
+    for i in range(2):
+        scheduler.submit(handle, f"running-{i}", f"h{i}", running)
+    scheduler.submit(handle, "queued", "h3", lambda: None)
+    handle.seal()
+    # 两个工作线程都已占用后再取消，只有排队中的任务被跳过
+    for _ in range(2):
+        assert started.acquire(timeout=5)
+    handle.cancel()
+    gate.set()
+    assert handle.wait(5)
+    assert ("queued", CANCELLED) in finished
+    assert handle.counts()[CANCELLED] == 1
+
+
+def test_failed_task_keeps_its_error(scheduler):
+    done = []
+    handle = scheduler.new_job()
+    handle.on_all_done(lambda h: done.append(h))
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.submit(handle, "bad", "h", fail)
+    handle.seal()
+    assert handle.wait(5)
+    assert isinstance(handle.tasks["bad"].error, RuntimeError)
+    assert done == [handle]
+
+
+def test_manager_admits_configs_by_shared_pool():
+    from src.core.ftp_manager import FtpManager, FtpServerConfig
+    manager = FtpManager(max_parallel_servers=4, per_host_limit=16)
+    try:
+        a = FtpServerConfig("h", 21, "u", "pw", remote_dir="/a", max_connections=3, upload_workers=3)
+        b = FtpServerConfig("h", 21, "u", "pw", remote_dir="/b", max_connections=2, upload_workers=2)
+        c = FtpServerConfig("h", 21, "other", "pw", max_connections=4, upload_workers=4)
+        manager.servers = [a, b, c]
+        handle = manager.scheduler.new_job()
+        gate = threading.Event()
+        tasks = [manager._submit_server(handle, config, lambda: gate.wait(5)) for config in (a, b, c)]
+        handle.seal()
+        assert manager.scheduler.max_concurrent == 4 and manager.scheduler.per_host_limit == 16
+        assert [(t.weight, t.pool_limit) for t in tasks] == [(3, 2), (2, 2), (4, 4)]
+        assert tasks[0].pool_key == tasks[1].pool_key != tasks[2].pool_key
+        gate.set()
+        assert handle.wait(5)
+    finally:
+        manager.close()
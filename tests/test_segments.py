@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+from src.core import segments
+from src.core.segments import SegmentMap, download_segmented
+from src.utils import modez_server
+
+SIZE = 300_001
+
+
+@pytest.fixture
+def remote_file(ftp_root):
+    data = os.urandom(SIZE)
+    (ftp_root / "big.bin").write_bytes(data)
+    return data
+
+
+def test_plan_covers_the_whole_file():
+    seg_map = SegmentMap.plan("local.bin", "/big.bin", SIZE, 4)
+    assert len(seg_map.segments) == 4
+    assert seg_map.segments[0].start == 0 and seg_map.segments[-1].end == SIZE
+    assert all(a.end == b.start for a, b in zip(seg_map.segments, seg_map.segments[1:]))
+
+
+def test_segment_map_round_trip(tmp_path):
+    local_file = str(tmp_path / "big.bin")
+    with open(local_file, "wb") as f:
+        f.truncate(SIZE)
+    seg_map = SegmentMap.plan(local_file, "/big.bin", SIZE, 3)
+    seg_map.segments[1].done = 1234
+    seg_map.save()
+
+    loaded = SegmentMap.load(local_file, "/big.bin", SIZE)
+    assert [(s.start, s.end, s.done) for s in loaded.segments] == \
+           [(s.start, s.end, s.done) for s in seg_map.segments]
+    assert loaded.downloaded == 1234 and not loaded.complete
+    # 远端文件或大小变了，旧记录作废
+    assert SegmentMap.load(local_file, "/other.bin", SIZE) is None
+    assert SegmentMap.load(local_file, "/big.bin", SIZE + 1) is None
+    seg_map.remove()
+    assert SegmentMap.load(local_file, "/big.bin", SIZE) is None
+
+
+def test_download_segmented(manager, server_config, remote_file, tmp_path):
+    local_file = str(tmp_path / "big.bin")
+    progress = []
+    with manager.pool.session(server_config) as ftp:
+        download_segmented(manager.pool, server_config, ftp, "/big.bin", local_file, SIZE, 4,
+                           lambda host, done, total: progress.append(done))
+    assert open(local_file, "rb").read() == remote_file
+    assert max(progress) == SIZE
+    assert not os.path.exists(local_file + SegmentMap.SUFFIX)
+
+
+def test_download_segmented_resumes_from_segment_map(manager, server_config, remote_file, tmp_path):
+    local_file = str(tmp_path / "big.bin")
+    seg_map = SegmentMap.plan(local_file, "/big.bin", SIZE, 3)
+    first = seg_map.segments[0]
+    with open(local_file, "wb") as f:
+        f.truncate(SIZE)
+        f.write(remote_file[:first.end])
+    first.done = first.end - first.start
+    seg_map.save()
+
+    progress = []
+    with manager.pool.session(server_config) as ftp:
+        download_segmented(manager.pool, server_config, ftp, "/big.bin", local_file, SIZE, 3,
+                           lambda host, done, total: progress.append(done))
+    assert open(local_file, "rb").read() == remote_file
+    # 进度从已完成的字节数开始累计
+    assert min(progress) > first.end
+
+
+def test_download_path_uses_segments_for_large_files(monkeypatch, manager, server_config, remote_file, tmp_path):
+    monkeypatch.setattr(segments, "SEGMENTED_MIN_FILE_SIZE", 100_000)
+    monkeypatch.setattr(segments, "SEGMENT_MIN_SIZE", 50_000)
+    ok, message = manager.download_path(server_config, "/big.bin", str(tmp_path))
+    assert ok, message
+    assert (tmp_path / "big.bin").read_bytes() == remote_file
+    entry = manager.download_checksums.files[str(tmp_path / "big.bin")]
+    assert entry["servers"][server_config.server_id]["status"] == "segmented"
+
+
+@pytest.fixture
+def no_rest(monkeypatch):
+    """让替身服务器拒绝 REST 命令"""
+    dispatch = modez_server._Session.dispatch
+
+    def refuse_rest(self, cmd, arg):
+        if cmd == "REST":
+            self.reply("502 REST not implemented")
+            return None
+        return dispatch(self, cmd, arg)
+
+    monkeypatch.setattr(modez_server._Session, "dispatch", refuse_rest)
+
+
+def test_segment_zero_does_not_send_rest(manager, server_config, remote_file, tmp_path, no_rest):
+    local_file = str(tmp_path / "big.bin")
+    seg_map = SegmentMap.plan(local_file, "/big.bin", SIZE, 1)
+    with open(local_file, "wb") as f:
+        f.truncate(SIZE)
+    with manager.pool.session(server_config) as ftp:
+        segments._fetch_segment(ftp, seg_map, seg_map.segments[0], lambda n: None)
+    assert open(local_file, "rb").read() == remote_file
+
+
+def test_rest_refusal_is_reported_as_rest_not_supported(manager, server_config, remote_file, tmp_path, no_rest):
+    with manager.pool.session(server_config) as ftp:
+        with pytest.raises(segments.RestNotSupported):
+            download_segmented(manager.pool, server_config, ftp, "/big.bin", str(tmp_path / "big.bin"), SIZE, 4)
+
+
+def test_download_falls_back_to_single_stream_without_rest(monkeypatch, manager, server_config, remote_file,
+                                                           tmp_path, no_rest):
+    monkeypatch.setattr(segments, "SEGMENTED_MIN_FILE_SIZE", 100_000)
+    monkeypatch.setattr(segments, "SEGMENT_MIN_SIZE", 50_000)
+    ok, message = manager.download_path(server_config, "/big.bin", str(tmp_path))
+    assert ok, message
+    assert (tmp_path / "big.bin").read_bytes() == remote_file
+    assert not (tmp_path / ("big.bin" + SegmentMap.SUFFIX)).exists()
+    entry = manager.download_checksums.files[str(tmp_path / "big.bin")]
+    assert entry["servers"][server_config.server_id]["status"] == "downloaded"
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from src.core.ftp_manager import FtpServerConfig
+
+
+@pytest.fixture
+def dialog_class():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    pytest.importorskip("PyQt6.QtWidgets")
+    from PyQt6.QtWidgets import QApplication
+    # 对话框需要 QApplication 在用例期间一直存在
+    app = QApplication.instance() or QApplication([])
+    from src.ui.server_dialog import ServerDialog
+    yield ServerDialog
+    del app
+
+
+def test_download_workers_round_trip(dialog_class):
+    config = FtpServerConfig("example.com", 21, "user", "pw", enabled=False, upload_workers=2, download_workers=7)
+    dlg = dialog_class(None, config.to_dict())
+    assert dlg.download_workers_edit.text() == "7"
+    dlg.accept_data()
+    restored = FtpServerConfig.from_dict(dlg.get_data())
+    assert restored.download_workers == 7 and restored.upload_workers == 2
+    assert restored.enabled is False
+
+
+def test_download_workers_is_at_least_one(dialog_class):
+    dlg = dialog_class(None, {"host": "example.com"})
+    assert dlg.download_workers_edit.text() == "3"
+    dlg.download_workers_edit.setText("0")
+    dlg.accept_data()
+    assert dlg.get_data()["download_workers"] == 1
@@ -0,0 +1,67 @@
+import logging
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.utils import startup
+
+ROOT = Path(startup.__file__).parents[2]
+
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """每个用例从未开启、未报告的状态开始"""
+    monkeypatch.setattr(startup, "_enabled", False)
+    monkeypatch.setattr(startup, "_reported", False)
+    monkeypatch.setattr(startup, "_marks", [])
+    return startup
+
+
+def test_disabled_profile_records_nothing(fresh, caplog):
+    caplog.set_level(logging.INFO, logger="src.utils.startup")
+    fresh.mark("import PyQt6.QtWidgets")
+    fresh.report()
+    assert fresh._marks == [] and caplog.records == []
+
+
+def test_marks_are_kept_in_order(fresh):
+    fresh.enable()
+    for label in ("import PyQt6.QtWidgets", "import main_window", "show window"):
+        fresh.mark(label)
+    labels = [label for label, _, _ in fresh._marks]
+    assert labels == ["entry point started", "import PyQt6.QtWidgets", "import main_window", "show window"]
+    stamps = [at for _, at, _ in fresh._marks]
+    assert stamps == sorted(stamps)
+
+
+def test_report_is_logged_once(fresh, caplog):
+    caplog.set_level(logging.INFO, logger="src.utils.startup")
+    fresh.enable()
+    fresh.mark("construct MainWindow")
+    fresh.report()
+    fresh.report()
+    [record] = caplog.records
+    lines = record.getMessage().splitlines()
+    assert lines[0].startswith("Startup profile")
+    assert lines[1].endswith("entry point started") and lines[2].endswith("construct MainWindow")
+
+
+@pytest.mark.parametrize("flag", [True, False])
+def test_main_accepts_profile_flag(flag):
+    pytest.importorskip("PyQt6.QtWidgets")
+    # 只执行 main.py 的模块级代码 (参数处理与导入)，不启动事件循环
+    code = ("import runpy, sys; sys.argv = sys.argv[1:]; runpy.run_path('src/main.py'); "
+            "from src.utils import startup; "
+            "print(startup._enabled, [m[0] for m in startup._marks], sys.argv[1:])")
+    argv = ["main.py", "--profile-startup", "extra"] if flag else ["main.py", "extra"]
+    env = {**os.environ, "QT_QPA_PLATFORM": "offscreen"}
+    out = subprocess.run([sys.executable, "-c", code, *argv], capture_output=True, text=True, check=True,
+                         cwd=str(ROOT), env=env)
+    if flag:
+        expected = "True ['entry point started', 'import PyQt6.QtWidgets', 'import main_window'] ['extra']"
+    else:
+        expected = "False [] ['extra']"
+    assert out.stdout.strip() == expected
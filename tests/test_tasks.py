@@ -0,0 +1,66 @@
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def big_dir(ftp_root):
+    path = ftp_root / "big"
+    path.mkdir()
+    for i in range(1200):
+        (path / f"f{i:04d}.txt").write_bytes(b"x")
+    return path
+
+
+def test_listing_streams_batches(manager, server_config, big_dir):
+    batches = []
+    ok, items, path = manager.list_directory(server_config, "/big", batch_callback=batches.append)
+    assert ok and path == "/big"
+    assert [len(batch) for batch in batches] == [500, 500, 200]
+    assert sorted(e.name for batch in batches for e in batch) == [e.name for e in items]
+
+
+def test_cancelled_listing_is_not_cached(manager, server_config, big_dir):
+    cancel = threading.Event()
+
+    def on_batch(batch):
+        cancel.set()
+
+    assert manager.list_directory(server_config, "/big", batch_callback=on_batch, cancel_event=cancel) == \
+        (False, [], "Cancelled")
+    assert manager.listing_cache.get(server_config, "/big") is None
+    ok, items, _ = manager.list_directory(server_config, "/big")
+    assert ok and len(items) == 1200
+
+
+@pytest.fixture
+def qt():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    pytest.importorskip("PyQt6.QtWidgets")
+    from PyQt6.QtWidgets import QApplication
+    QApplication.instance() or QApplication([])
+    from src.ui.tasks import FtpTask
+    return FtpTask
+
+
+def test_task_emits_result(qt):
+    results = []
+    task = qt(lambda a, b=0: (True, a + b), 1, b=2)
+    task.signals.finished.connect(results.append)
+    task.run()
+    assert results == [(True, 3)]
+
+
+def test_task_reports_exceptions_as_failure(qt):
+    def boom():
+        raise RuntimeError("lost connection")
+
+    results = []
+    task = qt(boom)
+    task.signals.finished.connect(results.append)
+    task.run()
+    assert results == [(False, "lost connection")]
+    assert not task.cancel_event.is_set()
+    task.cancel()
+    assert task.cancel_event.is_set()
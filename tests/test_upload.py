@@ -0,0 +1,66 @@
+import pytest
+
+from conftest import write_tree
+from src.core.metrics import TransferMetrics
+
+
+@pytest.fixture
+def local_tree(tmp_path):
+    return write_tree(tmp_path / "local" / "site", {
+        "index.html": b"<html></html>" * 100,
+        "css/app.css": b"body {}" * 50,
+        "js/app.js": b"x" * 300_000,
+        "js/vendor/lib.js": b"y" * 70_000,
+        "empty.txt": b"",
+    })
+
+
+def _remote_files(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+
+def test_upload_tree_over_parallel_sessions(manager, server_config, local_tree, ftp_root):
+    server_config.upload_workers = 3
+    results = []
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_tree)], "/up",
+                                                 file_callback=lambda host, result: results.append(result))
+    assert ok, message
+    assert len(results) == 5
+    assert _remote_files(ftp_root / "up") == {f"site/{k}": v for k, v in _remote_files(local_tree).items()}
+
+
+def test_parallel_progress_arrives_in_order(manager, server_config, local_tree):
+    server_config.upload_workers = 3
+    progress = []
+    metrics = TransferMetrics(server_config)
+    ok, message = manager.upload_paths_to_server(server_config, [str(local_tree)], "/up", metrics=metrics,
+                                                 progress_callback=lambda host, done, total: progress.append(done))
+    assert ok, message
+    assert progress == sorted(progress)
+    assert metrics.bytes_done == progress[-1]
+
+
+def _short_checkout(monkeypatch, manager):
+    checkout = manager.pool.checkout
+    monkeypatch.setattr(manager.pool, "checkout",
+                        lambda config, timeout=30: checkout(config, timeout=min(timeout, 0.5)))
+
+
+def test_surplus_workers_exit_when_pool_is_busy(monkeypatch, manager, server_config, local_tree, ftp_root):
+    # 另一个任务占用了两条会话中的一条：多出来的 worker 借不到会话时退出，不算失败
+    server_config.max_connections = 2
+    server_config.upload_workers = 2
+    _short_checkout(monkeypatch, manager)
+    with manager.pool.session(server_config):
+        ok, message = manager.upload_paths_to_server(server_config, [str(local_tree)], "/up")
+    assert ok, message
+    assert len(_remote_files(ftp_root / "up")) == 5
+
+
+def test_upload_fails_when_no_session_is_available(monkeypatch, manager, server_config, local_tree):
+    server_config.max_connections = 1
+    server_config.retry_policies = {"transfer": {"retries": 0}}
+    _short_checkout(monkeypatch, manager)
+    with manager.pool.session(server_config):
+        ok, message = manager.upload_paths_to_server(server_config, [str(local_tree)], "/up")
+    assert not ok
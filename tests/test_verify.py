@@ -0,0 +1,127 @@
+import ftplib
+import hashlib
+import socket
+
+import pytest
+
+from conftest import write_tree
+from src.core import verify
+from src.core.ftp_manager import FtpServerConfig
+from src.core.verify import METHOD_HASH, METHOD_SIZE, METHOD_XMD5, _parse_digest, choose_method
+
+SHA256_ABC = hashlib.sha256(b"abc").hexdigest()
+
+
+class _FeatSession:
+    """只有 FEAT 结果与 OPTS 记录的假会话"""
+
+    def __init__(self, features, reject_opts=()):
+        self.ftptool_features = set(features)
+        self.reject_opts = reject_opts
+        self.commands = []
+
+    def voidcmd(self, cmd):
+        self.commands.append(cmd)
+        if cmd in self.reject_opts:
+            raise ftplib.error_perm("501 Unsupported")
+        return "200 OK"
+
+
+@pytest.mark.parametrize("features, rejected, method, algorithm, commands", [
+    ({"HASH SHA-1;SHA-256*;MD5"}, (), METHOD_HASH, "sha256", []),
+    ({"HASH SHA-1*;SHA-256;MD5"}, (), METHOD_HASH, "sha256", ["OPTS HASH SHA-256"]),
+    ({"HASH SHA-1*;SHA-256;MD5"}, ("OPTS HASH SHA-256",), METHOD_HASH, "sha1", ["OPTS HASH SHA-256"]),
+    ({"XCRC", "XMD5"}, (), METHOD_XMD5, "md5", []),
+    ({"SIZE", "MDTM"}, (), METHOD_SIZE, None, []),
+])
+def test_choose_method(features, rejected, method, algorithm, commands):
+    ftp = _FeatSession(features, rejected)
+    assert choose_method(ftp) == (method, algorithm)
+    assert ftp.commands == commands
+
+
+@pytest.mark.parametrize("resp, algorithm, expected", [
+    (f"213 SHA-256 0-3 {SHA256_ABC} /a.txt", "sha256", SHA256_ABC),
+    (f"250 {SHA256_ABC.upper()}", "sha256", SHA256_ABC),
+    ("250 1a2b3c", "crc32", "001a2b3c"),
+])
+def test_parse_digest(resp, algorithm, expected):
+    assert _parse_digest(resp, algorithm) == expected
+
+
+def test_parse_digest_rejects_unknown_reply():
+    with pytest.raises(ftplib.error_reply):
+        _parse_digest("213 not-a-digest", "md5")
+
+
+@pytest.fixture
+def distributed(manager, server_config, tmp_path, ftp_root):
+    site = write_tree(tmp_path / "site", {"a.txt": b"a" * 100, "sub/b.txt": b"b" * 200, "sub/c.txt": b"c" * 300})
+    ok, message = manager.upload_paths_to_server(server_config, [str(site)], "/up")
+    assert ok, message
+    return site
+
+
+def test_verify_all_falls_back_to_size(manager, server_config, distributed):
+    statuses = []
+    handle = manager.verify_all([str(distributed)], "/up",
+                                status_callback=lambda server_id, text, state: statuses.append(state))
+    assert handle.wait(10)
+    report = manager.verify_reports[server_config.server_id]
+    assert report.ok and report.method == METHOD_SIZE
+    assert report.describe() == "3/3 files match (SIZE)"
+    assert statuses[-1] == 1
+
+
+def test_mismatches_are_reported_and_reuploaded(manager, server_config, distributed, ftp_root):
+    (ftp_root / "up" / "site" / "sub" / "b.txt").write_bytes(b"b" * 10)
+    (ftp_root / "up" / "site" / "sub" / "c.txt").unlink()
+    handle = manager.verify_all([str(distributed)], "/up")
+    assert handle.wait(10)
+    report = manager.verify_reports[server_config.server_id]
+    assert not report.ok
+    reasons = {job.remote_path: reason for job, reason in report.mismatches}
+    assert reasons == {"/up/site/sub/b.txt": "size 10 != local 200", "/up/site/sub/c.txt": "missing"}
+
+    verify_metrics = manager.verify_metrics.get(server_config.server_id)
+    assert verify_metrics.kind == "verify" and verify_metrics.success is False
+    assert verify_metrics.snapshot()["bytes_done"] == 3
+
+    handle = manager.reupload_mismatches()
+    assert handle.wait(10)
+    assert all(task.result[0] for task in handle.tasks.values())
+    assert report.ok and report.matched == 3
+    assert (ftp_root / "up" / "site" / "sub" / "c.txt").read_bytes() == b"c" * 300
+    # 重传另起一份统计，只计入重传的字节
+    metrics = manager.verify_metrics.get(server_config.server_id)
+    assert metrics is not verify_metrics and metrics.kind == "reupload" and metrics.success
+    assert metrics.bytes_done == 500
+
+
+def test_digest_mismatch_with_equal_size(monkeypatch, manager, server_config, distributed, ftp_root):
+    # 替身服务器不支持摘要命令：按 XMD5 校验，摘要直接读取远端根目录下的文件计算
+    monkeypatch.setattr(verify, "choose_method", lambda ftp: (METHOD_XMD5, "md5"))
+
+    def remote_digest(ftp, method, algorithm, remote_path):
+        if remote_path.endswith("a.txt"):
+            raise ftplib.error_perm("550 File too large")
+        return hashlib.md5((ftp_root / remote_path.lstrip("/")).read_bytes()).hexdigest()
+
+    monkeypatch.setattr(verify, "remote_digest", remote_digest)
+    (ftp_root / "up" / "site" / "sub" / "b.txt").write_bytes(b"x" * 200)
+    report = manager.verify_server(server_config, [str(distributed)], "/up")
+    assert report.method == METHOD_XMD5
+    assert report.size_only == 1 and report.matched == 2
+    [(job, reason)] = report.mismatches
+    assert job.remote_path == "/up/site/sub/b.txt" and reason.startswith("md5 ")
+
+
+def test_unreachable_server_reports_error(manager, tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    config = FtpServerConfig("127.0.0.1", port, "u", "pw", retry_policies={"connect": {"retries": 0}})
+    local_file = write_tree(tmp_path, {"a.txt": b"a"}) / "a.txt"
+    report = manager.verify_server(config, [str(local_file)], "/up")
+    assert report.error is not None and not report.ok
+    assert report.describe().startswith("Verify failed:")